@@ -1,15 +1,24 @@
 """
 Data Analyst Agent - Executes data queries and performs analysis
 """
-import pandas as pd
+import numpy as np
 from typing import List, Dict, Any
 from utils.data_loader import DataLoader
+from utils.graph import GRAPH_METRICS
+from utils.metrics import span
+from utils.query_plan import INTENTS, canonical_plan, plan_key
+from utils.result_cache import ResultCache
+from utils.single_flight import SingleFlight
 
 class DataAnalystAgent:
     """Agent that performs data analysis based on query plan"""
     
-    def __init__(self, data_loader: DataLoader):
+    def __init__(self, data_loader: DataLoader, result_cache: ResultCache = None,
+                 inflight: SingleFlight = None):
         self.data_loader = data_loader
+        self.result_cache = result_cache if result_cache is not None else ResultCache.from_env()
+        # Concurrent requests for the same plan share one computation
+        self.inflight = inflight if inflight is not None else SingleFlight("analyze")
     
     def analyze(self, query_plan: dict) -> List[Dict[str, Any]]:
         """
@@ -21,30 +30,52 @@ class DataAnalystAgent:
         Returns:
             List of dictionaries with analyzed data
         """
-        try:
-            intent = query_plan.get("intent", "count_by_field")
-            entity = query_plan.get("entity", "papers")
-            
-            # Route to appropriate analysis method
-            if intent == "count_by_field":
-                result = self._count_by_field(query_plan, entity)
-            elif intent == "top_ranking":
-                result = self._top_ranking(query_plan, entity)
-            elif intent == "trend_analysis":
-                result = self._trend_analysis(query_plan, entity)
-            elif intent == "distribution":
-                result = self._distribution(query_plan, entity)
-            elif intent == "comparison":
-                result = self._comparison(query_plan, entity)
-            else:
-                result = self._count_by_field(query_plan, entity)
-            
-            print(f"Analysis complete: {len(result)} data points")
-            return result
-            
-        except Exception as e:
-            print(f"Error in data analysis: {e}")
-            return []
+        # The canonical plan is both what runs and what the result is cached under
+        query_plan = canonical_plan(query_plan)
+        # Timed per intent (unknown intents share one label); cache hits are the fast tail
+        intent = query_plan["intent"]
+        with span("analyze", intent=intent if intent in INTENTS else "other"):
+            try:
+                # Equivalent plans over the same data reuse the cached result
+                key = plan_key(query_plan)
+                version = self.data_loader.data_version
+                cached = self.result_cache.get(key, version)
+                if cached is not None:
+                    print(f"Analysis cache hit: {len(cached)} data points")
+                    return cached
+
+                return self.inflight.do((key, version),
+                                        lambda: self._compute(query_plan, intent, key, version))
+                
+            except Exception as e:
+                print(f"Error in data analysis: {e}")
+                return []
+
+    def _compute(self, query_plan: dict, intent: str, key: str, version: str) -> List[Dict[str, Any]]:
+        """Run the analysis for a plan and cache its result"""
+        entity = query_plan.get("entity", "papers")
+        
+        # Route to appropriate analysis method
+        if intent == "count_by_field":
+            result = self._count_by_field(query_plan, entity)
+        elif intent == "top_ranking":
+            result = self._top_ranking(query_plan, entity)
+        elif intent == "trend_analysis":
+            result = self._trend_analysis(query_plan, entity)
+        elif intent == "distribution":
+            result = self._distribution(query_plan, entity)
+        elif intent == "comparison":
+            result = self._comparison(query_plan, entity)
+        elif intent == "network_ranking":
+            result = self._network_ranking(query_plan, entity)
+        elif intent == "neighbors":
+            result = self._neighbors(query_plan, entity)
+        else:
+            result = self._count_by_field(query_plan, entity)
+        
+        self.result_cache.put(key, version, result)
+        print(f"Analysis complete: {len(result)} data points")
+        return result
     
     def _count_by_field(self, query_plan: dict, entity: str) -> List[Dict]:
         """Count entities grouped by a field"""
@@ -53,12 +84,14 @@ class DataAnalystAgent:
         sort = query_plan.get("sort", "desc")
         
         if entity == "papers":
+            # Counts unless the plan aggregates a field ("total citations per type")
             df = self.data_loader.query_papers(
                 groupby=groupby,
-                measure="count",
+                measure=query_plan.get("measure", "count"),
+                aggregation_field=query_plan.get("aggregation_field"),
                 filters=filters,
                 sort=sort,
-                limit=50
+                limit=query_plan.get("limit", 50)
             )
         else:
             df = self.data_loader.query_authors(
@@ -71,7 +104,7 @@ class DataAnalystAgent:
         # Convert to list of dicts
         if not df.empty:
             # Rename columns for consistency
-            if groupby in df.columns and "count" in df.columns:
+            if isinstance(groupby, str) and groupby in df.columns:
                 df = df.rename(columns={groupby: "category", "count": "value"})
             return df.to_dict('records')
         return []
@@ -82,18 +115,28 @@ class DataAnalystAgent:
         aggregation_field = query_plan.get("aggregation_field", "citations_count")
         sort = query_plan.get("sort", "desc")
         
+        # Graph metrics (pagerank, betweenness, degrees) rank network nodes
+        if aggregation_field in GRAPH_METRICS:
+            return self._network_ranking(query_plan, entity)
+        
         if entity == "papers":
             df = self.data_loader.papers_df
+            filters = query_plan.get("filters")
+            if df is not None and filters:
+                df = self.data_loader.query_papers(filters=filters)
             if df is not None and aggregation_field in df.columns:
-                # Get top papers
-                df = df.nlargest(limit, aggregation_field)
-                result = []
-                for _, row in df.iterrows():
-                    result.append({
-                        "name": row.get("title", "Unknown")[:50] + "...",  # Truncate title
-                        "value": float(row[aggregation_field])
-                    })
-                return result
+                # Get top papers, labelled by title when the dataset has one
+                if sort == "asc":
+                    df = df.nsmallest(limit, aggregation_field)
+                else:
+                    df = df.nlargest(limit, aggregation_field)
+                if "title" in df.columns:
+                    names = df["title"].fillna("Unknown").astype(str).str.slice(0, 50) + "..."
+                else:
+                    names = df["id"].astype(str)
+                values = df[aggregation_field].astype(float)
+                return [{"name": name, "value": value}
+                        for name, value in zip(names.tolist(), values.tolist())]
         else:
             df = self.data_loader.query_authors(
                 aggregation_field=aggregation_field,
@@ -114,7 +157,8 @@ class DataAnalystAgent:
         if entity == "papers":
             df = self.data_loader.query_papers(
                 groupby=groupby,
-                measure="count",
+                measure=query_plan.get("measure", "count"),
+                aggregation_field=query_plan.get("aggregation_field"),
                 filters=filters,
                 sort=sort,
                 limit=50
@@ -129,8 +173,8 @@ class DataAnalystAgent:
         
         if not df.empty:
             # Format for time series
-            if groupby in df.columns and "count" in df.columns:
-                df = df.rename(columns={groupby: "x", "count": "y"})
+            if isinstance(groupby, str) and groupby in df.columns:
+                df = df.rename(columns={groupby: "x", "count": "y", "value": "y"})
             return df.to_dict('records')
         return []
     
@@ -138,37 +182,57 @@ class DataAnalystAgent:
         """Analyze distribution of values"""
         aggregation_field = query_plan.get("aggregation_field", "citations_count")
         
-        if entity == "papers":
-            df = self.data_loader.papers_df
-            if df is not None and aggregation_field in df.columns:
-                # Create histogram bins
-                values = df[aggregation_field].dropna()
-                
-                # Use pandas cut to create bins
-                if len(values) > 0:
-                    bins = min(20, len(values.unique()))
-                    hist, bin_edges = pd.cut(values, bins=bins, retbins=True, duplicates='drop')
-                    
-                    # Count values in each bin
-                    counts = hist.value_counts().sort_index()
-                    
-                    result = []
-                    for interval, count in counts.items():
-                        result.append({
-                            "bin": f"{interval.left:.0f}-{interval.right:.0f}",
-                            "count": int(count),
-                            "min": float(interval.left),
-                            "max": float(interval.right)
-                        })
-                    return result
+        df = self.data_loader.papers_df if entity == "papers" else self.data_loader.authors_df
+        if df is None or aggregation_field not in df.columns:
+            return []
         
-        return []
+        values = df[aggregation_field].dropna().to_numpy(dtype=float)
+        if len(values) == 0:
+            return []
+        
+        # Equal-width bins over the value range, at most 20
+        counts, edges = np.histogram(values, bins=min(20, len(np.unique(values))))
+        lefts, rights = edges[:-1].tolist(), edges[1:].tolist()
+        return [{"bin": f"{left:.0f}-{right:.0f}", "count": count, "min": left, "max": right}
+                for left, right, count in zip(lefts, rights, counts.tolist())]
     
     def _comparison(self, query_plan: dict, entity: str) -> List[Dict]:
         """Compare entities across categories"""
         # Similar to count_by_field but with multiple measures
         return self._count_by_field(query_plan, entity)
     
+    def _network_ranking(self, query_plan: dict, entity: str) -> List[Dict]:
+        """Rank nodes of the citation (papers) or collaboration (authors) graph"""
+        limit = query_plan.get("limit", 10)
+        default_metric = "in_degree" if entity == "papers" else "weighted_degree"
+        metric = query_plan.get("aggregation_field") or default_metric
+        
+        graph = self.data_loader.get_graph(entity)
+        values = self.data_loader.graph_metric(entity, metric)
+        if graph is None or values is None:
+            return []
+        return graph.top(values, limit)
+    
+    def _neighbors(self, query_plan: dict, entity: str) -> List[Dict]:
+        """
+        Direct neighbours of one node: co-authors of an author (valued by
+        collaboration weight) or papers citing a paper (valued by their own
+        in-dataset citations)
+        """
+        limit = query_plan.get("limit", 20)
+        node = str(query_plan.get("node", "")).strip().upper()
+        
+        graph = self.data_loader.get_graph(entity)
+        index = graph.index_of(node) if graph is not None else None
+        if index is None:
+            return []
+        
+        if entity == "papers":
+            neighbors, _ = graph.in_neighbors(index)
+            return graph.top(graph.in_degree()[neighbors], limit, nodes=neighbors)
+        neighbors, weights = graph.neighbors(index)
+        return graph.top(weights, limit, nodes=neighbors)
+    
     def get_summary_stats(self) -> Dict[str, Any]:
         """Get summary statistics for context"""
         return self.data_loader.get_data_summary()
@@ -1,48 +1,182 @@
 import json
 import os
-from openai import OpenAI
-from utils.prompts import QUERY_PARSER_PROMPT, SYSTEM_MESSAGE
+import re
+from typing import Callable, List
+from utils.llm_client import LLMClient, LLMUnavailableError, get_llm_client
+from utils.json_stream import JSONObjectScanner
+from utils.metrics import annotate, span
+from utils.parser_prompt import ParserPrompt
+from utils.plan_cache import PlanCache
+from utils.query_plan import plan_key
+from utils.rule_parser import RuleBasedParser
+from utils.semantic_cache import SemanticPlanCache
+from utils.single_flight import SingleFlight
+
+# Greedy decoding so a question always gets the same (cacheable) plan; a
+# plan is well under 200 tokens, the cap only bounds runaway replies
+PARSE_COMPLETION_PARAMS = {"temperature": 0, "max_tokens": 400}
 
 class QueryParserAgent:
     """Agent that parses natural language queries into structured format"""
     
-    def __init__(self):
-        api_key = os.environ.get("DASHSCOPE_API_KEY")
-        if not api_key:
-            raise ValueError("DASHSCOPE_API_KEY environment variable not set")
-
-        self.client = OpenAI(
-            api_key=api_key,
-            base_url="https://dashscope.aliyuncs.com/compatible-mode/v1"
-        )
-        self.model = "qwen-plus"  # or "qwen-turbo", "qwen-max"
+    def __init__(self,
+                 plan_cache: PlanCache = None,
+                 rule_parser: RuleBasedParser = None,
+                 llm_client: LLMClient = None,
+                 semantic_cache: SemanticPlanCache = None,
+                 prompt_source: Callable[[], ParserPrompt] = None,
+                 stream: bool = None):
+        # Shared pooled Qwen client (timeouts, retries, circuit breaker)
+        self.llm = llm_client if llm_client is not None else get_llm_client()
+        self.plan_cache = plan_cache if plan_cache is not None else PlanCache.from_env()
+        self.rule_parser = rule_parser if rule_parser is not None else RuleBasedParser()
+        # Paraphrase matching of earlier LLM plans (None when SEMANTIC_CACHE=0)
+        self.semantic_cache = semantic_cache if semantic_cache is not None else SemanticPlanCache.from_env()
+        # Prompt built from the current data snapshot's schema
+        if prompt_source is None:
+            generic_prompt = ParserPrompt()
+            prompt_source = lambda: generic_prompt
+        self.prompt_source = prompt_source
+        # Identical questions asked concurrently share one LLM call
+        self.inflight = SingleFlight("parse")
+        # Stream replies and stop reading once the plan object is complete
+        if stream is None:
+            stream = os.environ.get("LLM_STREAM_PARSE", "1") == "1"
+        self.stream = stream
     
-    def parse(self, query: str) -> dict:
-        # Format prompt
-        prompt = QUERY_PARSER_PROMPT.format(query=query)
+    def parse(self, query: str, priority: str = "interactive") -> dict:
+        """
+        Parse a query into a plan
+
+        Args:
+            query: Natural language question
+            priority: LLM scheduler class; "batch" yields to interactive chats
+
+        Returns:
+            Query plan; a heuristic plan if the LLM is unavailable or overloaded
+        """
+        with span("parse"):
+            query_plan = self._parse_local(query)
+            if query_plan is not None:
+                return query_plan
+
+            query_plan = self.inflight.do(PlanCache.normalize(query),
+                                          lambda: self._parse_llm(query, priority))
+            annotate(parse_path=query_plan.get("parse_path"))
+            return query_plan
+
+    async def aparse(self, query: str, priority: str = "interactive") -> dict:
+        """Same as parse, but awaits the Qwen call instead of blocking the thread"""
+        with span("parse"):
+            query_plan = self._parse_local(query)
+            if query_plan is not None:
+                return query_plan
+
+            query_plan = await self.inflight.ado(PlanCache.normalize(query),
+                                                 lambda: self._aparse_llm(query, priority))
+            annotate(parse_path=query_plan.get("parse_path"))
+            return query_plan
+
+    def needs_llm(self, query: str) -> bool:
+        """Whether parse() will call the LLM for this query"""
+        return (self.rule_parser.parse(query) is None and query not in self.plan_cache
+                and not (self.semantic_cache is not None and query in self.semantic_cache))
+
+    def candidate_plans(self, query: str, limit: int = 3) -> List[dict]:
+        """
+        Plans the LLM is likely to return for a query, most likely first
+
+        Built locally from the relaxed rule parser and the _infer_field
+        heuristics, in the same shape as the prompt examples, so analysis
+        can start before the real plan arrives.
+        """
+        candidates = []
+        relaxed = self.rule_parser.parse_relaxed(query)
+        if relaxed is not None:
+            candidates.append(relaxed)
+
+        heuristic = self._heuristic_plan(query)
+        heuristic.pop("original_query", None)
+        candidates.append(heuristic)
+
+        # Variants of the heuristic plan that differ only in the measured field
+        intent, entity = heuristic["intent"], heuristic["entity"]
+        if intent == "trend_analysis":
+            candidates.append({**heuristic, "measure": "sum", "aggregation_field": "citations"})
+        elif intent == "count_by_field":
+            candidates.append({**heuristic, "groupby": "type", "sort": "desc"})
+
+        unique = {}
+        for plan in candidates:
+            unique.setdefault(plan_key(plan), plan)
+        return list(unique.values())[:limit]
+
+    def _parse_local(self, query: str) -> dict:
+        """Plan from the rule-based parser or the plan caches, or None if the LLM is needed"""
+        # Recognizable queries are parsed locally without calling the LLM
+        query_plan = self.rule_parser.parse(query)
+        if query_plan is not None:
+            query_plan["parse_path"] = "rules"
+            annotate(parse_path="rules")
+            print(f"Query parsed by rules: {query_plan}")
+            return query_plan
 
+        # Serve repeated queries from the plan cache
+        cached_plan = self.plan_cache.get(query)
+        if cached_plan is not None:
+            cached_plan["parse_path"] = "cache"
+            annotate(parse_path="cache")
+            print(f"Query plan cache hit: {cached_plan}")
+            return cached_plan
+
+        # Reuse the plan of an earlier paraphrase of the question
+        if self.semantic_cache is not None:
+            similar_plan = self.semantic_cache.get(query)
+            if similar_plan is not None:
+                similar_plan["parse_path"] = "semantic"
+                annotate(parse_path="semantic")
+                print(f"Semantic plan cache hit: {similar_plan}")
+                return similar_plan
+        return None
+
+    def _parse_llm(self, query: str, priority: str) -> dict:
         # Call Qwen API using OpenAI-compatible interface
-        response = self.client.chat.completions.create(
-            model=self.model,
-            messages=[
-                {"role": "system", "content": SYSTEM_MESSAGE},
-                {"role": "user", "content": prompt}
-            ],
-            temperature=0.7,
-            max_tokens=1000
-        )
-
-        # Extract response
-        response_text = response.choices[0].message.content.strip()
-
-        # Clean response (remove markdown code blocks if present)
-        if response_text.startswith("```json"):
-            response_text = response_text.split("```json")[1].split("```")[0].strip()
-        elif response_text.startswith("```"):
-            response_text = response_text.split("```")[1].split("```")[0].strip()
-
-        # Parse JSON
-        query_plan = json.loads(response_text)
+        messages = self._build_messages(query)
+        try:
+            if self.stream:
+                response_text = self.llm.complete_json(
+                    messages, agent="query_parser", priority=priority, **PARSE_COMPLETION_PARAMS).text
+            else:
+                response = self.llm.complete(
+                    messages, agent="query_parser", priority=priority, **PARSE_COMPLETION_PARAMS)
+                response_text = response.choices[0].message.content
+        except LLMUnavailableError as e:
+            return self._fallback_plan(query, e)
+        return self._finish_plan(query, response_text)
+
+    async def _aparse_llm(self, query: str, priority: str) -> dict:
+        messages = self._build_messages(query)
+        try:
+            if self.stream:
+                reply = await self.llm.acomplete_json(
+                    messages, agent="query_parser", priority=priority, **PARSE_COMPLETION_PARAMS)
+                response_text = reply.text
+            else:
+                response = await self.llm.acomplete(
+                    messages, agent="query_parser", priority=priority, **PARSE_COMPLETION_PARAMS)
+                response_text = response.choices[0].message.content
+        except LLMUnavailableError as e:
+            return self._fallback_plan(query, e)
+        return self._finish_plan(query, response_text)
+
+    def _build_messages(self, query: str) -> list:
+        return self.prompt_source().messages(query)
+
+    def _finish_plan(self, query: str, response_text: str) -> dict:
+        """Turn the LLM reply into a validated query plan and cache it"""
+        # Take the first JSON object, skipping code fences or any surrounding prose
+        plan_text = JSONObjectScanner().feed(response_text or "")
+        query_plan = json.loads(plan_text if plan_text is not None else response_text)
 
         # Validate required fields
         required_fields = ["intent", "entity"]
@@ -54,10 +188,46 @@ class QueryParserAgent:
         query_plan.setdefault("measure", "count")
         query_plan.setdefault("filters", {})
         query_plan.setdefault("sort", "desc")
+        query_plan["parse_path"] = "llm"
+        annotate(parse_path="llm")
+        problems = self.prompt_source().record(query_plan)
+        if problems:
+            print(f"LLM plan uses fields the data doesn't have: {problems}")
+
+        self.plan_cache.put(query, query_plan)
+        if self.semantic_cache is not None:
+            self.semantic_cache.put(query, query_plan)
 
         print(f"Query parsed: {query_plan}")
         return query_plan
     
+    def _fallback_plan(self, query: str, error: Exception) -> dict:
+        """
+        Heuristic plan used while the LLM is unavailable or sheds the call
+
+        Not cached, so the query is parsed properly once the LLM recovers.
+        """
+        query_plan = self._heuristic_plan(query)
+        query_plan["parse_path"] = "fallback"
+        annotate(parse_path="fallback")
+        print(f"LLM unavailable ({error}), using heuristic plan: {query_plan}")
+        return query_plan
+
+    def _heuristic_plan(self, query: str) -> dict:
+        """Default plan with intent and entity inferred from the query text"""
+        query_plan = self._get_default_plan(query)
+        query_plan["intent"] = self._infer_field("intent", query)
+        query_plan["entity"] = self._infer_field("entity", query)
+        if query_plan["intent"] in ("top_ranking", "distribution"):
+            query_plan.pop("groupby")
+            query_plan["aggregation_field"] = "citations" if query_plan["entity"] == "papers" else "paper_count"
+        if query_plan["intent"] == "top_ranking":
+            match = re.search(r"\btop (\d+)\b", query.lower())
+            query_plan["measure"] = "max"
+            query_plan["limit"] = int(match.group(1)) if match else 10
+            query_plan["sort"] = "desc"
+        return query_plan
+
     def _infer_field(self, field: str, query: str) -> str:
         """Infer missing field from query text"""
         query_lower = query.lower()
@@ -1,26 +1,13 @@
 """
 Visualization Generator Agent - Creates Vega-Lite specifications
 """
-import json
-import os
 from typing import List, Dict, Any
-from openai import OpenAI
-from utils.prompts import VIZ_GENERATOR_PROMPT, SYSTEM_MESSAGE
+from utils.metrics import span
+from utils.reduction import chart_kind, numeric_fields
 
 class VizGeneratorAgent:
     """Agent that generates Vega-Lite specifications"""
     
-    def __init__(self):
-        api_key = os.environ.get("DASHSCOPE_API_KEY")
-        if not api_key:
-            raise ValueError("DASHSCOPE_API_KEY environment variable not set")
-        # Qwen API is compatible with OpenAI interface
-        self.client = OpenAI(
-            api_key=api_key,
-            base_url="https://dashscope.aliyuncs.com/compatible-mode/v1"
-        )
-        self.model = "qwen-plus"  # or "qwen-turbo", "qwen-max"
-    
     def generate(self, 
                  query_plan: dict, 
                  analyzed_data: List[Dict[str, Any]]) -> dict:
@@ -34,34 +21,37 @@ class VizGeneratorAgent:
         Returns:
             Dictionary with description and Vega-Lite spec
         """
-        try:
-            # If no data, return empty chart
-            if not analyzed_data:
-                return self._create_empty_chart("No data available for this query")
-            
-            # Use template-based generation for reliability
-            # AI generation sometimes produces incorrect configurations
-            intent = query_plan.get("intent", "count_by_field")
+        with span("viz"):
+            try:
+                # If no data, return empty chart
+                if not analyzed_data:
+                    return self._create_empty_chart("No data available for this query")
+                
+                # Use template-based generation for reliability
+                # AI generation sometimes produces incorrect configurations
+                intent = query_plan.get("intent", "count_by_field")
 
-            print(f"⚡ Using template for {intent}")
-            return self._create_template_chart(query_plan, analyzed_data)
+                print(f"⚡ Using template for {intent}")
+                return self._create_template_chart(query_plan, analyzed_data)
 
-        except Exception as e:
-            print(f"Error generating visualization: {e}")
-            return self._create_template_chart(query_plan, analyzed_data)
+            except Exception as e:
+                print(f"Error generating visualization: {e}")
+                return self._create_template_chart(query_plan, analyzed_data)
 
     def _create_template_chart(self,
                                 query_plan: dict,
                                 data: List[Dict]) -> dict:
         """Create chart using templates (fallback)"""
-        intent = query_plan.get("intent", "count_by_field")
+        kind = chart_kind(query_plan, data)
 
-        if intent == "top_ranking":
+        if kind == "hbar":
             return self._create_bar_chart(data, horizontal=True)
-        elif intent == "trend_analysis":
+        elif kind == "line":
             return self._create_line_chart(data)
-        elif intent == "distribution":
+        elif kind == "histogram":
             return self._create_histogram(data)
+        elif kind == "scatter":
+            return self._create_scatter_chart(data)
         else:
             return self._create_bar_chart(data, horizontal=False)
 
@@ -79,16 +69,7 @@ class VizGeneratorAgent:
         value_field = keys[1] if len(keys) > 1 else "value"
 
         # Format data to ensure categories are strings
-        formatted_data = []
-        for item in data:
-            formatted_item = {}
-            for key, value in item.items():
-                if key == category_field:
-                    # Convert to string for proper display
-                    formatted_item[key] = str(value)
-                else:
-                    formatted_item[key] = value
-            formatted_data.append(formatted_item)
+        formatted_data = self._stringify_field(data, category_field)
 
         if horizontal:
             x_field, y_field = value_field, category_field
@@ -157,16 +138,7 @@ class VizGeneratorAgent:
 
         # Ensure x values are properly formatted as strings
         # This fixes the issue where years might be interpreted incorrectly
-        formatted_data = []
-        for item in data:
-            formatted_item = {}
-            for key, value in item.items():
-                if key == x_field:
-                    # Convert to string to ensure proper display
-                    formatted_item[key] = str(value)
-                else:
-                    formatted_item[key] = value
-            formatted_data.append(formatted_item)
+        formatted_data = self._stringify_field(data, x_field)
 
         spec = {
             "$schema": "https://vega.github.io/schema/vega-lite/v5.json",
@@ -252,6 +224,62 @@ class VizGeneratorAgent:
             "spec": spec
         }
 
+    def _create_scatter_chart(self, data: List[Dict]) -> dict:
+        """Create a scatter plot of the first two numeric fields, sized by count if binned"""
+        if not data:
+            return self._create_empty_chart("No data")
+
+        x_field, y_field = numeric_fields(data[0])[:2]
+        tooltip = [
+            {"field": x_field, "type": "quantitative", "title": x_field.replace("_", " ").title()},
+            {"field": y_field, "type": "quantitative", "title": y_field.replace("_", " ").title()}
+        ]
+        encoding = {
+            "x": {
+                "field": x_field,
+                "type": "quantitative",
+                "title": x_field.replace("_", " ").title(),
+                "scale": {"zero": False}
+            },
+            "y": {
+                "field": y_field,
+                "type": "quantitative",
+                "title": y_field.replace("_", " ").title()
+            },
+            "tooltip": tooltip
+        }
+        # Pre-binned points carry a count per cell
+        if "count" in data[0] and "count" not in (x_field, y_field):
+            encoding["size"] = {"field": "count", "type": "quantitative", "title": "Count"}
+            tooltip.append({"field": "count", "type": "quantitative", "title": "Count"})
+
+        spec = {
+            "$schema": "https://vega.github.io/schema/vega-lite/v5.json",
+            "data": {"values": data},
+            "mark": {"type": "circle", "tooltip": True, "opacity": 0.7},
+            "encoding": encoding,
+            "config": {
+                "view": {"stroke": None},
+                "axis": {
+                    "labelFontSize": 12,
+                    "titleFontSize": 14
+                }
+            },
+            "width": 600,
+            "height": 400
+        }
+
+        return {
+            "description": f"Scatter plot of {y_field} against {x_field}",
+            "spec": spec
+        }
+
+    @staticmethod
+    def _stringify_field(data: List[Dict], field: str) -> List[Dict]:
+        """Copy records with one field converted to str, in a single pass"""
+        return [{**item, field: str(item[field])} if field in item else dict(item)
+                for item in data]
+
     def _create_empty_chart(self, message: str) -> dict:
         """Create empty chart with message"""
         return {
@@ -1,12 +1,23 @@
-from flask import Flask, request, jsonify
+from flask import Flask, Response, request, jsonify, stream_with_context
 from flask_cors import CORS
+import contextvars
+import hmac
 import os
+from concurrent.futures import ThreadPoolExecutor
 from dotenv import load_dotenv
 
 from agents.query_parser import QueryParserAgent
 from agents.data_analyst import DataAnalystAgent
 from agents.viz_generator import VizGeneratorAgent
-from utils.data_loader import DataLoader
+from utils.metrics import attach_trace, current_trace, detach_trace, end_trace, registry, start_trace
+from utils.plan_cache import PlanCache
+from utils.prompts import EXAMPLE_QUERIES
+from utils.query_plan import plan_key
+from utils.reduction import reduce_for_chart
+from utils.rule_parser import RuleBasedParser
+from utils.serialization import FastJSONProvider, compress, dumps, with_named_data
+from utils.speculation import Speculation, SpeculativeAnalyzer
+from utils.snapshot import SnapshotManager
 
 # Load environment variables
 DASHSCOPE_API_KEY = 'sk-72f878b1abab481f822d53f54686e874'
@@ -14,26 +25,72 @@ load_dotenv()
 
 # Initialize Flask app
 app = Flask(__name__)
+app.json = FastJSONProvider(app)
 CORS(app)
 
+# Reference the response "data" array from the spec instead of inlining it
+SPEC_NAMED_DATA = os.environ.get("SPEC_NAMED_DATA", "0") == "1"
+
 # Initialize components
 print("Initializing system...")
 try:
-    data_loader = DataLoader(data_dir="./data")
-    query_parser = QueryParserAgent()
-    data_analyst = DataAnalystAgent(data_loader)
+    data_manager = SnapshotManager(data_dir="./data")
+    data_manager.watch(float(os.environ.get("DATA_WATCH_INTERVAL", 0)))
+    year_range = data_manager.current().data_loader.get_data_summary()["year_range"]
+    query_parser = QueryParserAgent(
+        rule_parser=RuleBasedParser(reference_year=year_range[1] if year_range else None),
+        prompt_source=lambda: data_manager.current().parser_prompt
+    )
     viz_generator = VizGeneratorAgent()
+    speculator = SpeculativeAnalyzer.from_env(query_parser)
     print("System initialized successfully!")
 except Exception as e:
     print(f"Initialization error: {e}")
-    data_loader = None
+    data_manager = None
     query_parser = None
-    data_analyst = None
+    speculator = None
     viz_generator = None
 
+def current_analyst() -> DataAnalystAgent:
+    """Data analyst of the current data snapshot (capture once per request)"""
+    return data_manager.current().data_analyst if data_manager else None
+
+@app.before_request
+def begin_request_trace():
+    """Start timing the request; spans recorded while serving it attach to its trace"""
+    trace = start_trace(request.endpoint or "unknown", request.headers.get("X-Request-ID"))
+    request.environ["paperagent.request_id"] = trace.request_id
+
+# Registered before compress_response so it runs after it and times compression too
+@app.after_request
+def finish_request_trace(response):
+    response.headers["X-Request-ID"] = request.environ.get("paperagent.request_id", "")
+    if request.environ.get("paperagent.streaming"):
+        # The stream's generator runs after this and ends the trace itself
+        detach_trace()
+    else:
+        end_trace(response.status_code)
+    return response
+
+@app.after_request
+def compress_response(response):
+    """gzip / brotli JSON responses according to Accept-Encoding"""
+    if (response.mimetype != "application/json" or response.is_streamed
+            or response.direct_passthrough or "Content-Encoding" in response.headers):
+        return response
+    body, encoding = compress(response.get_data(), request.headers.get("Accept-Encoding"))
+    response.vary.add("Accept-Encoding")
+    if encoding:
+        response.set_data(body)
+        response.headers["Content-Encoding"] = encoding
+    return response
+
 @app.route('/health', methods=['GET'])
 def health():
     """Health check endpoint"""
+    snapshot = data_manager.current() if data_manager else None
+    data_loader = snapshot.data_loader if snapshot else None
+    data_analyst = snapshot.data_analyst if snapshot else None
     return jsonify({
         "status": "ok",
         "agents": {
@@ -43,7 +100,20 @@ def health():
         },
         "data": {
             "papers_loaded": len(data_loader.papers_df) if data_loader and data_loader.papers_df is not None else 0,
-            "authors_loaded": len(data_loader.authors_df) if data_loader and data_loader.authors_df is not None else 0
+            "authors_loaded": len(data_loader.authors_df) if data_loader and data_loader.authors_df is not None else 0,
+            "snapshot": data_manager.status() if data_manager else None
+        },
+        "llm": query_parser.llm.status() if query_parser else None,
+        "speculation": speculator.stats() if speculator else None,
+        "coalescing": {
+            "parse": query_parser.inflight.stats() if query_parser else None,
+            "analyze": data_analyst.inflight.stats() if data_analyst else None
+        },
+        "cache": {
+            "query_plans": query_parser.plan_cache.stats() if query_parser else None,
+            "semantic_plans": (query_parser.semantic_cache.stats()
+                               if query_parser and query_parser.semantic_cache else None),
+            "results": data_analyst.result_cache.stats() if data_analyst else None
         }
     })
 
@@ -54,13 +124,15 @@ def chat():
     
     Request body:
     {
-        "query": "Show me the number of papers by year"
+        "query": "Show me the number of papers by year",
+        "named_data": false    # optional, see SPEC_NAMED_DATA
     }
     
     Response:
     {
         "query": "original query",
         "query_plan": {...},
+        "parse_path": "rules | cache | semantic | llm | fallback",
         "data": [...],
         "visualization": {...},
         "explanation": "..."
@@ -77,33 +149,26 @@ def chat():
         print(f"\nUser query: {query}")
         
         # Check if system is initialized
+        data_analyst = current_analyst()
         if not all([query_parser, data_analyst, viz_generator]):
             return jsonify({"error": "System not properly initialized"}), 500
         
-        # 1: Parse query
+        # 1: Parse query (likely plans are analysed meanwhile if speculation is on)
         print("Step 1: Parsing query...")
+        speculation = speculator.start(query, data_analyst) if speculator else None
         query_plan = query_parser.parse(query)
         
         # 2: Analyze data
         print("Step 2: Analyzing data...")
-        analyzed_data = data_analyst.analyze(query_plan)
+        analyzed_data = _analyze(data_analyst, query_plan, speculation)
         
         # 3: Generate visualization
         print("Step 3: Generating visualization...")
         visualization = viz_generator.generate(query_plan, analyzed_data)
         
-        # Create explanation
-        explanation = _generate_explanation(query_plan, analyzed_data, visualization)
-        
         # Return response
-        response = {
-            "query": query,
-            "query_plan": query_plan,
-            "data": analyzed_data,
-            "visualization": visualization,
-            "explanation": explanation,
-            "success": True
-        }
+        response = _build_response(query, query_plan, analyzed_data, visualization,
+                                   named_data=data.get('named_data', SPEC_NAMED_DATA))
         
         print("Response ready!\n")
         return jsonify(response)
@@ -117,9 +182,154 @@ def chat():
             "success": False
         }), 500
 
+@app.route('/api/chat/stream', methods=['GET', 'POST'])
+def chat_stream():
+    """
+    Streaming chat endpoint (Server-Sent Events)
+    
+    Accepts {"query": ..., "named_data": ...} as a JSON body, or
+    ?query=...&named_data=1 for EventSource clients.
+    Emits one event per agent stage as soon as it completes:
+    
+        event: query_plan      data: {"query": ..., "query_plan": {...}, "parse_path": ...}
+        event: data            data: {"data": [...]}
+        event: visualization   data: {"visualization": {...}, "explanation": "..."}
+        event: done            data: {"success": true}
+    
+    With named_data the data event follows the chart and carries its
+    formatted values, which the spec references by name.
+    On failure an "error" event is sent instead and the stream ends.
+    """
+    body = request.get_json(silent=True) or {}
+    query = body.get('query') or request.args.get('query', '')
+    named_data = body.get('named_data', SPEC_NAMED_DATA)
+    if 'named_data' in request.args:
+        named_data = request.args['named_data'] in ('1', 'true')
+    
+    if not query:
+        return jsonify({"error": "Query is required"}), 400
+    data_analyst = current_analyst()
+    if not all([query_parser, data_analyst, viz_generator]):
+        return jsonify({"error": "System not properly initialized"}), 500
+    
+    trace = current_trace()
+    request.environ["paperagent.streaming"] = True
+    
+    def generate():
+        attach_trace(trace)
+        try:
+            print(f"\nUser query (stream): {query}")
+            speculation = speculator.start(query, data_analyst) if speculator else None
+            query_plan = query_parser.parse(query)
+            yield _sse("query_plan", {
+                "query": query,
+                "query_plan": query_plan,
+                "parse_path": query_plan.get("parse_path")
+            })
+            
+            analyzed_data = _analyze(data_analyst, query_plan, speculation)
+            if not named_data:
+                yield _sse("data", {"data": analyzed_data})
+            
+            visualization = viz_generator.generate(query_plan, analyzed_data)
+            chart = visualization
+            if named_data:
+                # The named spec binds to the chart's formatted values, so send those as "data"
+                chart, chart_data = with_named_data(visualization, analyzed_data)
+                yield _sse("data", {"data": chart_data})
+            yield _sse("visualization", {
+                "visualization": chart,
+                "explanation": _generate_explanation(query_plan, analyzed_data, visualization)
+            })
+            yield _sse("done", {"success": True})
+        except Exception as e:
+            print(f"Error processing stream: {e}")
+            yield _sse("error", {"error": str(e), "success": False})
+        finally:
+            end_trace(200, trace)
+    
+    return Response(stream_with_context(generate()),
+                    mimetype="text/event-stream",
+                    headers=SSE_HEADERS)
+
+@app.route('/api/chat/batch', methods=['POST'])
+def chat_batch():
+    """
+    Batch chat endpoint - answers many queries in one call
+    
+    Identical questions are parsed once, unique questions are parsed
+    concurrently, and queries that resolve to the same plan share one
+    analysis and visualization.
+    
+    Request body:
+    {
+        "queries": ["Show me the number of papers by year", ...],
+        "named_data": false    # optional, see SPEC_NAMED_DATA
+    }
+    
+    Response:
+    {
+        "results": [{...same fields as /api/chat...} or {"query": ..., "error": ..., "success": false}],
+        "stats": {"queries": n, "unique_queries": n, "unique_plans": n},
+        "success": true
+    }
+    """
+    try:
+        data = request.json or {}
+        queries = data.get('queries')
+        
+        if not isinstance(queries, list) or not queries:
+            return jsonify({"error": "queries must be a non-empty list"}), 400
+        if len(queries) > MAX_BATCH_SIZE:
+            return jsonify({"error": f"At most {MAX_BATCH_SIZE} queries per batch"}), 400
+        data_analyst = current_analyst()
+        if not all([query_parser, data_analyst, viz_generator]):
+            return jsonify({"error": "System not properly initialized"}), 500
+        
+        print(f"\nBatch of {len(queries)} queries")
+        return jsonify(_run_batch([str(q) if q is not None else '' for q in queries], data_analyst,
+                                  named_data=data.get('named_data', SPEC_NAMED_DATA)))
+        
+    except Exception as e:
+        print(f"Error processing batch: {e}")
+        import traceback
+        traceback.print_exc()
+        return jsonify({
+            "error": str(e),
+            "success": False
+        }), 500
+
+@app.route('/admin/reload', methods=['POST'])
+def reload_data():
+    """
+    Reload the data directory in the background and swap it in atomically
+    
+    Pass ?wait=1 to block until the new snapshot is live. Disabled unless
+    ADMIN_TOKEN is set; the X-Admin-Token header must match it.
+    """
+    admin_token = os.environ.get("ADMIN_TOKEN")
+    if not admin_token:
+        return jsonify({"error": "Reload is disabled; set ADMIN_TOKEN to enable it"}), 403
+    if not hmac.compare_digest(request.headers.get("X-Admin-Token", ""), admin_token):
+        return jsonify({"error": "Unauthorized"}), 401
+    if not data_manager:
+        return jsonify({"error": "Data manager not initialized"}), 500
+    
+    started = data_manager.reload(wait=request.args.get("wait") == "1")
+    return jsonify({
+        "reload_started": started,
+        "snapshot": data_manager.status()
+    }), 202 if started else 409
+
+@app.route('/metrics', methods=['GET'])
+def metrics():
+    """Prometheus metrics: request and per-stage latency histograms, LLM calls and tokens"""
+    return Response(registry.render(), mimetype="text/plain; version=0.0.4")
+
 @app.route('/api/data/summary', methods=['GET'])
 def data_summary():
     """Get summary of available data"""
+    data_analyst = current_analyst()
     if not data_analyst:
         return jsonify({"error": "Data analyst not initialized"}), 500
     
@@ -129,41 +339,101 @@ def data_summary():
 @app.route('/api/examples', methods=['GET'])
 def get_examples():
     """Get example queries"""
-    examples = [
-        {
-            "category": "Count & Statistics",
-            "queries": [
-                "Show me the number of papers by year",
-                "How many papers per field?",
-                "Count papers by journal"
-            ]
-        },
-        {
-            "category": "Rankings",
-            "queries": [
-                "Top 10 most cited papers",
-                "Top authors by publication count",
-                "Most productive years"
-            ]
-        },
-        {
-            "category": "Trends",
-            "queries": [
-                "Papers trend over the last 5 years",
-                "Show publication growth",
-                "Citation trend by year"
-            ]
+    return jsonify(EXAMPLE_QUERIES)
+
+MAX_BATCH_SIZE = int(os.environ.get("MAX_BATCH_SIZE", 100))
+BATCH_PARSE_CONCURRENCY = int(os.environ.get("BATCH_PARSE_CONCURRENCY", 8))
+
+def _run_batch(queries: list, data_analyst: DataAnalystAgent, named_data: bool = False) -> dict:
+    """Parse unique queries concurrently, then analyze each distinct plan once"""
+    # 1: Deduplicate and parse
+    unique_queries = {}
+    for query in queries:
+        if query.strip():
+            unique_queries.setdefault(PlanCache.normalize(query), query)
+    
+    def parse(query):
+        try:
+            # Batch parses queue behind interactive chats for LLM slots
+            return query_parser.parse(query, priority="batch"), None
+        except Exception as e:
+            return None, str(e)
+    
+    # Each parse runs in a copy of this context so its spans land on the request trace
+    with ThreadPoolExecutor(max_workers=BATCH_PARSE_CONCURRENCY) as pool:
+        futures = [pool.submit(contextvars.copy_context().run, parse, query)
+                   for query in unique_queries.values()]
+        parsed = dict(zip(unique_queries, [future.result() for future in futures]))
+    
+    # 2: Analyze and visualize each distinct plan once
+    outputs = {}
+    for query_plan, error in parsed.values():
+        if query_plan is None:
+            continue
+        key = plan_key(query_plan)
+        if key not in outputs:
+            analyzed_data = _analyze(data_analyst, query_plan)
+            outputs[key] = (analyzed_data, viz_generator.generate(query_plan, analyzed_data))
+    
+    # 3: Results in input order
+    results = []
+    for query in queries:
+        if not query.strip():
+            results.append({"query": query, "error": "Query is required", "success": False})
+            continue
+        query_plan, error = parsed[PlanCache.normalize(query)]
+        if query_plan is None:
+            results.append({"query": query, "error": error, "success": False})
+            continue
+        analyzed_data, visualization = outputs[plan_key(query_plan)]
+        results.append(_build_response(query, query_plan, analyzed_data, visualization,
+                                       named_data=named_data))
+    
+    return {
+        "results": results,
+        "stats": {
+            "queries": len(queries),
+            "unique_queries": len(unique_queries),
+            "unique_plans": len(outputs)
         },
-        {
-            "category": "Distributions",
-            "queries": [
-                "Citation count distribution",
-                "Patent count distribution",
-                "Papers per author distribution"
-            ]
-        }
-    ]
-    return jsonify(examples)
+        "success": True
+    }
+
+def _analyze(data_analyst: DataAnalystAgent, query_plan: dict, speculation: Speculation = None) -> list:
+    """Run the analysis (or take its speculative result) and reduce it to what its chart can show"""
+    analyzed_data = speculation.result_for(query_plan) if speculation else None
+    if analyzed_data is None:
+        analyzed_data = data_analyst.analyze(query_plan)
+    return reduce_for_chart(query_plan, analyzed_data)
+
+SSE_HEADERS = {"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+
+def _sse(event: str, payload: dict) -> str:
+    """Format one Server-Sent Event"""
+    return f"event: {event}\ndata: {dumps(payload).decode('utf-8')}\n\n"
+
+def _build_response(query: str,
+                    query_plan: dict,
+                    analyzed_data: list,
+                    visualization: dict,
+                    named_data: bool = False) -> dict:
+    """
+    Assemble the /api/chat response body
+    
+    With named_data the spec references "data" by name rather than
+    carrying a second copy of it, and "data" holds the chart's formatted values.
+    """
+    chart, data = (with_named_data(visualization, analyzed_data) if named_data
+                   else (visualization, analyzed_data))
+    return {
+        "query": query,
+        "query_plan": query_plan,
+        "parse_path": query_plan.get("parse_path"),
+        "data": data,
+        "visualization": chart,
+        "explanation": _generate_explanation(query_plan, analyzed_data, visualization),
+        "success": True
+    }
 
 def _generate_explanation(query_plan: dict, 
                          data: list, 
@@ -189,6 +459,16 @@ def _generate_explanation(query_plan: dict,
     elif intent == "trend_analysis":
         return f"The chart shows how {entity} have changed over time. Found {data_count} time points in the data."
     
+    elif intent == "network_ranking":
+        limit = query_plan.get('limit', 10)
+        graph = "citation" if entity == "papers" else "collaboration"
+        return f"Here are the top {min(limit, data_count)} {entity} in the {graph} network. The chart ranks them by their connections within the dataset."
+    
+    elif intent == "neighbors":
+        node = query_plan.get('node', 'the selected node')
+        relation = "co-authors" if entity == "authors" else "citing papers"
+        return f"Found {data_count} {relation} of {node}. The chart shows the strongest connections."
+    
     elif intent == "distribution":
         return f"This histogram shows the distribution of values across {data_count} bins, helping you understand the data spread."
     
@@ -205,8 +485,12 @@ if __name__ == '__main__':
     print("Endpoints:")
     print("   GET  /health - Health check")
     print("   POST /api/chat - Main chat endpoint")
+    print("   POST /api/chat/stream - Streaming chat (Server-Sent Events)")
+    print("   POST /api/chat/batch - Batch chat")
     print("   GET  /api/data/summary - Data summary")
     print("   GET  /api/examples - Example queries")
+    print("   POST /admin/reload - Reload data directory")
+    print("   GET  /metrics - Prometheus metrics")
     print("\n")
     
     app.run(debug=True, host='0.0.0.0', port=5001)
@@ -0,0 +1,201 @@
+"""
+ASGI entrypoint - non-blocking /api/chat for high-concurrency serving
+
+The Qwen call is awaited on the event loop and the CPU-bound pandas and
+spec-building work runs on a bounded thread pool, so a single worker
+process keeps many chats in flight while waiting on the LLM. All other
+routes are served by the Flask app in app.py.
+
+Usage:
+    uvicorn asgi:app --workers 1 --port 5001
+"""
+import traceback
+
+from asgiref.wsgi import WsgiToAsgi
+
+import app as server
+from utils.executor import BoundedExecutor, ExecutorBusyError
+from utils.metrics import end_trace, start_trace
+from utils.serialization import compress, dumps, loads, with_named_data
+
+analysis_executor = BoundedExecutor.from_env()
+wsgi_app = WsgiToAsgi(server.app)
+
+
+async def app(scope, receive, send):
+    """Route POST /api/chat to the async pipeline and everything else to Flask"""
+    if scope["type"] == "lifespan":
+        await _lifespan(receive, send)
+    elif scope["type"] == "http" and scope["path"] == "/api/chat" and scope["method"] == "POST":
+        await _traced(chat, "chat", scope, receive, send)
+    elif scope["type"] == "http" and scope["path"] == "/api/chat/stream" and scope["method"] == "POST":
+        await _traced(chat_stream, "chat_stream", scope, receive, send)
+    else:
+        await wsgi_app(scope, receive, send)
+
+
+async def chat(scope, receive, send):
+    """Async version of app.chat with the same request and response bodies"""
+    send_json = _json_sender(scope, send)
+    try:
+        body = await _read_body(receive)
+        data = loads(body or b"{}")
+        query = data.get('query', '')
+
+        if not query:
+            return await send_json({"error": "Query is required"}, 400)
+
+        print(f"\nUser query: {query}")
+
+        data_analyst = server.current_analyst()
+        if not all([server.query_parser, data_analyst, server.viz_generator]):
+            return await send_json({"error": "System not properly initialized"}, 500)
+
+        # 1: Parse query (awaits the LLM without holding a thread)
+        print("Step 1: Parsing query...")
+        speculation = server.speculator.start(query, data_analyst) if server.speculator else None
+        query_plan = await server.query_parser.aparse(query)
+
+        # 2: Analyze data
+        print("Step 2: Analyzing data...")
+        analyzed_data = await analysis_executor.run(server._analyze, data_analyst, query_plan, speculation)
+
+        # 3: Generate visualization
+        print("Step 3: Generating visualization...")
+        visualization = await analysis_executor.run(
+            server.viz_generator.generate, query_plan, analyzed_data
+        )
+
+        response = server._build_response(query, query_plan, analyzed_data, visualization,
+                                          named_data=data.get('named_data', server.SPEC_NAMED_DATA))
+        print("Response ready!\n")
+        await send_json(response)
+
+    except ExecutorBusyError as e:
+        await send_json({"error": str(e), "success": False}, 503)
+    except Exception as e:
+        print(f"Error processing request: {e}")
+        traceback.print_exc()
+        await send_json({"error": str(e), "success": False}, 500)
+
+
+async def chat_stream(scope, receive, send):
+    """Async version of app.chat_stream, emitting each stage as it completes"""
+    send_json = _json_sender(scope, send)
+    body = await _read_body(receive)
+    try:
+        data = loads(body or b"{}")
+    except ValueError:
+        data = {}
+    query = data.get('query', '')
+    named_data = data.get('named_data', server.SPEC_NAMED_DATA)
+
+    if not query:
+        return await send_json({"error": "Query is required"}, 400)
+    data_analyst = server.current_analyst()
+    if not all([server.query_parser, data_analyst, server.viz_generator]):
+        return await send_json({"error": "System not properly initialized"}, 500)
+
+    headers = [(b"content-type", b"text/event-stream"), (b"access-control-allow-origin", b"*")]
+    headers += [(k.lower().encode(), v.encode()) for k, v in server.SSE_HEADERS.items()]
+    await send({"type": "http.response.start", "status": 200, "headers": headers})
+
+    async def emit(event: str, payload: dict):
+        await send({
+            "type": "http.response.body",
+            "body": server._sse(event, payload).encode("utf-8"),
+            "more_body": True
+        })
+
+    try:
+        print(f"\nUser query (stream): {query}")
+        speculation = server.speculator.start(query, data_analyst) if server.speculator else None
+        query_plan = await server.query_parser.aparse(query)
+        await emit("query_plan", {
+            "query": query,
+            "query_plan": query_plan,
+            "parse_path": query_plan.get("parse_path")
+        })
+
+        analyzed_data = await analysis_executor.run(server._analyze, data_analyst, query_plan, speculation)
+        if not named_data:
+            await emit("data", {"data": analyzed_data})
+
+        visualization = await analysis_executor.run(
+            server.viz_generator.generate, query_plan, analyzed_data
+        )
+        chart = visualization
+        if named_data:
+            # The named spec binds to the chart's formatted values, so send those as "data"
+            chart, chart_data = with_named_data(visualization, analyzed_data)
+            await emit("data", {"data": chart_data})
+        await emit("visualization", {
+            "visualization": chart,
+            "explanation": server._generate_explanation(query_plan, analyzed_data, visualization)
+        })
+        await emit("done", {"success": True})
+    except Exception as e:
+        print(f"Error processing stream: {e}")
+        await emit("error", {"error": str(e), "success": False})
+    await send({"type": "http.response.body", "body": b""})
+
+
+async def _traced(handler, endpoint: str, scope, receive, send):
+    """Run a handler inside a request trace, echoing its X-Request-ID"""
+    request_id = dict(scope.get("headers", [])).get(b"x-request-id", b"").decode("latin-1")
+    trace = start_trace(endpoint, request_id or None)
+    status = 500
+
+    async def traced_send(message):
+        nonlocal status
+        if message["type"] == "http.response.start":
+            status = message["status"]
+            message = {**message, "headers": list(message.get("headers", []))
+                       + [(b"x-request-id", trace.request_id.encode())]}
+        await send(message)
+
+    try:
+        await handler(scope, receive, traced_send)
+    finally:
+        end_trace(status)
+
+
+async def _read_body(receive) -> bytes:
+    body = b""
+    more_body = True
+    while more_body:
+        message = await receive()
+        body += message.get("body", b"")
+        more_body = message.get("more_body", False)
+    return body
+
+
+def _json_sender(scope, send):
+    """send_json(payload, status) for one request, compressed per its Accept-Encoding"""
+    accept_encoding = dict(scope.get("headers", [])).get(b"accept-encoding", b"").decode("latin-1")
+
+    async def send_json(payload: dict, status: int = 200):
+        body, encoding = compress(dumps(payload), accept_encoding)
+        headers = [
+            (b"content-type", b"application/json"),
+            (b"content-length", str(len(body)).encode()),
+            (b"access-control-allow-origin", b"*"),
+            (b"vary", b"Accept-Encoding")
+        ]
+        if encoding:
+            headers.append((b"content-encoding", encoding.encode()))
+        await send({"type": "http.response.start", "status": status, "headers": headers})
+        await send({"type": "http.response.body", "body": body})
+
+    return send_json
+
+
+async def _lifespan(receive, send):
+    while True:
+        message = await receive()
+        if message["type"] == "lifespan.startup":
+            await send({"type": "lifespan.startup.complete"})
+        elif message["type"] == "lifespan.shutdown":
+            analysis_executor.shutdown(wait=False)
+            await send({"type": "lifespan.shutdown.complete"})
+            return
@@ -0,0 +1,36 @@
+"""
+Benchmark - share of example queries answered by the rule-based fast path
+
+Usage:
+    python -m benchmarks.fast_path_coverage
+"""
+import time
+
+from utils.prompts import EXAMPLE_QUERIES
+from utils.rule_parser import RuleBasedParser
+
+
+def main(repeat: int = 1000):
+    parser = RuleBasedParser(reference_year=2024)
+    queries = [q for group in EXAMPLE_QUERIES for q in group["queries"]]
+
+    local = 0
+    for query in queries:
+        plan = parser.parse(query)
+        path = "rules" if plan is not None else "llm"
+        local += plan is not None
+        print(f"[{path:5}] {query}")
+
+    start = time.perf_counter()
+    for _ in range(repeat):
+        for query in queries:
+            parser.parse(query)
+    elapsed = time.perf_counter() - start
+
+    print(f"\nLocal fast path: {local}/{len(queries)} queries "
+          f"({local / len(queries):.0%}) never hit the network")
+    print(f"Mean rule parse time: {elapsed / (repeat * len(queries)) * 1e6:.1f} us")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,61 @@
+"""
+Benchmark - full recompute time of the graph metrics at 1x and 10x data size
+
+Larger graphs are made by tiling the real edge lists with node index
+offsets plus a few random cross-tile edges, so degree structure stays
+realistic.
+
+Usage:
+    python -m benchmarks.graph_metrics
+"""
+import time
+
+import numpy as np
+
+from utils.data_loader import DataLoader
+from utils.graph import CSRGraph, pagerank, approximate_betweenness
+
+
+def tiled(graph: CSRGraph, factor: int, seed: int = 0) -> CSRGraph:
+    """Copy a graph factor times, linking the copies with random edges"""
+    rows = np.repeat(np.arange(graph.num_nodes), graph.out_degree())
+    if not graph.directed:
+        keep = rows < graph.indices
+        rows, cols, weights = rows[keep], graph.indices[keep], graph.weights[keep]
+    else:
+        cols, weights = graph.indices, graph.weights
+
+    offsets = np.repeat(np.arange(factor) * graph.num_nodes, len(rows))
+    sources = np.tile(rows, factor) + offsets
+    targets = np.tile(cols, factor) + offsets
+    rng = np.random.default_rng(seed)
+    bridges = rng.integers(0, graph.num_nodes * factor, size=(2, len(rows) // 100 * factor))
+    return CSRGraph(
+        node_ids=np.arange(graph.num_nodes * factor).astype(str),
+        sources=np.concatenate([sources, bridges[0]]),
+        targets=np.concatenate([targets, bridges[1]]),
+        weights=np.concatenate([np.tile(weights, factor), np.ones(bridges.shape[1])]),
+        directed=graph.directed
+    )
+
+
+def timed(fn, *args) -> float:
+    start = time.perf_counter()
+    fn(*args)
+    return (time.perf_counter() - start) * 1000
+
+
+def main():
+    loader = DataLoader(data_dir="./data")
+    print(f"\n{'graph':15} {'scale':>5} {'nodes':>8} {'edges':>9} "
+          f"{'degrees ms':>11} {'pagerank ms':>12} {'betweenness ms':>15}")
+    for name, graph in [("citation", loader.citation_graph), ("collaboration", loader.collaboration_graph)]:
+        for factor in (1, 10):
+            g = graph if factor == 1 else tiled(graph, factor)
+            degrees = timed(lambda: (g.in_degree(), g.out_degree(), g.weighted_degree()))
+            print(f"{name:15} {factor:>4}x {g.num_nodes:8d} {g.num_edges:9d} "
+                  f"{degrees:11.1f} {timed(pagerank, g):12.1f} {timed(approximate_betweenness, g):15.1f}")
+
+
+if __name__ == "__main__":
+    main()
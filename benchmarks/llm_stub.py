@@ -0,0 +1,216 @@
+"""
+Offline LLM stub - OpenAI-compatible /chat/completions with canned query plans
+
+Answers the query parser prompt for every /api/examples query with a fixed
+plan after a configurable delay, so the chat pipeline can be load-tested
+without DashScope. Unknown queries get a count-by-year plan. Streamed
+requests ("stream": true) get SSE chunks of ~4 characters each, and
+--tail-tokens appends an explanation after the JSON like a verbose model.
+
+Usage:
+    python -m benchmarks.llm_stub --port 8001 --latency 800 --jitter 200
+    python -m benchmarks.llm_stub --token-delay 20 --tail-tokens 60
+    LLM_BASE_URL=http://127.0.0.1:8001/v1 DASHSCOPE_API_KEY=stub python app.py
+"""
+import argparse
+import json
+import random
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+CANNED_PLANS = {
+    "show me the number of papers by year": {
+        "intent": "count_by_field", "entity": "papers", "groupby": "year", "measure": "count",
+        "filters": {}, "sort": "asc"},
+    "how many papers per field?": {
+        "intent": "count_by_field", "entity": "papers", "groupby": "type", "measure": "count",
+        "filters": {}, "sort": "desc"},
+    "count papers by journal": {
+        "intent": "count_by_field", "entity": "papers", "groupby": "type", "measure": "count",
+        "filters": {}, "sort": "desc"},
+    "top 10 most cited papers": {
+        "intent": "top_ranking", "entity": "papers", "measure": "max",
+        "aggregation_field": "citations", "filters": {}, "limit": 10, "sort": "desc"},
+    "top authors by publication count": {
+        "intent": "top_ranking", "entity": "authors", "measure": "max",
+        "aggregation_field": "paper_count", "filters": {}, "limit": 10, "sort": "desc"},
+    "most productive years": {
+        "intent": "count_by_field", "entity": "papers", "groupby": "year", "measure": "count",
+        "filters": {}, "sort": "desc"},
+    "papers trend over the last 5 years": {
+        "intent": "trend_analysis", "entity": "papers", "groupby": "year", "measure": "count",
+        "filters": {"year": ">=2020"}, "sort": "asc"},
+    "show publication growth": {
+        "intent": "trend_analysis", "entity": "papers", "groupby": "year", "measure": "count",
+        "filters": {}, "sort": "asc"},
+    "citation trend by year": {
+        "intent": "trend_analysis", "entity": "papers", "groupby": "year", "measure": "sum",
+        "aggregation_field": "citations", "filters": {}, "sort": "asc"},
+    "citation count distribution": {
+        "intent": "distribution", "entity": "papers", "measure": "count",
+        "aggregation_field": "citations", "filters": {}, "sort": "desc"},
+    "patent count distribution": {
+        "intent": "distribution", "entity": "papers", "measure": "count",
+        "aggregation_field": "patent_count", "filters": {}, "sort": "desc"},
+    "papers per author distribution": {
+        "intent": "distribution", "entity": "authors", "measure": "count",
+        "aggregation_field": "paper_count", "filters": {}, "sort": "desc"},
+}
+
+DEFAULT_PLAN = {"intent": "count_by_field", "entity": "papers", "groupby": "year",
+                "measure": "count", "filters": {}, "sort": "asc"}
+
+QUERY_PATTERN = re.compile(r"User Query:\s*(.+)")
+
+# Characters per streamed chunk (roughly one token)
+CHUNK_CHARS = 4
+
+
+def canned_reply(messages: list) -> str:
+    """JSON plan for the query embedded in the last user message"""
+    prompt = next((m.get("content", "") for m in reversed(messages) if m.get("role") == "user"), "")
+    match = QUERY_PATTERN.search(prompt)
+    query = match.group(1).strip().strip('"').lower() if match else ""
+    return json.dumps(CANNED_PLANS.get(query, DEFAULT_PLAN))
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    """Handles POST .../chat/completions; settings live on the server object"""
+
+    protocol_version = "HTTP/1.1"
+
+    def do_POST(self):
+        body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+        if not self.path.rstrip("/").endswith("/chat/completions"):
+            return self._reply(404, {"error": {"message": "Not found"}})
+
+        server = self.server
+        delay = max(0.0, server.latency + random.uniform(-server.jitter, server.jitter))
+        time.sleep(delay)
+        if random.random() < server.error_rate:
+            return self._reply(503, {"error": {"message": "Stub upstream unavailable"}})
+
+        messages = body.get("messages", [])
+        content = canned_reply(messages)
+        if server.tail_tokens:
+            content += "\n\nThis plan answers the question" + " directly" * server.tail_tokens + "."
+        prompt_tokens = sum(len(m.get("content", "")) for m in messages) // 4
+        completion_tokens = len(content) // CHUNK_CHARS
+        usage = {"prompt_tokens": prompt_tokens, "completion_tokens": completion_tokens,
+                 "total_tokens": prompt_tokens + completion_tokens}
+        with server.lock:
+            server.calls += 1
+            server.prompt_tokens += prompt_tokens
+            call_id = server.calls
+        head = {"id": f"chatcmpl-stub-{call_id}", "created": int(time.time()),
+                "model": body.get("model", "stub")}
+
+        if body.get("stream"):
+            include_usage = (body.get("stream_options") or {}).get("include_usage", False)
+            return self._stream(head, content, usage if include_usage else None)
+
+        # A non-streamed reply arrives once the whole completion is generated
+        time.sleep(completion_tokens * server.token_delay)
+        self._reply(200, {
+            **head,
+            "object": "chat.completion",
+            "choices": [{"index": 0, "finish_reason": "stop",
+                         "message": {"role": "assistant", "content": content}}],
+            "usage": usage
+        })
+
+    def _stream(self, head: dict, content: str, usage: dict = None):
+        """Send the completion as SSE chunks, one every token_delay seconds"""
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Connection", "close")
+        self.end_headers()
+        self.close_connection = True
+
+        def event(**fields) -> bytes:
+            payload = {**head, "object": "chat.completion.chunk", **fields}
+            return f"data: {json.dumps(payload)}\n\n".encode("utf-8")
+
+        def chunk(delta: dict, finish_reason: str = None) -> bytes:
+            return event(choices=[{"index": 0, "delta": delta, "finish_reason": finish_reason}])
+
+        try:
+            self.wfile.write(chunk({"role": "assistant", "content": ""}))
+            for start in range(0, len(content), CHUNK_CHARS):
+                time.sleep(self.server.token_delay)
+                self.wfile.write(chunk({"content": content[start:start + CHUNK_CHARS]}))
+                self.wfile.flush()
+            self.wfile.write(chunk({}, "stop"))
+            if usage is not None:
+                self.wfile.write(event(choices=[], usage=usage))
+            self.wfile.write(b"data: [DONE]\n\n")
+            self.wfile.flush()
+        except (BrokenPipeError, ConnectionResetError):
+            # The client closed the stream early, e.g. once it had the whole plan
+            with self.server.lock:
+                self.server.streams_closed_early += 1
+
+    def _reply(self, status: int, payload: dict):
+        data = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def serve(host: str = "127.0.0.1", port: int = 0, latency: float = 0.8, jitter: float = 0.2,
+          error_rate: float = 0.0, token_delay: float = 0.0, tail_tokens: int = 0) -> ThreadingHTTPServer:
+    """
+    Start the stub on a background thread
+
+    Args:
+        port: 0 picks a free port (see server.server_address)
+        latency: Mean response delay in seconds
+        jitter: Delay varies uniformly by +/- this many seconds
+        error_rate: Fraction of calls answered with HTTP 503
+        token_delay: Seconds per generated chunk (streamed, or added to a full reply)
+        tail_tokens: Words of explanation the "model" adds after the JSON
+
+    Returns:
+        The running server; call shutdown() to stop it
+    """
+    server = ThreadingHTTPServer((host, port), StubHandler)
+    server.daemon_threads = True
+    server.latency, server.jitter, server.error_rate = latency, jitter, error_rate
+    server.token_delay, server.tail_tokens = token_delay, tail_tokens
+    server.calls = 0
+    server.prompt_tokens = 0
+    server.streams_closed_early = 0
+    server.lock = threading.Lock()
+    threading.Thread(target=server.serve_forever, name="llm-stub", daemon=True).start()
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8001)
+    parser.add_argument("--latency", type=float, default=800, help="Mean delay in ms")
+    parser.add_argument("--jitter", type=float, default=200, help="+/- delay in ms")
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--token-delay", type=float, default=0, help="ms per generated chunk")
+    parser.add_argument("--tail-tokens", type=int, default=0, help="Words of prose after the JSON")
+    args = parser.parse_args()
+
+    server = serve(args.host, args.port, args.latency / 1000, args.jitter / 1000, args.error_rate,
+                   args.token_delay / 1000, args.tail_tokens)
+    print(f"LLM stub listening on http://{args.host}:{server.server_address[1]}/v1")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
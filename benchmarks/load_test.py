@@ -0,0 +1,81 @@
+"""
+Load test - throughput and latency of /api/chat at fixed concurrency
+
+Run the same test against the sync and async servers with the same
+worker count to compare them, e.g.:
+
+    gunicorn -w 1 -b :5001 app:app
+    uvicorn asgi:app --workers 1 --port 5002
+
+    python -m benchmarks.load_test --url http://localhost:5001/api/chat -c 32 -n 256
+    python -m benchmarks.load_test --url http://localhost:5002/api/chat -c 32 -n 256
+
+Queries default to the /api/examples set; use queries the rule parser
+does not handle (or disable the plan cache) to exercise the LLM path.
+"""
+import argparse
+import json
+import time
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from utils.prompts import EXAMPLE_QUERIES
+
+
+def send(url: str, query: str, timeout: float) -> tuple:
+    """POST one query, returning (latency seconds, HTTP status)"""
+    body = json.dumps({"query": query}).encode("utf-8")
+    req = urllib.request.Request(url, data=body, headers={"Content-Type": "application/json"})
+    start = time.perf_counter()
+    try:
+        with urllib.request.urlopen(req, timeout=timeout) as resp:
+            resp.read()
+            status = resp.status
+    except urllib.error.HTTPError as e:
+        status = e.code
+    except Exception:
+        status = 0
+    return time.perf_counter() - start, status
+
+
+def run(url: str, queries: list, concurrency: int, requests: int, timeout: float) -> dict:
+    workload = [queries[i % len(queries)] for i in range(requests)]
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        results = list(pool.map(lambda q: send(url, q, timeout), workload))
+    elapsed = time.perf_counter() - start
+
+    latencies = np.array([latency for latency, _ in results]) * 1000
+    ok = sum(1 for _, status in results if status == 200)
+    return {
+        "url": url,
+        "concurrency": concurrency,
+        "requests": requests,
+        "ok": ok,
+        "errors": requests - ok,
+        "elapsed_s": round(elapsed, 3),
+        "throughput_rps": round(requests / elapsed, 2),
+        "p50_ms": round(float(np.percentile(latencies, 50)), 1),
+        "p95_ms": round(float(np.percentile(latencies, 95)), 1),
+        "p99_ms": round(float(np.percentile(latencies, 99)), 1)
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", default="http://localhost:5001/api/chat")
+    parser.add_argument("-c", "--concurrency", type=int, default=16)
+    parser.add_argument("-n", "--requests", type=int, default=128)
+    parser.add_argument("--timeout", type=float, default=120.0)
+    parser.add_argument("--query", action="append", help="Query to send (repeatable)")
+    args = parser.parse_args()
+
+    queries = args.query or [q for group in EXAMPLE_QUERIES for q in group["queries"]]
+    print(json.dumps(run(args.url, queries, args.concurrency, args.requests, args.timeout), indent=2))
+
+
+if __name__ == "__main__":
+    main()
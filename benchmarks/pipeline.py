@@ -0,0 +1,187 @@
+"""
+End-to-end benchmark - the /api/chat pipeline against the offline LLM stub
+
+Replays the /api/examples query mix at fixed concurrency through the same
+parse -> analyze -> visualize -> serialize path as /api/chat, with the
+Qwen client pointed at benchmarks/llm_stub.py. Reports throughput,
+p50/p95/p99 overall and per stage, and peak RSS. Results are saved as
+JSON with the git commit so runs can be compared across commits.
+
+Usage:
+    python -m benchmarks.pipeline -c 16 -n 256 --output base.json
+    python -m benchmarks.pipeline -c 16 -n 256 --compare base.json
+    python -m benchmarks.pipeline --llm-only    # no rule parser / caches
+    SPECULATIVE_ANALYSIS=1 python -m benchmarks.pipeline --llm-only
+    LLM_STREAM_PARSE=0 python -m benchmarks.pipeline --llm-only --token-delay 20 --tail-tokens 60
+"""
+import argparse
+import json
+import os
+import resource
+import subprocess
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from benchmarks.llm_stub import serve
+from utils.prompts import EXAMPLE_QUERIES
+
+STAGES = ("total", "parse", "llm", "analyze", "viz", "serialize")
+
+
+def git_commit() -> str:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except Exception:
+        return "unknown"
+
+
+def percentiles(samples: list) -> dict:
+    if not samples:
+        return {"p50_ms": None, "p95_ms": None, "p99_ms": None}
+    values = np.array(samples) * 1000
+    return {f"p{p}_ms": round(float(np.percentile(values, p)), 2) for p in (50, 95, 99)}
+
+
+def run(concurrency: int, requests: int, llm_only: bool) -> dict:
+    # Imported after LLM_BASE_URL is set so the shared client targets the stub
+    import app
+    from utils.metrics import current_trace, end_trace, start_trace
+    from utils.plan_cache import PlanCache
+    from utils.result_cache import ResultCache
+    from utils.serialization import dumps
+
+    data_analyst = app.current_analyst()
+    if llm_only:
+        class NoRules:
+            def parse(self, query):
+                return None
+            parse_relaxed = parse
+        # PlanCache keeps at least one entry, so bypass it instead of sizing it to 0
+        class NoPlanCache(PlanCache):
+            def get(self, query):
+                return None
+            def put(self, query, plan):
+                pass
+            def __contains__(self, query):
+                return False
+        app.query_parser.rule_parser = NoRules()
+        app.query_parser.plan_cache = NoPlanCache()
+        app.query_parser.semantic_cache = None
+        data_analyst.result_cache = ResultCache(max_bytes=0)
+
+    def one(query: str) -> dict:
+        start_trace("benchmark")
+        start = time.perf_counter()
+        error = None
+        try:
+            speculation = app.speculator.start(query, data_analyst) if app.speculator else None
+            query_plan = app.query_parser.parse(query)
+            analyzed_data = app._analyze(data_analyst, query_plan, speculation)
+            visualization = app.viz_generator.generate(query_plan, analyzed_data)
+            dumps(app._build_response(query, query_plan, analyzed_data, visualization))
+        except Exception as e:
+            error = str(e)
+        spans = dict(current_trace().spans)
+        spans["total"] = time.perf_counter() - start
+        end_trace(500 if error else 200)
+        return {"spans": spans, "error": error}
+
+    queries = [q for group in EXAMPLE_QUERIES for q in group["queries"]]
+    workload = [queries[i % len(queries)] for i in range(requests)]
+    # Silence per-request prints from the agents
+    stdout, sys.stdout = sys.stdout, open(os.devnull, "w")
+    try:
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            results = list(pool.map(one, workload))
+        elapsed = time.perf_counter() - start
+    finally:
+        sys.stdout.close()
+        sys.stdout = stdout
+
+    return {
+        "commit": git_commit(),
+        "concurrency": concurrency,
+        "requests": requests,
+        "llm_only": llm_only,
+        "speculation": app.speculator.stats() if app.speculator else None,
+        "llm_scheduler": app.query_parser.llm.scheduler.stats(),
+        "errors": sum(1 for r in results if r["error"]),
+        "elapsed_s": round(elapsed, 3),
+        "throughput_rps": round(requests / elapsed, 2),
+        "stages": {stage: percentiles([r["spans"][stage] for r in results if stage in r["spans"]])
+                   for stage in STAGES},
+        "peak_rss_mb": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1)
+    }
+
+
+def print_report(result: dict, baseline: dict = None):
+    print(f"\ncommit {result['commit']}  c={result['concurrency']} n={result['requests']}"
+          f"  llm_only={result['llm_only']}  errors={result['errors']}")
+    if result.get("speculation"):
+        print(f"speculation {result['speculation']}")
+    if result.get("llm_scheduler"):
+        print(f"llm scheduler {result['llm_scheduler']}")
+    print(f"throughput {result['throughput_rps']} req/s   peak RSS {result['peak_rss_mb']} MB")
+    if result.get("llm_calls") is not None:
+        print(f"llm calls {result['llm_calls']}   prompt tokens/call {result.get('prompt_tokens_per_call')}")
+    if baseline:
+        print(f"baseline {baseline['commit']}: {baseline['throughput_rps']} req/s, "
+              f"peak RSS {baseline['peak_rss_mb']} MB")
+    print(f"\n{'stage':10} {'p50 ms':>10} {'p95 ms':>10} {'p99 ms':>10}")
+    for stage, stats in result["stages"].items():
+        cells = []
+        for key in ("p50_ms", "p95_ms", "p99_ms"):
+            value = stats[key]
+            old = baseline["stages"].get(stage, {}).get(key) if baseline else None
+            cell = "-" if value is None else f"{value:.2f}"
+            if value is not None and old:
+                cell += f" ({(value - old) / old:+.0%})"
+            cells.append(cell)
+        print(f"{stage:10} " + " ".join(f"{cell:>10}" for cell in cells))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("-c", "--concurrency", type=int, default=16)
+    parser.add_argument("-n", "--requests", type=int, default=256)
+    parser.add_argument("--latency", type=float, default=800, help="Stub LLM mean delay in ms")
+    parser.add_argument("--jitter", type=float, default=200, help="Stub LLM +/- delay in ms")
+    parser.add_argument("--token-delay", type=float, default=0, help="Stub LLM ms per generated chunk")
+    parser.add_argument("--tail-tokens", type=int, default=0,
+                        help="Words of prose the stub LLM adds after the JSON plan")
+    parser.add_argument("--llm-only", action="store_true",
+                        help="Disable the rule parser, plan caches and result cache")
+    parser.add_argument("--output", help="Write the result as JSON")
+    parser.add_argument("--compare", help="Baseline JSON from an earlier --output")
+    args = parser.parse_args()
+
+    stub = serve(latency=args.latency / 1000, jitter=args.jitter / 1000,
+                 token_delay=args.token_delay / 1000, tail_tokens=args.tail_tokens)
+    os.environ["LLM_BASE_URL"] = f"http://127.0.0.1:{stub.server_address[1]}/v1"
+    os.environ.setdefault("DASHSCOPE_API_KEY", "stub")
+    os.environ.setdefault("LLM_MAX_CONNECTIONS", str(max(args.concurrency, 20)))
+
+    result = run(args.concurrency, args.requests, args.llm_only)
+    result["stub"] = {"latency_ms": args.latency, "jitter_ms": args.jitter,
+                      "token_delay_ms": args.token_delay, "tail_tokens": args.tail_tokens}
+    result["llm_calls"] = stub.calls
+    result["prompt_tokens_per_call"] = round(stub.prompt_tokens / stub.calls, 1) if stub.calls else None
+    stub.shutdown()
+
+    baseline = None
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+    print_report(result, baseline)
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(result, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
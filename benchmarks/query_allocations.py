@@ -0,0 +1,82 @@
+"""
+Benchmark - per-request allocation and latency of DataLoader.query_papers
+
+Compares the current zero-copy query path against the previous
+implementation that copied the whole papers frame and applied filters
+one at a time.
+
+Usage:
+    python -m benchmarks.query_allocations
+"""
+import time
+import tracemalloc
+
+import pandas as pd
+
+from utils.data_loader import DataLoader
+
+PLANS = [
+    {"groupby": "year", "measure": "count"},
+    {"groupby": "type", "measure": "count", "filters": {"year": ">=2022"}},
+    {"groupby": "year", "measure": "sum", "aggregation_field": "citations",
+     "filters": {"year": ">=2021", "type": "paper"}},
+    {"filters": {"year": "<=2021"}, "limit": 50},
+]
+
+
+def legacy_query_papers(papers_df: pd.DataFrame, groupby=None, measure="count",
+                        aggregation_field=None, filters=None, limit=None, sort="desc"):
+    """Copy-then-filter implementation kept for comparison"""
+    df = papers_df.copy()
+    for field, condition in (filters or {}).items():
+        if field in df.columns:
+            if isinstance(condition, str) and condition.startswith(">="):
+                df = df[df[field] >= float(condition[2:])]
+            elif isinstance(condition, str) and condition.startswith("<="):
+                df = df[df[field] <= float(condition[2:])]
+            else:
+                df = df[df[field] == condition]
+    if groupby and groupby in df.columns:
+        if measure in ["sum", "avg", "max", "min"] and aggregation_field:
+            agg_func = {"sum": "sum", "avg": "mean", "max": "max", "min": "min"}[measure]
+            result = df.groupby(groupby, observed=True)[aggregation_field].agg(agg_func).reset_index()
+            result.columns = [groupby, "value"]
+        else:
+            result = df.groupby(groupby, observed=True).size().reset_index(name="count")
+    else:
+        result = df
+    if "count" in result.columns:
+        result = result.sort_values("count", ascending=(sort == "asc"))
+    elif "value" in result.columns:
+        result = result.sort_values("value", ascending=(sort == "asc"))
+    if limit:
+        result = result.head(limit)
+    return result
+
+
+def measure(fn, repeat: int):
+    """Return (mean latency in ms, peak traced allocation in KiB) for fn()"""
+    fn()
+    start = time.perf_counter()
+    for _ in range(repeat):
+        fn()
+    latency = (time.perf_counter() - start) / repeat * 1000
+
+    tracemalloc.start()
+    fn()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return latency, peak / 1024
+
+
+def main(repeat: int = 200):
+    loader = DataLoader(data_dir="./data")
+    print(f"\n{'plan':70} {'legacy ms':>10} {'new ms':>8} {'legacy KiB':>11} {'new KiB':>8}")
+    for plan in PLANS:
+        old_ms, old_kib = measure(lambda: legacy_query_papers(loader.papers_df, **plan), repeat)
+        new_ms, new_kib = measure(lambda: loader.query_papers(**plan), repeat)
+        print(f"{str(plan)[:70]:70} {old_ms:10.3f} {new_ms:8.3f} {old_kib:11.1f} {new_kib:8.1f}")
+
+
+if __name__ == "__main__":
+    main()
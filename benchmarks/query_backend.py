@@ -0,0 +1,138 @@
+"""
+Benchmark - DataLoader query latency on the pandas, DuckDB and SQLite
+backends as the data grows
+
+Larger datasets are made by copying every table factor times with the
+node ids suffixed per copy, so each copy keeps its own citation and
+collaboration edges. Every result is checked against the pandas path.
+
+Usage:
+    python -m benchmarks.query_backend [--scales 1,4,16] [--repeat 20]
+"""
+import argparse
+import copy
+import os
+import statistics
+import tempfile
+import time
+
+import pandas as pd
+
+from utils.data_loader import DataLoader, DATA_TABLES, LINK_TABLES
+from utils.sql_backend import SQLBackend, duckdb
+
+# (table, plan) pairs: cube-covered, multi-column, IN-list, range and join plans
+PLANS = [
+    ("papers", {"groupby": "year", "measure": "count"}),
+    ("papers", {"groupby": ["year", "type"], "filters": {"year": "2021..2023"}}),
+    ("papers", {"groupby": "year", "measure": "avg", "aggregation_field": "citations",
+                "filters": {"citations": ">=5", "type": ["paper"]}}),
+    ("papers", {"groupby": "citations", "limit": 20}),
+    ("papers", {"filters": {"year": [2020, 2024], "citations": ">=50"}, "limit": 50}),
+    ("citation_links", {"groupby": ["citing_year", "cited_year"]}),
+    ("citation_links", {"groupby": "cited_year", "measure": "sum", "aggregation_field": "cited_citations",
+                        "filters": {"citing_year": ">=2022"}}),
+    ("collaboration_links", {"groupby": "author1_paper_count", "measure": "sum",
+                             "aggregation_field": "weight", "filters": {"weight": "2..10"}, "limit": 20}),
+]
+
+# Columns holding node ids, suffixed per copy
+ID_COLUMNS = {
+    "citation_nodes": ["id"],
+    "author_nodes": ["id"],
+    "citation_edges": ["source", "target"],
+    "collaboration_edges": ["author1", "author2"],
+}
+
+
+def scaled_data(source_dir: str, target_dir: str, factor: int):
+    """Write every table copied factor times into target_dir"""
+    for name in DATA_TABLES:
+        path = os.path.join(source_dir, f"{name}.csv")
+        if not os.path.exists(path):
+            continue
+        df = pd.read_csv(path)
+        if name in ID_COLUMNS:
+            copies = []
+            for i in range(factor):
+                part = df.copy()
+                if i:
+                    for column in ID_COLUMNS[name]:
+                        part[column] = part[column].astype(str) + f"-{i}"
+                copies.append(part)
+            df = pd.concat(copies, ignore_index=True)
+        df.to_csv(os.path.join(target_dir, f"{name}.csv"), index=False)
+
+
+def run(loader: DataLoader, table: str, plan: dict) -> pd.DataFrame:
+    if table == "papers":
+        return loader.query_papers(**plan)
+    return loader.query_links(table, **plan)
+
+
+def timed(fn, repeat: int) -> float:
+    """Median latency of fn() in ms, after one warm-up call"""
+    fn()
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - start) * 1000)
+    return statistics.median(samples)
+
+
+def with_backend(loader: DataLoader, engine: str):
+    """Copy of a pandas loader querying through an SQL engine; returns (loader, load ms)"""
+    start = time.perf_counter()
+    backend = SQLBackend(loader._tables(), LINK_TABLES, engine=engine)
+    load_ms = (time.perf_counter() - start) * 1000
+    clone = copy.copy(loader)
+    clone.sql_backend = backend
+    clone.query_backend = backend.engine
+    return clone, load_ms
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--scales", default="1,4,16", help="Comma-separated data size factors")
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--data-dir", default="./data")
+    args = parser.parse_args()
+
+    engines = ["duckdb", "sqlite"] if duckdb is not None else ["sqlite"]
+    if duckdb is None:
+        print("duckdb is not installed; comparing pandas with sqlite only")
+    columns = ["pandas"] + engines
+
+    for factor in [int(scale) for scale in args.scales.split(",")]:
+        with tempfile.TemporaryDirectory() as tmp:
+            scaled_data(args.data_dir, tmp, factor)
+            pandas_loader = DataLoader(data_dir=tmp, query_backend="pandas")
+            loaders = {"pandas": pandas_loader}
+            # pandas' load cost is merging the link frames it caches on first use
+            start = time.perf_counter()
+            for links in LINK_TABLES:
+                pandas_loader._link_frame(links)
+            load_ms = {"pandas": (time.perf_counter() - start) * 1000}
+            for engine in engines:
+                loaders[engine], load_ms[engine] = with_backend(pandas_loader, engine)
+
+            print(f"\n{factor}x: {len(pandas_loader.papers_df)} papers, "
+                  f"{len(pandas_loader.citation_edges_df)} citation edges, "
+                  f"{len(pandas_loader.collaboration_edges_df)} collaboration edges")
+            print(f"{'load ms (pandas: link frames)':62} " + " ".join(f"{load_ms[name]:>9.1f}" for name in columns))
+            print(f"{'plan (median ms)':62} " + " ".join(f"{name:>9}" for name in columns))
+            for table, plan in PLANS:
+                expected = run(pandas_loader, table, plan).reset_index(drop=True)
+                row = []
+                for name in columns:
+                    loader = loaders[name]
+                    result = run(loader, table, plan).reset_index(drop=True)
+                    pd.testing.assert_frame_equal(expected, result, check_exact=False)
+                    row.append(timed(lambda: run(loader, table, plan), args.repeat))
+                label = f"{table} {plan}"[:62]
+                print(f"{label:62} " + " ".join(f"{ms:9.2f}" for ms in row))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,99 @@
+"""
+Benchmark - turning analysis results into records and chart specs
+
+Compares the row-by-row implementations (iterrows, per-bin loops,
+key-by-key record copies) against the current vectorized ones at result
+sizes the "no grouping" path of query_papers can return.
+
+Usage:
+    python -m benchmarks.result_shaping
+"""
+import os
+import time
+
+import numpy as np
+import pandas as pd
+
+os.environ.setdefault("DASHSCOPE_API_KEY", "benchmark")
+
+from agents.data_analyst import DataAnalystAgent
+from agents.viz_generator import VizGeneratorAgent
+from utils.data_loader import DataLoader
+from utils.result_cache import ResultCache
+
+SIZES = [10_000, 30_000, 100_000]
+
+
+def legacy_top_ranking(df: pd.DataFrame, field: str, limit: int):
+    result = []
+    for _, row in df.nlargest(limit, field).iterrows():
+        result.append({"name": row.get("title", "Unknown")[:50] + "...", "value": float(row[field])})
+    return result
+
+
+def legacy_distribution(df: pd.DataFrame, field: str):
+    values = df[field].dropna()
+    bins = min(20, len(values.unique()))
+    hist, _ = pd.cut(values, bins=bins, retbins=True, duplicates="drop")
+    result = []
+    for interval, count in hist.value_counts().sort_index().items():
+        result.append({"bin": f"{interval.left:.0f}-{interval.right:.0f}", "count": int(count),
+                       "min": float(interval.left), "max": float(interval.right)})
+    return result
+
+
+def legacy_stringify(data, field: str):
+    formatted_data = []
+    for item in data:
+        formatted_item = {}
+        for key, value in item.items():
+            formatted_item[key] = str(value) if key == field else value
+        formatted_data.append(formatted_item)
+    return formatted_data
+
+
+def tiled(df: pd.DataFrame, rows: int) -> pd.DataFrame:
+    """Repeat df until it has `rows` rows, with unique ids"""
+    reps = -(-rows // len(df))
+    out = pd.concat([df] * reps, ignore_index=True).head(rows)
+    out["id"] = out["id"].astype(str) + "-" + (np.arange(rows) // len(df)).astype(str)
+    return out
+
+
+def timed(fn, repeat: int) -> float:
+    fn()
+    start = time.perf_counter()
+    for _ in range(repeat):
+        fn()
+    return (time.perf_counter() - start) / repeat * 1000
+
+
+def main(repeat: int = 5):
+    loader = DataLoader(data_dir="./data")
+    base = loader.papers_df
+    viz = VizGeneratorAgent()
+
+    print(f"\n{'stage':22} {'rows':>8} {'legacy ms':>10} {'new ms':>8} {'speedup':>8}")
+    for rows in SIZES:
+        loader.papers_df = tiled(base, rows)
+        analyst = DataAnalystAgent(loader, result_cache=ResultCache(max_bytes=0))
+        top_plan = {"aggregation_field": "citations", "limit": rows}
+        dist_plan = {"aggregation_field": "citations"}
+        records = loader.papers_df.to_dict("records")
+
+        stages = [
+            ("top_ranking", lambda: legacy_top_ranking(loader.papers_df, "citations", rows),
+             lambda: analyst._top_ranking(top_plan, "papers")),
+            ("distribution", lambda: legacy_distribution(loader.papers_df, "citations"),
+             lambda: analyst._distribution(dist_plan, "papers")),
+            ("chart records", lambda: legacy_stringify(records, "id"),
+             lambda: viz._stringify_field(records, "id")),
+        ]
+        for name, old, new in stages:
+            old_ms, new_ms = timed(old, repeat), timed(new, repeat)
+            print(f"{name:22} {rows:8d} {old_ms:10.1f} {new_ms:8.1f} {old_ms / new_ms:7.1f}x")
+    loader.papers_df = base
+
+
+if __name__ == "__main__":
+    main()
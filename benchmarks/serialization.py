@@ -0,0 +1,58 @@
+"""
+Benchmark - size and CPU cost of /api/chat response bodies
+
+Serializes a wide result (the whole papers table, as the "no grouping"
+path of query_papers returns) with the standard library and with the
+fast serializer, with the spec inlining or naming its data, and reports
+the compressed size per encoding.
+
+Usage:
+    python -m benchmarks.serialization
+"""
+import gzip
+import json
+import os
+import time
+
+os.environ.setdefault("DASHSCOPE_API_KEY", "benchmark")
+
+from agents.viz_generator import VizGeneratorAgent
+from app import _build_response
+from utils import serialization
+from utils.data_loader import DataLoader
+
+ROWS = [1_000, 10_000, 30_000]
+
+
+def timed(fn, repeat: int = 5) -> float:
+    fn()
+    start = time.perf_counter()
+    for _ in range(repeat):
+        fn()
+    return (time.perf_counter() - start) / repeat * 1000
+
+
+def main():
+    loader = DataLoader(data_dir="./data")
+    viz = VizGeneratorAgent()
+    plan = {"intent": "count_by_field", "entity": "papers"}
+
+    print(f"\n{'rows':>6} {'spec data':>9} {'json ms':>8} {'fast ms':>8} {'raw KiB':>8} "
+          f"{'gzip KiB':>9} {'br KiB':>7}")
+    for rows in ROWS:
+        data = loader.query_papers(limit=rows).to_dict("records")
+        visualization = viz.generate(plan, data)
+        for named in (False, True):
+            response = _build_response("benchmark", plan, data, visualization, named_data=named)
+            json_ms = timed(lambda: json.dumps(response, default=str).encode("utf-8"))
+            fast_ms = timed(lambda: serialization.dumps(response))
+            body = serialization.dumps(response)
+            gzipped = len(gzip.compress(body, compresslevel=serialization.GZIP_LEVEL))
+            brotli_size = (len(serialization.brotli.compress(body, quality=serialization.BROTLI_QUALITY))
+                           if serialization.brotli else float("nan"))
+            print(f"{rows:6d} {'named' if named else 'inline':>9} {json_ms:8.1f} {fast_ms:8.1f} "
+                  f"{len(body) / 1024:8.1f} {gzipped / 1024:9.1f} {brotli_size / 1024:7.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,26 @@
+"""
+AggregateCube stays bounded on wide low-cardinality tables
+"""
+import numpy as np
+import pandas as pd
+
+from utils.aggregates import AggregateCube
+
+
+def test_cube_size_is_capped():
+    rng = np.random.default_rng(0)
+    df = pd.DataFrame({f"c{i}": rng.integers(0, 60, 5000) for i in range(4)})
+    df["flag"] = rng.integers(0, 2, 5000)
+    df["value"] = rng.random(5000) * 1000
+
+    cube = AggregateCube(df, max_cells=10_000)
+    assert cube.count.size <= 10_000
+    assert "flag" in cube.dimensions and len(cube.dimensions) < 5
+
+    kept = next(d for d in cube.dimensions if d != "flag")
+    result = cube.query(kept, "sum", "value", {"flag": 1}).set_index(kept)["value"]
+    expected = df[df["flag"] == 1].groupby(kept)["value"].sum()
+    pd.testing.assert_series_equal(result, expected, check_names=False, check_index_type=False)
+
+    dropped = next(c for c in ("c0", "c1", "c2", "c3") if c not in cube.dimensions)
+    assert cube.query(dropped) is None
@@ -0,0 +1,43 @@
+"""
+DataAnalystAgent runs the plan its result is cached under
+"""
+import os
+
+import pytest
+
+from agents.data_analyst import DataAnalystAgent
+from utils.data_loader import DataLoader
+from utils.query_plan import plan_key
+from utils.result_cache import ResultCache
+
+DATA_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "data")
+
+
+@pytest.fixture(scope="module")
+def loader():
+    return DataLoader(data_dir=DATA_DIR, query_backend="pandas")
+
+
+def fresh(loader, plan):
+    return DataAnalystAgent(loader, result_cache=ResultCache()).analyze(plan)
+
+
+@pytest.mark.parametrize("variant, plan", [
+    ({"intent": "top_ranking", "entity": "Papers", "aggregation_field": "citations"},
+     {"intent": "top_ranking", "entity": "papers", "aggregation_field": "citations"}),
+    ({"intent": "TOP_RANKING", "aggregation_field": "citations", "limit": "5"},
+     {"intent": "top_ranking", "aggregation_field": "citations", "limit": 5}),
+])
+def test_case_variants_run_the_cached_plan(loader, variant, plan):
+    analyst = DataAnalystAgent(loader, result_cache=ResultCache())
+    assert analyst.analyze(variant) == fresh(loader, plan)
+    # Served from the entry the variant stored
+    assert analyst.analyze(plan) == fresh(loader, plan)
+    assert analyst.result_cache.hits == 1
+
+
+def test_filter_values_keep_their_whitespace():
+    assert (plan_key({"filters": {"type": "book chapter"}})
+            != plan_key({"filters": {"type": "bookchapter"}}))
+    assert (plan_key({"filters": {"year": " >= 2020.0", "citations": "1 .. 5"}})
+            == plan_key({"filters": {"year": ">=2020", "citations": "1..5"}}))
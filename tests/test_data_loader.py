@@ -0,0 +1,42 @@
+"""
+DataLoader query tests against the bundled data
+"""
+import os
+
+import pytest
+
+from utils.data_loader import DataLoader
+
+DATA_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "data")
+
+
+@pytest.fixture(scope="module")
+def loader():
+    return DataLoader(data_dir=DATA_DIR, query_backend="pandas")
+
+
+@pytest.mark.parametrize("filters, expected", [
+    ({"type": "paper", "year": ">=2020"},
+     lambda df: (df["type"] == "paper") & (df["year"] >= 2020)),
+    ({"year": ">=2021", "type": "paper", "citations": "<=10"},
+     lambda df: (df["year"] >= 2021) & (df["type"] == "paper") & (df["citations"] <= 10)),
+    ({"type": "paper", "citations": ">=5"},
+     lambda df: (df["type"] == "paper") & (df["citations"] >= 5)),
+    ({"type": ["paper"], "year": "2021..2023"},
+     lambda df: (df["type"] == "paper") & df["year"].between(2021, 2023)),
+])
+def test_multiple_filters(loader, filters, expected):
+    """Every filter applies, whatever kind comes first"""
+    df = loader.papers_df
+    mask = expected(df)
+    assert mask.sum() > 0
+
+    rows = loader.query_papers(filters=filters)
+    assert len(rows) == mask.sum()
+
+    counts = loader.query_papers(groupby="year", filters=filters)
+    assert counts["count"].sum() == mask.sum()
+
+    sums = loader.query_papers(groupby="year", measure="sum", aggregation_field="citations",
+                               filters=filters)
+    assert sums["value"].sum() == df.loc[mask, "citations"].sum()
@@ -0,0 +1,161 @@
+"""
+LLM admission control and circuit breaking, driven by a fake LLM call
+"""
+import threading
+import time
+
+import httpx
+import pytest
+
+from utils.llm_client import CircuitBreaker, LLMClient, LLMOverloadedError, LLMUnavailableError
+from utils.llm_scheduler import AdmissionRejected, LLMScheduler
+
+
+def wait_until(condition, timeout: float = 5.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "timed out"
+        time.sleep(0.001)
+
+
+def test_concurrency_cap():
+    scheduler = LLMScheduler(max_concurrency=2)
+    running, peak = [0], [0]
+    lock = threading.Lock()
+
+    def fake_llm_call():
+        scheduler.acquire()
+        try:
+            with lock:
+                running[0] += 1
+                peak[0] = max(peak[0], running[0])
+            time.sleep(0.01)
+            with lock:
+                running[0] -= 1
+        finally:
+            scheduler.release()
+
+    threads = [threading.Thread(target=fake_llm_call) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(5)
+    assert peak[0] == 2
+    assert scheduler.stats()["in_flight"] == 0
+    assert scheduler.stats()["admitted"] == 8
+
+
+def test_interactive_calls_are_served_before_batch():
+    scheduler = LLMScheduler(max_concurrency=1)
+    scheduler.acquire()
+    order = []
+
+    def fake_llm_call(name, priority):
+        scheduler.acquire(priority)
+        order.append(name)
+        scheduler.release()
+
+    threads = []
+    # Queued one at a time so the FIFO order within a class is known
+    for name, priority in [("batch-1", "batch"), ("interactive-1", "interactive"),
+                           ("batch-2", "batch"), ("interactive-2", "interactive")]:
+        thread = threading.Thread(target=fake_llm_call, args=(name, priority))
+        thread.start()
+        threads.append(thread)
+        queued = len(threads)
+        wait_until(lambda: sum(scheduler.stats()["queued"].values()) == queued)
+
+    scheduler.release()
+    for thread in threads:
+        thread.join(5)
+    assert order == ["interactive-1", "interactive-2", "batch-1", "batch-2"]
+
+
+def test_full_queue_evicts_batch_for_interactive_and_rejects_batch():
+    scheduler = LLMScheduler(max_concurrency=1, max_queue=1)
+    scheduler.acquire()
+    errors = {}
+
+    def waiter(priority):
+        try:
+            scheduler.acquire(priority)
+            scheduler.release()
+        except AdmissionRejected as e:
+            errors[priority] = str(e)
+
+    batch = threading.Thread(target=waiter, args=("batch",))
+    batch.start()
+    wait_until(lambda: scheduler.stats()["queued"]["batch"] == 1)
+    with pytest.raises(AdmissionRejected):
+        scheduler.acquire("batch")
+
+    interactive = threading.Thread(target=waiter, args=("interactive",))
+    interactive.start()
+    batch.join(5)
+    assert "Displaced" in errors["batch"]
+
+    scheduler.release()
+    interactive.join(5)
+    assert "interactive" not in errors
+    assert scheduler.stats()["evicted"] == 1 and scheduler.stats()["rejected"] == 1
+
+
+def test_waiters_expire_after_their_deadline():
+    scheduler = LLMScheduler(max_concurrency=1, deadlines={"interactive": 0.02})
+    scheduler.acquire()
+    with pytest.raises(AdmissionRejected):
+        scheduler.acquire()
+    assert scheduler.stats()["expired"] == 1
+    assert scheduler.stats()["queued"]["interactive"] == 0
+
+
+def test_breaker_opens_half_opens_and_closes():
+    breaker = CircuitBreaker(threshold=2, cooldown=0.05)
+    breaker.record_failure()
+    assert breaker.state == "closed" and breaker.allow()
+    breaker.record_failure()
+    assert breaker.state == "open" and not breaker.allow()
+    assert breaker.trips == 1
+
+    time.sleep(0.06)
+    assert breaker.state == "half_open"
+    assert breaker.allow()
+    assert not breaker.allow()  # one trial call at a time
+
+    # A failed trial reopens the circuit
+    breaker.record_failure()
+    assert breaker.state == "open"
+    time.sleep(0.06)
+    assert breaker.allow()
+    breaker.record_success()
+    assert breaker.state == "closed" and breaker.failures == 0
+    assert breaker.trips == 1
+
+
+def test_client_sheds_and_breaks_on_fake_upstream():
+    client = LLMClient(api_key="test", max_retries=0,
+                       breaker=CircuitBreaker(threshold=2, cooldown=60),
+                       scheduler=LLMScheduler(max_concurrency=1, max_queue=0))
+    calls = []
+
+    def failing_call():
+        calls.append(1)
+        raise httpx.ConnectError("upstream down")
+
+    for _ in range(2):
+        with pytest.raises(LLMUnavailableError):
+            with client._admitted("test", "interactive"):
+                client._with_retries("test", failing_call)
+    assert client.status()["circuit"] == "open"
+
+    # Open circuit: rejected without calling upstream
+    with pytest.raises(LLMUnavailableError):
+        client._with_retries("test", failing_call)
+    assert len(calls) == 2
+
+    # No free slot and no queue: shed
+    client.scheduler.acquire()
+    with pytest.raises(LLMOverloadedError):
+        with client._admitted("test", "interactive"):
+            pass
+    client.scheduler.release()
@@ -0,0 +1,27 @@
+"""
+PlanCache batches writes to its file
+"""
+import json
+
+from utils.plan_cache import PlanCache
+
+PLAN = {"intent": "count_by_field", "groupby": "year"}
+
+
+def test_puts_are_batched_until_flush(tmp_path):
+    path = tmp_path / "plans.json"
+    cache = PlanCache(path=str(path), flush_interval=3600)
+    for i in range(3):
+        cache.put(f"papers by year {i}", PLAN)
+    assert not path.exists()
+
+    cache.flush()
+    assert len(json.loads(path.read_text())["entries"]) == 3
+    assert PlanCache(path=str(path)).get("papers by year 1") == PLAN
+
+
+def test_zero_interval_writes_every_change(tmp_path):
+    path = tmp_path / "plans.json"
+    cache = PlanCache(path=str(path), flush_interval=0)
+    cache.put("papers by year", PLAN)
+    assert len(json.loads(path.read_text())["entries"]) == 1
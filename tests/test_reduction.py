@@ -0,0 +1,24 @@
+"""
+Chart kinds and reduction of results for the viz templates
+"""
+from utils.reduction import chart_kind, reduce_for_chart
+
+ROWS = [{"id": f"p{i}", "year": 2000 + i % 20, "citations": i % 97} for i in range(3000)]
+
+
+def test_grouped_results_stay_bars():
+    two_keys = [{"citing_year": 2020, "cited_year": 2019, "count": 4}]
+    assert chart_kind({"intent": "count_by_field", "groupby": ["citing_year", "cited_year"]},
+                      two_keys) == "bar"
+    # Rows of an unusable groupby keep the bar template too
+    assert chart_kind({"intent": "count_by_field", "groupby": "venue"}, ROWS[:50]) == "bar"
+
+
+def test_requested_raw_rows_are_binned_into_a_scatter():
+    plan = {"intent": "count_by_field", "groupby": None}
+    assert chart_kind(plan, ROWS[:50]) == "scatter"
+
+    reduced = reduce_for_chart(plan, ROWS, max_points=100)
+    assert len(reduced) <= 100
+    assert sum(cell["count"] for cell in reduced) == len(ROWS)
+    assert chart_kind(plan, reduced) == "scatter"
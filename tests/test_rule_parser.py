@@ -0,0 +1,49 @@
+"""
+Rule-parsed plans must be answered as asked, or left to the LLM
+"""
+import os
+
+import pytest
+
+from agents.data_analyst import DataAnalystAgent
+from utils.data_loader import DataLoader
+from utils.result_cache import ResultCache
+from utils.rule_parser import RuleBasedParser
+
+DATA_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "data")
+
+
+@pytest.fixture(scope="module")
+def loader():
+    return DataLoader(data_dir=DATA_DIR, query_backend="pandas")
+
+
+@pytest.fixture
+def analyst(loader):
+    return DataAnalystAgent(loader, result_cache=ResultCache())
+
+
+@pytest.fixture
+def parser():
+    return RuleBasedParser(reference_year=2024)
+
+
+def test_citation_trend_sums_citations(parser, analyst, loader):
+    plan = parser.parse("citation trend by year")
+    assert plan["measure"] == "sum" and plan["aggregation_field"] == "citations"
+
+    expected = loader.papers_df.groupby("year")["citations"].sum()
+    result = analyst.analyze(plan)
+    assert {row["x"]: row["y"] for row in result} == expected.to_dict()
+
+
+def test_top_n_groups_keep_n(parser, analyst):
+    plan = parser.parse("top 2 years")
+    assert plan["intent"] == "count_by_field" and plan["limit"] == 2
+    assert len(analyst.analyze(plan)) == 2
+    assert "limit" not in parser.parse("most productive years")
+
+
+@pytest.mark.parametrize("query", ["top 10 papers by year", "most cited types"])
+def test_ambiguous_group_rankings_go_to_the_llm(parser, query):
+    assert parser.parse(query) is None
@@ -0,0 +1,45 @@
+"""
+SemanticPlanCache reuses a plan for paraphrases only
+"""
+import pytest
+
+from utils.semantic_cache import SemanticPlanCache, query_signature
+
+CACHED = "papers by journal since 2020"
+PLAN = {"intent": "count_by_field", "groupby": "journal", "filters": {"year": ">=2020"}}
+
+
+@pytest.fixture
+def cache():
+    cache = SemanticPlanCache(max_size=16)
+    cache.put(CACHED, PLAN)
+    return cache
+
+
+@pytest.mark.parametrize("query", [
+    "papers by journal since 2020",
+    "show me the papers per journal since 2020",
+    "Papers by journals since 2020?",
+])
+def test_paraphrases_hit(cache, query):
+    assert cache.get(query) == PLAN
+
+
+@pytest.mark.parametrize("query", [
+    "papers by journal in 2020",
+    "papers by journal after 2020",
+    "papers by journal from 2020",
+    "papers by journal from 2020 to 2022",
+    "papers by journal in the last 2020 years",
+    "papers by journal since 2021",
+    "papers by journal",
+    "authors by journal since 2020",
+])
+def test_different_questions_miss(cache, query):
+    assert cache.get(query) is None
+
+
+def test_comparators_are_part_of_the_signature():
+    signatures = {query_signature(f"papers {word} 2020") for word in ("since", "after", "in", "from")}
+    assert len(signatures) == 4
+    assert query_signature("papers since 2020") == query_signature("show papers since 2020")
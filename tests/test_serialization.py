@@ -0,0 +1,33 @@
+"""
+Response serialization: named-data specs and negotiated compression
+"""
+import pytest
+
+from agents.viz_generator import VizGeneratorAgent
+from utils.serialization import NAMED_DATASET, brotli, compress, with_named_data
+
+
+def test_named_data_sends_the_formatted_values():
+    data = [{"category": 2021, "value": 5}, {"category": 2022, "value": 7}]
+    visualization = VizGeneratorAgent().generate({"intent": "count_by_field", "groupby": "year"}, data)
+    values = visualization["spec"]["data"]["values"]
+
+    named, named_data = with_named_data(visualization, data)
+    assert named["spec"]["data"] == {"name": NAMED_DATASET}
+    assert named_data == values
+    assert [row["category"] for row in named_data] == ["2021", "2022"]
+    # The inline spec is left as it was
+    assert visualization["spec"]["data"]["values"] is values
+
+
+@pytest.mark.parametrize("header, encoding", [
+    ("gzip, br", "br" if brotli else "gzip"),
+    ("br;q=0, gzip", "gzip"),
+    ("br;q=0.0, gzip", "gzip"),
+    ("br; q=0.00, gzip;q=0.5", "gzip"),
+    ("gzip;q=0.000", None),
+    ("gzip;q=0.001", "gzip"),
+    ("identity", None),
+])
+def test_compress_honours_zero_quality(header, encoding):
+    assert compress(b"x" * 4096, header)[1] == encoding
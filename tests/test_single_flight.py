@@ -0,0 +1,48 @@
+"""
+SingleFlight followers get the leader's result, unaffected by what the leader's caller does with it
+"""
+import copy
+import threading
+import time
+
+from utils.single_flight import SingleFlight
+
+
+def test_leader_mutations_do_not_reach_followers():
+    flight = SingleFlight("test")
+    started, release = threading.Event(), threading.Event()
+    results = {}
+
+    def compute():
+        started.set()
+        release.wait(5)
+        return [{"category": 2021, "value": 1}]
+
+    def leader():
+        result = flight.do("key", compute)
+        result[0]["category"] = "mutated"
+        result.append({"category": "extra"})
+        results["leader"] = result
+
+    def follower():
+        results["follower"] = flight.do("key", compute)
+
+    leader_thread = threading.Thread(target=leader)
+    leader_thread.start()
+    started.wait(5)
+    follower_thread = threading.Thread(target=follower)
+    follower_thread.start()
+    while flight.stats()["coalesced"] == 0:
+        time.sleep(0.001)
+    release.set()
+    leader_thread.join(5)
+    follower_thread.join(5)
+
+    assert results["follower"] == [{"category": 2021, "value": 1}]
+
+
+def test_result_is_not_copied_without_followers(monkeypatch):
+    copies = []
+    monkeypatch.setattr(copy, "deepcopy", lambda value: copies.append(value) or value)
+    SingleFlight("test").do("key", lambda: [{"category": 2021}])
+    assert copies == []
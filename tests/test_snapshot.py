@@ -0,0 +1,35 @@
+"""
+Reloads never swap in data that failed to load
+"""
+import os
+import shutil
+
+import pytest
+
+from utils.snapshot import SnapshotManager
+
+DATA_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "data")
+
+
+@pytest.fixture
+def manager(tmp_path, monkeypatch):
+    monkeypatch.setenv("DATA_CACHE", "0")
+    for name in os.listdir(DATA_DIR):
+        if name.endswith(".csv"):
+            shutil.copy(os.path.join(DATA_DIR, name), tmp_path / name)
+    return SnapshotManager(data_dir=str(tmp_path), warm_metrics=())
+
+
+@pytest.mark.parametrize("content", [
+    "id,doi,year\nW1,x,2020\nW2,x,2021,9,9\n",  # malformed CSV
+    "id,doi,citations\nW1,x,3\n",              # no year column
+])
+def test_bad_data_keeps_the_previous_snapshot(manager, content):
+    before = manager.current()
+    with open(os.path.join(manager.data_dir, "citation_nodes.csv"), "w") as f:
+        f.write(content)
+
+    assert manager.reload(wait=True)
+    assert manager.current() is before
+    assert manager.current().data_loader.papers_df is not None
+    assert "citation_nodes" in manager.status()["last_reload_error"]
@@ -0,0 +1,211 @@
+"""
+Pre-aggregated cube over the low-cardinality columns of a table
+"""
+from typing import Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+
+from utils.filters import parse_condition
+
+# Columns with at most this many distinct values become cube dimensions
+MAX_DIMENSION_CARDINALITY = 64
+
+# Cap on cells per cube array (the product of the dimension sizes)
+MAX_CUBE_CELLS = 1 << 18
+
+
+class AggregateCube:
+    """
+    Dense count/sum/min/max cube built once at load time
+
+    Every low-cardinality column is a dimension and every other numeric
+    column is a measure. Count and sum arrays also keep prefix sums along
+    each numeric dimension so range filters (">=2021") are answered with
+    two lookups instead of a scan. While the dimensions would make more
+    than max_cells cells, the one with the most values is left out;
+    queries on it fall back to the frame.
+    """
+
+    def __init__(self, df: pd.DataFrame, max_cardinality: int = MAX_DIMENSION_CARDINALITY,
+                 max_cells: int = MAX_CUBE_CELLS):
+        cardinality = {}
+        for column in df.columns:
+            if not df[column].isna().any():
+                distinct = df[column].nunique(dropna=True)
+                if distinct <= max_cardinality:
+                    cardinality[column] = max(1, distinct)
+        while cardinality and np.prod(list(cardinality.values()), dtype=float) > max_cells:
+            del cardinality[max(cardinality, key=cardinality.get)]
+
+        self.dimensions: List[str] = list(cardinality)
+        self.levels: Dict[str, np.ndarray] = {}
+        self.dimension_dtypes = {}
+        for column in self.dimensions:
+            self.levels[column] = np.sort(pd.unique(df[column].to_numpy()))
+            self.dimension_dtypes[column] = df[column].dtype
+
+        self.measures: List[str] = [
+            column for column in df.columns
+            if column not in self.dimensions and pd.api.types.is_numeric_dtype(df[column])
+            and not pd.api.types.is_bool_dtype(df[column])
+        ]
+        self.measure_dtypes = {measure: df[measure].dtype for measure in self.measures}
+
+        shape = tuple(len(self.levels[d]) for d in self.dimensions)
+        cell = np.zeros(len(df), dtype=np.int64)
+        for dimension in self.dimensions:
+            codes = np.searchsorted(self.levels[dimension], df[dimension].to_numpy())
+            cell = cell * len(self.levels[dimension]) + codes
+        size = int(np.prod(shape)) if shape else 1
+
+        self.count = np.bincount(cell, minlength=size).reshape(shape)
+        self.sum: Dict[str, np.ndarray] = {}
+        self.min: Dict[str, np.ndarray] = {}
+        self.max: Dict[str, np.ndarray] = {}
+        for measure in self.measures:
+            values = df[measure].to_numpy(dtype=np.float64)
+            valid = ~np.isnan(values)
+            self.sum[measure] = np.bincount(cell[valid], weights=values[valid], minlength=size).reshape(shape)
+            minimum = np.full(size, np.inf)
+            maximum = np.full(size, -np.inf)
+            np.minimum.at(minimum, cell[valid], values[valid])
+            np.maximum.at(maximum, cell[valid], values[valid])
+            self.min[measure] = minimum.reshape(shape)
+            self.max[measure] = maximum.reshape(shape)
+
+        # Prefix sums along each numeric dimension, padded with a leading zero
+        self._prefix_count: Dict[str, np.ndarray] = {}
+        self._prefix_sum: Dict[str, Dict[str, np.ndarray]] = {}
+        for axis, dimension in enumerate(self.dimensions):
+            if pd.api.types.is_numeric_dtype(self.levels[dimension].dtype):
+                self._prefix_count[dimension] = _padded_cumsum(self.count, axis)
+                self._prefix_sum[dimension] = {
+                    measure: _padded_cumsum(self.sum[measure], axis) for measure in self.measures
+                }
+
+    def query(self,
+              groupby: str,
+              measure: str = "count",
+              aggregation_field: str = None,
+              filters: Dict = None) -> Optional[pd.DataFrame]:
+        """
+        Answer a grouped aggregation from the cube
+
+        Returns:
+            DataFrame shaped like DataLoader.query_papers output before
+            sorting ([groupby, "count"] or [groupby, "value"]), or None if
+            the cube does not cover the request
+        """
+        if groupby not in self.dimensions:
+            return None
+        is_count = measure == "count" or not aggregation_field
+        if not is_count and (measure not in ("sum", "avg", "max", "min")
+                             or aggregation_field not in self.measures):
+            return None
+
+        # Resolve filters to index ranges along each dimension
+        ranges = {}
+        for field, condition in (filters or {}).items():
+            if field not in self.dimensions:
+                return None
+            selected = self._resolve(field, condition)
+            if selected is None:
+                return None
+            low, high = ranges.get(field, (0, len(self.levels[field])))
+            ranges[field] = (max(low, selected[0]), min(high, selected[1]))
+
+        # Count and sum use the prefix arrays for one ranged numeric dimension
+        prefix_dimension = next(
+            (d for d in ranges if d in self._prefix_count and d != groupby), None
+        )
+
+        def additive(cube: np.ndarray, prefix: Dict[str, np.ndarray]) -> np.ndarray:
+            if prefix_dimension is not None:
+                axis = self.dimensions.index(prefix_dimension)
+                low, high = ranges[prefix_dimension]
+                high = max(low, high)
+                cube = (np.take(prefix[prefix_dimension], high, axis=axis)
+                        - np.take(prefix[prefix_dimension], low, axis=axis))
+                return self._reduce(cube, ranges, groupby, np.sum, skip=prefix_dimension)
+            return self._reduce(cube, ranges, groupby, np.sum)
+
+        counts = additive(self.count, self._prefix_count)
+        present = counts > 0
+        # Group keys keep the column's dtype (e.g. categorical), as a groupby does
+        keys = pd.Series(self.levels[groupby][present]).astype(self.dimension_dtypes[groupby])
+
+        if is_count:
+            return pd.DataFrame({groupby: keys, "count": counts[present].astype(np.int64)})
+
+        if measure in ("sum", "avg"):
+            sums = additive(self.sum[aggregation_field],
+                            {d: p[aggregation_field] for d, p in self._prefix_sum.items()})
+            values = sums if measure == "sum" else sums / np.where(present, counts, 1)
+        elif measure == "max":
+            values = self._reduce(self.max[aggregation_field], ranges, groupby, np.max)
+        else:
+            values = self._reduce(self.min[aggregation_field], ranges, groupby, np.min)
+        values = values[present]
+
+        # Match the dtypes a pandas groupby over the raw column would produce
+        dtype = self.measure_dtypes[aggregation_field]
+        if measure != "avg" and pd.api.types.is_integer_dtype(dtype):
+            values = values.astype(np.int64 if measure == "sum" else dtype)
+        else:
+            values = np.where(np.isinf(values), np.nan, values)
+        return pd.DataFrame({groupby: keys, "value": values})
+
+    def _resolve(self, field: str, condition) -> Optional[tuple]:
+        """Map a filter condition to a half-open index range over a dimension's levels"""
+        levels = self.levels[field]
+        numeric = pd.api.types.is_numeric_dtype(levels.dtype)
+        op, operand = parse_condition(condition, levels.dtype)
+        if op == "in":
+            # Listed values needn't be contiguous; the raw frame answers these
+            return None
+        if op in ("ge", "le", "between"):
+            if not numeric:
+                return None
+            low, high = {"ge": (operand, None), "le": (None, operand), "between": operand}[op]
+            start = 0 if low is None else int(np.searchsorted(levels, low, side="left"))
+            end = len(levels) if high is None else int(np.searchsorted(levels, high, side="right"))
+            return start, end
+
+        matches = np.flatnonzero(levels == operand)
+        if len(matches) == 0:
+            return 0, 0
+        return int(matches[0]), int(matches[0]) + 1
+
+    def _reduce(self, cube: np.ndarray, ranges: Dict, groupby: str, func, skip: str = None) -> np.ndarray:
+        """Slice filtered dimensions and reduce every axis except groupby"""
+        index = []
+        for dimension in self.dimensions:
+            if dimension == skip:
+                continue
+            low, high = ranges.get(dimension, (0, len(self.levels[dimension])))
+            index.append(slice(low, max(low, high)))
+        cube = cube[tuple(index)]
+
+        group_axis = [d for d in self.dimensions if d != skip].index(groupby)
+        other_axes = tuple(axis for axis in range(cube.ndim) if axis != group_axis)
+        if not other_axes:
+            result = cube
+        elif cube.size == 0:
+            result = np.zeros(cube.shape[group_axis])
+        else:
+            result = func(cube, axis=other_axes)
+
+        # Restore the full set of groupby levels so callers can mask by count
+        if groupby in ranges:
+            low, high = ranges[groupby]
+            full = np.zeros(len(self.levels[groupby]), dtype=result.dtype)
+            full[low:max(low, high)] = result
+            return full
+        return result
+
+
+def _padded_cumsum(cube: np.ndarray, axis: int) -> np.ndarray:
+    pad = [(0, 0)] * cube.ndim
+    pad[axis] = (1, 0)
+    return np.pad(np.cumsum(cube, axis=axis), pad)
@@ -0,0 +1,202 @@
+"""
+Columnar binary cache of the data directory CSVs
+
+Each CSV is ingested once into a directory of .npy column files with
+narrow numeric dtypes and integer-coded string columns. The files are
+opened memory-mapped, so worker processes share the pages of numeric
+columns and of string columns' codes instead of each parsing the CSV
+into a private copy. A cache is rebuilt only when the source CSV's
+size/mtime and content hash change.
+
+String categories are not shared: pandas holds categories as Python
+strings, so every worker builds its own copy of each string column's
+distinct values. For near-unique columns (paper / author ids, DOIs)
+that is most of the column's text.
+
+Usage:
+    python -m utils.column_store ./data
+"""
+import hashlib
+import json
+import os
+import shutil
+import sys
+import uuid
+from typing import Dict, Any, Optional
+
+import numpy as np
+import pandas as pd
+
+FORMAT_VERSION = 2
+
+
+class ColumnStore:
+    """Ingests CSV files into memory-mappable .npy columns and loads them back"""
+
+    def __init__(self, data_dir: str = "./data", cache_dir: str = None):
+        self.data_dir = data_dir
+        self.cache_dir = cache_dir or os.path.join(data_dir, ".cache")
+
+    def load(self, name: str) -> Optional[pd.DataFrame]:
+        """
+        Load a table by CSV base name (e.g. "citation_nodes"), ingesting it first if stale
+
+        Returns:
+            DataFrame backed by memory-mapped columns, or None if the CSV is missing
+        """
+        csv_path = os.path.join(self.data_dir, f"{name}.csv")
+        if not os.path.exists(csv_path):
+            return None
+
+        manifest = self._fresh_manifest(name, csv_path)
+        if manifest is None:
+            manifest = self.ingest(name)
+        return self._read(name, manifest)
+
+    def source_hash(self, name: str) -> Optional[str]:
+        """Content hash of the CSV the cached table was built from"""
+        manifest = self._read_manifest(name)
+        return manifest["sha256"] if manifest else None
+
+    def ingest(self, name: str) -> Dict[str, Any]:
+        """Convert a CSV into typed .npy columns and return the new manifest"""
+        csv_path = os.path.join(self.data_dir, f"{name}.csv")
+        sha256 = _file_hash(csv_path)
+        stat = os.stat(csv_path)
+        df = pd.read_csv(csv_path)
+
+        os.makedirs(self.cache_dir, exist_ok=True)
+        table_dir = self._table_dir(name, sha256)
+        tmp_dir = f"{table_dir}.tmp-{uuid.uuid4().hex[:8]}"
+        os.makedirs(tmp_dir)
+
+        columns = []
+        for position, column in enumerate(df.columns):
+            kind = _encode_column(df[column], os.path.join(tmp_dir, f"{position}"))
+            columns.append({"name": column, "kind": kind})
+
+        # Another worker may have finished the same ingest first
+        try:
+            os.rename(tmp_dir, table_dir)
+        except OSError:
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+
+        manifest = {
+            "format_version": FORMAT_VERSION,
+            "mtime_ns": stat.st_mtime_ns,
+            "size": stat.st_size,
+            "sha256": sha256,
+            "rows": len(df),
+            "columns": columns
+        }
+        self._write_manifest(name, manifest)
+        self._remove_stale(name, sha256)
+        print(f"Ingested {name}.csv into columnar cache ({len(df)} rows)")
+        return manifest
+
+    def _fresh_manifest(self, name: str, csv_path: str) -> Optional[Dict[str, Any]]:
+        """Return the manifest if the cache still matches the CSV, else None"""
+        manifest = self._read_manifest(name)
+        if manifest is None or manifest.get("format_version") != FORMAT_VERSION:
+            return None
+        if not os.path.isdir(self._table_dir(name, manifest["sha256"])):
+            return None
+
+        stat = os.stat(csv_path)
+        if stat.st_mtime_ns == manifest["mtime_ns"] and stat.st_size == manifest["size"]:
+            return manifest
+
+        # Touched but unchanged files keep their cache
+        if stat.st_size == manifest["size"] and _file_hash(csv_path) == manifest["sha256"]:
+            manifest["mtime_ns"] = stat.st_mtime_ns
+            self._write_manifest(name, manifest)
+            return manifest
+        return None
+
+    def _read(self, name: str, manifest: Dict[str, Any]) -> pd.DataFrame:
+        table_dir = self._table_dir(name, manifest["sha256"])
+        data = {}
+        for position, column in enumerate(manifest["columns"]):
+            base = os.path.join(table_dir, f"{position}")
+            if column["kind"] == "category":
+                # Codes are stored in pandas' own code dtype, so they stay mapped
+                codes = np.load(f"{base}.codes.npy", mmap_mode="r")
+                categories = np.load(f"{base}.categories.npy")
+                data[column["name"]] = pd.Categorical.from_codes(
+                    codes, dtype=pd.CategoricalDtype(pd.Index(categories, dtype=object)), validate=False
+                )
+            else:
+                data[column["name"]] = np.load(f"{base}.npy", mmap_mode="r")
+        return pd.DataFrame(data, copy=False)
+
+    def _table_dir(self, name: str, sha256: str) -> str:
+        return os.path.join(self.cache_dir, f"{name}-{sha256[:16]}")
+
+    def _manifest_path(self, name: str) -> str:
+        return os.path.join(self.cache_dir, f"{name}.json")
+
+    def _read_manifest(self, name: str) -> Optional[Dict[str, Any]]:
+        try:
+            with open(self._manifest_path(name), "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def _write_manifest(self, name: str, manifest: Dict[str, Any]):
+        path = self._manifest_path(name)
+        tmp_path = f"{path}.tmp-{uuid.uuid4().hex[:8]}"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(manifest, f)
+        os.replace(tmp_path, path)
+
+    def _remove_stale(self, name: str, sha256: str):
+        """Delete cache directories built from older versions of the CSV"""
+        current = os.path.basename(self._table_dir(name, sha256))
+        for entry in os.listdir(self.cache_dir):
+            if entry.startswith(f"{name}-") and entry != current and ".tmp-" not in entry:
+                shutil.rmtree(os.path.join(self.cache_dir, entry), ignore_errors=True)
+
+
+def _encode_column(series: pd.Series, base: str) -> str:
+    """Write one column as .npy file(s) and return its storage kind"""
+    if pd.api.types.is_bool_dtype(series):
+        np.save(f"{base}.npy", series.to_numpy(dtype=bool))
+        return "numeric"
+
+    if pd.api.types.is_numeric_dtype(series):
+        if pd.api.types.is_integer_dtype(series):
+            values = pd.to_numeric(series, downcast="integer").to_numpy()
+        else:
+            values = series.to_numpy(dtype="float64")
+        np.save(f"{base}.npy", values)
+        return "numeric"
+
+    # Strings are dictionary-encoded: integer codes plus a fixed-width category array
+    categorical = pd.Categorical(series)
+    np.save(f"{base}.codes.npy", categorical.codes.astype(_code_dtype(len(categorical.categories))))
+    np.save(f"{base}.categories.npy", np.asarray(categorical.categories.astype(str), dtype=str))
+    return "category"
+
+
+def _code_dtype(category_count: int) -> np.dtype:
+    """Narrowest code dtype, as pandas picks it; any other would be copied on load"""
+    for dtype in (np.int8, np.int16, np.int32):
+        if category_count < np.iinfo(dtype).max:
+            return np.dtype(dtype)
+    return np.dtype(np.int64)
+
+
+def _file_hash(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+if __name__ == "__main__":
+    data_dir = sys.argv[1] if len(sys.argv) > 1 else "./data"
+    store = ColumnStore(data_dir)
+    for filename in sorted(os.listdir(data_dir)):
+        if filename.endswith(".csv"):
+            store.ingest(filename[:-4])
@@ -1,47 +1,249 @@
 """
 Data loading utilities for the agent system
 """
+import hashlib
+import numpy as np
 import pandas as pd
 import os
-from typing import Dict, Any
+import threading
+from typing import Callable, Dict, Any, List, Optional, Union
+from utils.column_store import ColumnStore
+from utils.aggregates import AggregateCube
+from utils.filters import parse_condition
+from utils.graph import CSRGraph, pagerank, approximate_betweenness
+from utils.sql_backend import SQLBackend, value_dtype
+
+# CSV tables (base names) loaded from the data directory
+DATA_TABLES = ("citation_nodes", "author_nodes", "timeline", "citation_edges", "collaboration_edges")
+
+# Query execution backends, selected with QUERY_BACKEND
+QUERY_BACKENDS = ("pandas", "duckdb", "sqlite")
+
+# Edge tables joined to their node table at both ends:
+# view -> (edge table, node table, (edge column, column prefix) per end)
+LINK_TABLES = {
+    "citation_links": ("citation_edges", "papers", ("source", "citing"), ("target", "cited")),
+    "collaboration_links": ("collaboration_edges", "authors", ("author1", "author1"), ("author2", "author2")),
+}
+
+AGG_FUNCS = {"sum": "sum", "avg": "mean", "max": "max", "min": "min"}
+
+# Columns a table must have to be served; papers are the one required table
+REQUIRED_COLUMNS = {
+    "citation_nodes": ("id", "year"),
+    "author_nodes": ("id",),
+    "citation_edges": ("source", "target"),
+    "collaboration_edges": ("author1", "author2"),
+}
 
 class DataLoader:
     """Load and manage scientific publication data"""
     
-    def __init__(self, data_dir: str = "./data"):
+    def __init__(self, data_dir: str = "./data", use_cache: bool = None, query_backend: str = None):
+        """
+        Args:
+            data_dir: Directory holding the CSV tables
+            use_cache: Load through the columnar cache (default: DATA_CACHE != "0")
+            query_backend: "pandas", "duckdb" or "sqlite" (default: QUERY_BACKEND or "pandas")
+        """
         self.data_dir = data_dir
+        if use_cache is None:
+            use_cache = os.environ.get("DATA_CACHE", "1") != "0"
+        if query_backend is None:
+            query_backend = os.environ.get("QUERY_BACKEND", "pandas")
+        self.column_store = ColumnStore(data_dir) if use_cache else None
         self.papers_df = None
         self.authors_df = None
         self.timeline_df = None
+        self.citation_edges_df = None
+        self.collaboration_edges_df = None
+        self.papers_cube = None
+        self.citation_graph = None
+        self.collaboration_graph = None
+        self._graph_metrics: Dict[tuple, np.ndarray] = {}
+        self._graph_metrics_lock = threading.Lock()
+        self._link_frames: Dict[str, pd.DataFrame] = {}
+        self._link_frames_lock = threading.Lock()
+        self.query_backend = "pandas"
+        self.sql_backend = None
+        self.data_version = None
+        self.load_errors: Dict[str, str] = {}
         self._load_data()
+        self.data_version = self._compute_data_version()
+        self._build_aggregates()
+        self._build_graphs()
+        self._build_sql_backend(query_backend)
     
     def _load_data(self):
-        """Load all CSV files"""
+        """Load all data tables; a table that fails to load is recorded in load_errors"""
+        for name, attribute, label in (
+                ("citation_nodes", "papers_df", "papers"),
+                ("author_nodes", "authors_df", "authors"),
+                ("timeline", "timeline_df", "timeline years"),
+                ("citation_edges", "citation_edges_df", "citation edges"),
+                ("collaboration_edges", "collaboration_edges_df", "collaboration edges")):
+            try:
+                df = self._load_table(name)
+            except Exception as e:
+                print(f"Error loading {name}: {e}")
+                self.load_errors[name] = str(e)
+                continue
+            setattr(self, attribute, df)
+            if df is not None:
+                print(f"Loaded {len(df)} {label}")
+    
+    def validate(self) -> List[str]:
+        """
+        Problems that make the loaded data unfit to serve
+        
+        Returns:
+            Empty list if papers loaded and every loaded table has its
+            REQUIRED_COLUMNS, e.g. ["citation_nodes: missing columns year"]
+        """
+        problems = [f"{name}: {error}" for name, error in self.load_errors.items()]
+        tables = {"citation_nodes": self.papers_df, "author_nodes": self.authors_df,
+                  "citation_edges": self.citation_edges_df,
+                  "collaboration_edges": self.collaboration_edges_df}
+        if self.papers_df is None and "citation_nodes" not in self.load_errors:
+            problems.append("citation_nodes: not found")
+        for name, df in tables.items():
+            missing = [column for column in REQUIRED_COLUMNS[name]
+                       if df is not None and column not in df.columns]
+            if missing:
+                problems.append(f"{name}: missing columns {', '.join(missing)}")
+        return problems
+    
+    def _compute_data_version(self) -> str:
+        """Short hash identifying the contents of the loaded data files"""
+        digest = hashlib.sha256()
+        for name in DATA_TABLES:
+            path = os.path.join(self.data_dir, f"{name}.csv")
+            if not os.path.exists(path):
+                continue
+            source = self.column_store.source_hash(name) if self.column_store is not None else None
+            if source is None:
+                stat = os.stat(path)
+                source = f"{stat.st_mtime_ns}:{stat.st_size}"
+            digest.update(f"{name}={source};".encode("utf-8"))
+        return digest.hexdigest()[:16]
+    
+    def _build_aggregates(self):
+        """Pre-aggregate papers over their low-cardinality columns"""
+        if self.papers_df is None:
+            return
         try:
-            papers_path = os.path.join(self.data_dir, "citation_nodes.csv")
-            authors_path = os.path.join(self.data_dir, "author_nodes.csv")
-            timeline_path = os.path.join(self.data_dir, "timeline.csv")
-            
-            if os.path.exists(papers_path):
-                self.papers_df = pd.read_csv(papers_path)
-                print(f"Loaded {len(self.papers_df)} papers")
-            
-            if os.path.exists(authors_path):
-                self.authors_df = pd.read_csv(authors_path)
-                print(f"Loaded {len(self.authors_df)} authors")
-            
-            if os.path.exists(timeline_path):
-                self.timeline_df = pd.read_csv(timeline_path)
-                print(f"Loaded timeline with {len(self.timeline_df)} years")
-                
+            self.papers_cube = AggregateCube(self.papers_df)
+            print(f"Built aggregate cube over {self.papers_cube.dimensions}")
         except Exception as e:
-            print(f"Error loading data: {e}")
+            print(f"Error building aggregate cube: {e}")
+    
+    def _build_graphs(self):
+        """Build CSR graphs over the citation and collaboration edge lists"""
+        try:
+            if self.citation_edges_df is not None:
+                self.citation_graph = CSRGraph.from_edges(
+                    self.citation_edges_df["source"],
+                    self.citation_edges_df["target"],
+                    node_ids=self.papers_df["id"] if self.papers_df is not None else None,
+                    directed=True
+                )
+            if self.collaboration_edges_df is not None:
+                self.collaboration_graph = CSRGraph.from_edges(
+                    self.collaboration_edges_df["author1"],
+                    self.collaboration_edges_df["author2"],
+                    weights=self.collaboration_edges_df["weight"],
+                    node_ids=self.authors_df["id"] if self.authors_df is not None else None,
+                    directed=False
+                )
+        except Exception as e:
+            print(f"Error building graphs: {e}")
+    
+    def _build_sql_backend(self, engine: str):
+        """Load the tables into an embedded SQL engine unless queries run on pandas"""
+        if engine == "pandas":
+            return
+        try:
+            if engine not in QUERY_BACKENDS:
+                raise ValueError(f"expected one of {QUERY_BACKENDS}")
+            self.sql_backend = SQLBackend(self._tables(), LINK_TABLES, engine=engine)
+            self.query_backend = self.sql_backend.engine
+            print(f"Loaded tables into {self.query_backend} for queries")
+        except Exception as e:
+            print(f"Error building {engine} query backend, using pandas: {e}")
+    
+    def _tables(self) -> Dict[str, Optional[pd.DataFrame]]:
+        """Queryable tables by name"""
+        return {
+            "papers": self.papers_df,
+            "authors": self.authors_df,
+            "citation_edges": self.citation_edges_df,
+            "collaboration_edges": self.collaboration_edges_df
+        }
+    
+    def get_graph(self, entity: str) -> Optional[CSRGraph]:
+        """Citation graph for papers, collaboration graph for authors"""
+        return self.citation_graph if entity == "papers" else self.collaboration_graph
+    
+    def graph_metric(self, entity: str, metric: str) -> Optional[np.ndarray]:
+        """
+        Per-node metric over the entity's graph, computed once per loaded data
+        
+        Args:
+            entity: "papers" (citation graph) or "authors" (collaboration graph)
+            metric: "in_degree", "out_degree", "degree", "weighted_degree",
+                "pagerank" or "betweenness"
+        """
+        graph = self.get_graph(entity)
+        if graph is None:
+            return None
+        
+        key = (entity, metric)
+        with self._graph_metrics_lock:
+            if key not in self._graph_metrics:
+                values = self._compute_graph_metric(graph, metric)
+                if values is None:
+                    return None
+                self._graph_metrics[key] = values
+            return self._graph_metrics[key]
+    
+    def _compute_graph_metric(self, graph: CSRGraph, metric: str) -> Optional[np.ndarray]:
+        if metric == "in_degree":
+            return graph.in_degree()
+        elif metric == "out_degree":
+            return graph.out_degree()
+        elif metric == "degree":
+            return graph.out_degree() if not graph.directed else graph.in_degree() + graph.out_degree()
+        elif metric == "weighted_degree":
+            return graph.weighted_degree()
+        elif metric == "pagerank":
+            return pagerank(graph)
+        elif metric == "betweenness":
+            samples = os.environ.get("BETWEENNESS_SAMPLES")
+            return approximate_betweenness(graph, samples=int(samples) if samples else None)
+        return None
+    
+    def _load_table(self, name: str) -> Optional[pd.DataFrame]:
+        """Load one table from the columnar cache, or straight from CSV if disabled"""
+        if self.column_store is not None:
+            try:
+                return self.column_store.load(name)
+            except Exception as e:
+                print(f"Column cache unavailable for {name}, reading CSV: {e}")
+        
+        path = os.path.join(self.data_dir, f"{name}.csv")
+        if os.path.exists(path):
+            return pd.read_csv(path)
+        return None
     
     def get_data_summary(self) -> Dict[str, Any]:
         """Get summary statistics of available data"""
         summary = {
+            "data_version": self.data_version,
+            "query_backend": self.query_backend,
             "papers_count": len(self.papers_df) if self.papers_df is not None else 0,
             "authors_count": len(self.authors_df) if self.authors_df is not None else 0,
+            "citation_edges_count": self.citation_graph.num_edges if self.citation_graph else 0,
+            "collaboration_edges_count": self.collaboration_graph.num_edges if self.collaboration_graph else 0,
             "year_range": None,
             "available_fields": []
         }
@@ -56,8 +258,39 @@ class DataLoader:
         
         return summary
     
-    def query_papers(self, 
-                     groupby: str = None,
+    def get_schema(self, max_values: int = 20) -> Dict[str, Dict[str, Dict[str, Any]]]:
+        """
+        Describe the queryable tables column by column
+
+        Args:
+            max_values: Columns with at most this many distinct values list them
+
+        Returns:
+            {entity: {column: {"dtype", "unique", and "min"/"max" or "values"}}}
+            for the papers and authors tables that are loaded
+        """
+        schema = {}
+        for entity, df in (("papers", self.papers_df), ("authors", self.authors_df)):
+            if df is None:
+                continue
+            columns = {}
+            for name in df.columns:
+                column = df[name]
+                numeric = pd.api.types.is_numeric_dtype(column) and not pd.api.types.is_bool_dtype(column)
+                info = {
+                    "dtype": ("int" if pd.api.types.is_integer_dtype(column) else "float") if numeric else "str",
+                    "unique": int(column.nunique())
+                }
+                if numeric and len(column):
+                    info["min"], info["max"] = column.min().item(), column.max().item()
+                if info["unique"] <= max_values:
+                    info["values"] = sorted(column.dropna().unique().tolist())
+                columns[name] = info
+            schema[entity] = columns
+        return schema
+
+    def query_papers(self,
+                     groupby: Union[str, List[str]] = None,
                      measure: str = "count",
                      aggregation_field: str = None,
                      filters: Dict = None,
@@ -67,55 +300,96 @@ class DataLoader:
         Query papers data with aggregation
         
         Args:
-            groupby: Field to group by (e.g., "year", "field")
+            groupby: Field or list of fields to group by (e.g., "year", ["year", "type"])
             measure: Aggregation function ("count", "sum", "avg", "max", "min")
             aggregation_field: Field to aggregate (for sum, avg, max, min)
-            filters: Dictionary of filters {field: value or condition}
+            filters: Dictionary of filters {field: value, [values], ">=N", "<=N" or "A..B"}
             limit: Limit number of results
             sort: Sort order ("asc" or "desc")
         """
         if self.papers_df is None:
             return pd.DataFrame()
+        return self._query("papers", self.papers_df.columns, lambda: self.papers_df,
+                           groupby, measure, aggregation_field, filters, limit, sort,
+                           cube=self.papers_cube)
+    
+    def query_links(self,
+                    links: str = "citation_links",
+                    groupby: Union[str, List[str]] = None,
+                    measure: str = "count",
+                    aggregation_field: str = None,
+                    filters: Dict = None,
+                    limit: int = None,
+                    sort: str = "desc") -> pd.DataFrame:
+        """
+        Query an edge table joined to the nodes at both of its ends
         
-        df = self.papers_df.copy()
-        
-        # Apply filters
-        if filters:
-            for field, condition in filters.items():
-                if field in df.columns:
-                    if isinstance(condition, str) and condition.startswith(">="):
-                        value = float(condition[2:])
-                        df = df[df[field] >= value]
-                    elif isinstance(condition, str) and condition.startswith("<="):
-                        value = float(condition[2:])
-                        df = df[df[field] <= value]
-                    else:
-                        df = df[df[field] == condition]
-        
-        # Group and aggregate
-        if groupby and groupby in df.columns:
-            if measure == "count":
-                result = df.groupby(groupby).size().reset_index(name="count")
-            elif measure in ["sum", "avg", "max", "min"] and aggregation_field:
-                agg_func = {
-                    "sum": "sum",
-                    "avg": "mean", 
-                    "max": "max",
-                    "min": "min"
-                }[measure]
-                result = df.groupby(groupby)[aggregation_field].agg(agg_func).reset_index()
-                result.columns = [groupby, "value"]
-            else:
-                result = df.groupby(groupby).size().reset_index(name="count")
+        Args:
+            links: "citation_links" (citing_* and cited_* paper columns) or
+                "collaboration_links" (weight, author1_* and author2_* columns)
+            Others as for query_papers; ungrouped rows are ordered by their end ids
+        """
+        if links not in LINK_TABLES:
+            return pd.DataFrame()
+        order_by = [f"{prefix}_id" for _, prefix in LINK_TABLES[links][2:]]
+        if self.sql_backend is not None and links in self.sql_backend.dtypes:
+            columns = list(self.sql_backend.dtypes[links])
         else:
-            # No grouping, just return filtered data
-            result = df
+            frame = self._link_frame(links)
+            if frame is None:
+                return pd.DataFrame()
+            columns = frame.columns
+        return self._query(links, columns, lambda: self._link_frame(links),
+                           groupby, measure, aggregation_field, filters, limit, sort,
+                           order_by=order_by)
+    
+    def _query(self,
+               table: str,
+               columns,
+               frame: Callable[[], pd.DataFrame],
+               groupby: Union[str, List[str]],
+               measure: str,
+               aggregation_field: str,
+               filters: Dict,
+               limit: int,
+               sort: str,
+               cube: AggregateCube = None,
+               order_by: List[str] = None) -> pd.DataFrame:
+        """Drop plan fields the table lacks, then run it on the SQL backend or pandas"""
+        filters = {field: condition for field, condition in (filters or {}).items()
+                   if field in columns}
+        keys = [groupby] if isinstance(groupby, str) else list(groupby or [])
+        keys = [key for key in keys if key in columns]
+        if measure not in AGG_FUNCS or aggregation_field not in columns:
+            measure = None
+        ascending = sort == "asc"
         
-        # Sort
-        if "count" in result.columns:
-            result = result.sort_values("count", ascending=(sort == "asc"))
-        elif "value" in result.columns:
-            result = result.sort_values("value", ascending=(sort == "asc"))
+        if self.sql_backend is not None:
+            try:
+                return self.sql_backend.query(table, keys, measure, aggregation_field, filters,
+                                              limit, ascending, order_by)
+            except Exception as e:
+                print(f"{self.query_backend} query failed, using pandas: {e}")
+        
+        # The shared frame is never copied or mutated: filters are combined
+        # into one mask and only the columns the plan needs are selected
+        df = frame()
+        if keys:
+            # Answer from the pre-built cube when it covers the plan
+            result = None
+            if cube is not None and len(keys) == 1:
+                result = cube.query(keys[0], measure or "count", aggregation_field, filters)
+            if result is None:
+                result = self._aggregate_frame(df, keys, measure, aggregation_field, filters)
+            # Stable, so ties stay in group key order
+            result = result.sort_values("value" if measure else "count",
+                                        ascending=ascending, kind="stable")
+        else:
+            # No grouping, just return filtered data
+            mask = self._filter_mask(df, filters)
+            result = df if mask is None else df[mask]
+            if order_by:
+                result = result.sort_values(order_by, kind="stable")
         
         # Limit
         if limit:
@@ -123,6 +397,75 @@ class DataLoader:
         
         return result
     
+    def _aggregate_frame(self,
+                         df: pd.DataFrame,
+                         keys: List[str],
+                         measure: Optional[str],
+                         aggregation_field: str,
+                         filters: Dict) -> pd.DataFrame:
+        """Group and aggregate the raw frame (fallback when the cube can't answer)"""
+        mask = self._filter_mask(df, filters)
+        by = [df[key] if mask is None else df[key][mask] for key in keys]
+        if measure:
+            values = df[aggregation_field] if mask is None else df[aggregation_field][mask]
+            grouped = values.groupby(by, observed=True).agg(AGG_FUNCS[measure])
+            # pandas keeps small integer sums in the column's dtype only when
+            # they fit; always widen them, as the cube and SQL backends do
+            grouped = grouped.astype(value_dtype(values.dtype, measure))
+            result = grouped.rename("value").reset_index()
+        else:
+            result = by[0].groupby(by, observed=True).size().reset_index(name="count")
+        return result
+    
+    def _filter_mask(self, df: pd.DataFrame, filters: Dict = None) -> Optional[np.ndarray]:
+        """
+        Combine all filter conditions into a single boolean mask
+        
+        Returns:
+            Boolean array over the rows of df, or None if no filter applies
+        """
+        mask = None
+        for field, condition in (filters or {}).items():
+            if field not in df.columns:
+                continue
+            column = df[field]
+            op, operand = parse_condition(condition, column.dtype)
+            if op == "ge":
+                condition_mask = column.to_numpy() >= operand
+            elif op == "le":
+                condition_mask = column.to_numpy() <= operand
+            elif op == "between":
+                values = column.to_numpy()
+                condition_mask = (values >= operand[0]) & (values <= operand[1])
+            elif op == "in":
+                condition_mask = column.isin(operand).to_numpy()
+            else:
+                condition_mask = (column == operand).to_numpy()
+            
+            if mask is None:
+                # Comparisons can return read-only views (pandas copy-on-write);
+                # the combined mask is written in place, so it must be our own
+                mask = condition_mask if condition_mask.flags.writeable else condition_mask.copy()
+            else:
+                np.logical_and(mask, condition_mask, out=mask)
+        return mask
+    
+    def _link_frame(self, links: str) -> Optional[pd.DataFrame]:
+        """Edge table merged with its end nodes, built on first use"""
+        with self._link_frames_lock:
+            if links not in self._link_frames:
+                edges_name, nodes_name, *ends = LINK_TABLES[links]
+                tables = self._tables()
+                edges, nodes = tables[edges_name], tables[nodes_name]
+                if edges is None or nodes is None:
+                    return None
+                frame = edges
+                for column, prefix in ends:
+                    frame = frame.merge(nodes.add_prefix(f"{prefix}_"),
+                                        left_on=column, right_on=f"{prefix}_id")
+                self._link_frames[links] = frame.drop(columns=[column for column, _ in ends])
+            return self._link_frames[links]
+    
     def query_authors(self,
                       groupby: str = None,
                       measure: str = "count",
@@ -133,11 +476,11 @@ class DataLoader:
         if self.authors_df is None:
             return pd.DataFrame()
         
-        df = self.authors_df.copy()
+        df = self.authors_df
         
         if groupby and groupby in df.columns:
             if measure == "count":
-                result = df.groupby(groupby).size().reset_index(name="count")
+                result = df.groupby(groupby, observed=True).size().reset_index(name="count")
             else:
                 result = df
         else:
@@ -145,8 +488,9 @@ class DataLoader:
         
         # For top authors queries
         if aggregation_field and aggregation_field in df.columns:
-            result = df[["name", aggregation_field]].rename(
-                columns={aggregation_field: "value"}
+            name_field = "name" if "name" in df.columns else "id"
+            result = df[[name_field, aggregation_field]].rename(
+                columns={name_field: "name", aggregation_field: "value"}
             )
             result = result.sort_values("value", ascending=(sort == "asc"))
         
@@ -161,6 +505,6 @@ class DataLoader:
             return self.timeline_df
         elif self.papers_df is not None and "year" in self.papers_df.columns:
             # Generate timeline from papers
-            timeline = self.papers_df.groupby("year").size().reset_index(name="paper_count")
+            timeline = self.papers_df.groupby("year", observed=True).size().reset_index(name="paper_count")
             return timeline
         return pd.DataFrame()
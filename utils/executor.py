@@ -0,0 +1,50 @@
+"""
+Bounded thread pool for CPU-bound pipeline stages (pandas analysis, spec building)
+"""
+import asyncio
+import contextvars
+import os
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+
+
+class ExecutorBusyError(RuntimeError):
+    """Raised when the executor already holds its maximum number of tasks"""
+
+
+class BoundedExecutor:
+    """Thread pool that rejects work once max_workers + max_pending tasks are in flight"""
+
+    def __init__(self, max_workers: int = 4, max_pending: int = 64, name: str = "analysis"):
+        self.max_workers = max_workers
+        self.max_pending = max_pending
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix=name)
+        self._slots = threading.BoundedSemaphore(max_workers + max_pending)
+
+    @classmethod
+    def from_env(cls) -> "BoundedExecutor":
+        """Build an executor sized from ANALYSIS_WORKERS / ANALYSIS_QUEUE_SIZE"""
+        return cls(
+            max_workers=int(os.environ.get("ANALYSIS_WORKERS", 4)),
+            max_pending=int(os.environ.get("ANALYSIS_QUEUE_SIZE", 64))
+        )
+
+    def submit(self, fn, *args, **kwargs) -> Future:
+        """Schedule fn(*args, **kwargs), raising ExecutorBusyError if the pool is full"""
+        if not self._slots.acquire(blocking=False):
+            raise ExecutorBusyError("Analysis executor is at capacity")
+        try:
+            # Run in the caller's context so request traces follow the work
+            future = self._executor.submit(contextvars.copy_context().run, fn, *args, **kwargs)
+        except Exception:
+            self._slots.release()
+            raise
+        future.add_done_callback(lambda _: self._slots.release())
+        return future
+
+    async def run(self, fn, *args, **kwargs):
+        """Await fn(*args, **kwargs) on the pool without blocking the event loop"""
+        return await asyncio.wrap_future(self.submit(fn, *args, **kwargs))
+
+    def shutdown(self, wait: bool = True):
+        self._executor.shutdown(wait=wait)
@@ -0,0 +1,78 @@
+"""
+Query plan filter conditions, shared by the pandas, cube and SQL query paths
+"""
+from typing import Any, Tuple
+
+import pandas as pd
+
+
+def parse_condition(condition: Any, dtype=None) -> Tuple[str, Any]:
+    """
+    Normalize one plan filter condition
+
+    Conditions are ">=N", "<=N", "A..B" (inclusive range), a list of
+    allowed values, or a value to match exactly.
+
+    Args:
+        condition: Filter value from the plan
+        dtype: Dtype of the filtered column; when given, operands are
+            converted to it so every query path compares the same values
+            ({"year": "2021"} matches year 2021, a non-numeric value or a
+            range on a text column matches nothing)
+
+    Returns:
+        (op, operand) with op one of "ge", "le", "between", "in", "eq";
+        "between" operands are (low, high) tuples
+    """
+    op, operand = _parse(condition)
+    if dtype is None:
+        return op, operand
+
+    numeric = pd.api.types.is_numeric_dtype(dtype) and not pd.api.types.is_bool_dtype(dtype)
+    if op in ("ge", "le", "between"):
+        return (op, operand) if numeric else ("in", [])
+    convert = _to_number if numeric else _to_text
+    if op == "in":
+        values = [convert(value) for value in operand]
+        return "in", [value for value in values if value is not None]
+    value = convert(operand)
+    return ("eq", value) if value is not None else ("in", [])
+
+
+def _parse(condition: Any) -> Tuple[str, Any]:
+    if isinstance(condition, (list, tuple, set)):
+        return "in", list(condition)
+    if isinstance(condition, str):
+        if condition.startswith(">="):
+            return "ge", float(condition[2:])
+        if condition.startswith("<="):
+            return "le", float(condition[2:])
+        low, separator, high = condition.partition("..")
+        if separator and low and high:
+            try:
+                return "between", (float(low), float(high))
+            except ValueError:
+                pass
+    return "eq", condition
+
+
+def _to_number(value: Any):
+    """Number for a numeric column, or None if the value isn't one"""
+    if isinstance(value, bool) or value is None:
+        return None
+    if isinstance(value, (int, float)):
+        return value
+    try:
+        number = float(str(value).strip())
+    except ValueError:
+        return None
+    return int(number) if number.is_integer() else number
+
+
+def _to_text(value: Any):
+    """String for a text column ("2021" for 2021)"""
+    if value is None:
+        return None
+    if isinstance(value, float) and value.is_integer():
+        value = int(value)
+    return str(value)
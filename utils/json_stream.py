@@ -0,0 +1,55 @@
+"""
+Incremental JSON scanning - finds the end of a streamed JSON object so the
+stream can be closed without waiting for the rest of the reply
+"""
+from typing import Optional
+
+
+class JSONObjectScanner:
+    """
+    Tracks brace depth across streamed text, skipping braces inside strings,
+    and reports the first complete top-level object. Text before it (e.g. a
+    ```json fence or a sentence of preamble) is ignored.
+    """
+
+    def __init__(self):
+        self.text = ""
+        self._pos = 0
+        self._start: Optional[int] = None
+        self._depth = 0
+        self._in_string = False
+        self._escaped = False
+
+    def feed(self, chunk: str) -> Optional[str]:
+        """
+        Add streamed text
+
+        Returns:
+            The complete object's text once its closing brace arrives, else None
+        """
+        self.text += chunk
+        text = self.text
+        for i in range(self._pos, len(text)):
+            char = text[i]
+            if self._start is None:
+                if char == "{":
+                    self._start, self._depth = i, 1
+                continue
+            if self._in_string:
+                if self._escaped:
+                    self._escaped = False
+                elif char == "\\":
+                    self._escaped = True
+                elif char == '"':
+                    self._in_string = False
+            elif char == '"':
+                self._in_string = True
+            elif char == "{":
+                self._depth += 1
+            elif char == "}":
+                self._depth -= 1
+                if self._depth == 0:
+                    self._pos = i + 1
+                    return text[self._start:i + 1]
+        self._pos = len(text)
+        return None
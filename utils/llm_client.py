@@ -0,0 +1,371 @@
+"""
+Shared Qwen client - one pooled connection set with timeouts, retries with
+jittered backoff, a circuit breaker and admission control
+"""
+import asyncio
+import os
+import random
+import threading
+import time
+from contextlib import asynccontextmanager, contextmanager
+from typing import Dict, Any, Optional
+
+import httpx
+from openai import (OpenAI, AsyncOpenAI, DefaultHttpxClient, DefaultAsyncHttpxClient, Timeout,
+                    APIConnectionError, APITimeoutError, InternalServerError, RateLimitError)
+
+from utils.json_stream import JSONObjectScanner
+from utils.llm_scheduler import AdmissionRejected, LLMScheduler
+from utils.metrics import record_llm_call, registry, span
+
+DASHSCOPE_BASE_URL = "https://dashscope.aliyuncs.com/compatible-mode/v1"
+
+# Errors worth retrying; anything else (bad request, auth) fails immediately.
+# Transport errors can also surface while a streamed reply is being read.
+RETRYABLE_ERRORS = (APIConnectionError, APITimeoutError, InternalServerError, RateLimitError,
+                    httpx.TransportError)
+
+LLM_EARLY_STOPS = registry.counter(
+    "paperagent_llm_stream_early_stops_total",
+    "Streamed completions closed once the JSON object was complete, before the model finished",
+    ("agent",))
+
+
+class LLMUnavailableError(RuntimeError):
+    """Raised when the circuit is open or every retry of a call failed"""
+
+
+class LLMOverloadedError(LLMUnavailableError):
+    """Raised when the scheduler sheds a call (queue full or wait deadline passed)"""
+
+
+class StreamedReply:
+    """Text of a streamed completion and the usage it reported, if it got that far"""
+
+    def __init__(self):
+        self.text = ""
+        self.usage = None
+        self.stopped_early = False
+
+
+class CircuitBreaker:
+    """
+    Opens after `threshold` consecutive failures and rejects calls for
+    `cooldown` seconds; then lets one trial call through (half-open) and
+    closes again if it succeeds
+    """
+
+    def __init__(self, threshold: int = 5, cooldown: float = 30.0):
+        self.threshold = threshold
+        self.cooldown = cooldown
+        self.failures = 0
+        self.opened_at: Optional[float] = None
+        self.trips = 0
+        self._trial_running = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self) -> str:
+        if self.opened_at is None:
+            return "closed"
+        if time.monotonic() - self.opened_at >= self.cooldown:
+            return "half_open"
+        return "open"
+
+    def allow(self) -> bool:
+        """Whether a call may go upstream now"""
+        with self._lock:
+            state = self.state
+            if state == "closed":
+                return True
+            if state == "half_open" and not self._trial_running:
+                self._trial_running = True
+                return True
+            return False
+
+    def record_success(self):
+        with self._lock:
+            self.failures = 0
+            self.opened_at = None
+            self._trial_running = False
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            if self._trial_running or self.failures >= self.threshold:
+                if self.opened_at is None:
+                    self.trips += 1
+                self.opened_at = time.monotonic()
+            self._trial_running = False
+
+
+class LLMClient:
+    """OpenAI-compatible chat client shared by all agents"""
+
+    def __init__(self,
+                 api_key: str,
+                 base_url: str = DASHSCOPE_BASE_URL,
+                 model: str = "qwen-plus",
+                 connect_timeout: float = 3.0,
+                 read_timeout: float = 20.0,
+                 max_retries: int = 2,
+                 backoff_base: float = 0.5,
+                 backoff_max: float = 4.0,
+                 max_connections: int = 20,
+                 breaker: CircuitBreaker = None,
+                 scheduler: LLMScheduler = None):
+        self.model = model
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.breaker = breaker if breaker is not None else CircuitBreaker()
+        self.scheduler = scheduler if scheduler is not None else LLMScheduler()
+
+        # Waiting for a free pooled connection counts against the connect timeout,
+        # so a slow upstream rejects new calls instead of queueing them
+        timeout = Timeout(read_timeout, connect=connect_timeout, pool=connect_timeout)
+        limits = httpx.Limits(max_connections=max_connections,
+                              max_keepalive_connections=max_connections)
+        # Retries are ours (jittered, breaker-aware), so the SDK's are disabled
+        self.client = OpenAI(api_key=api_key, base_url=base_url, timeout=timeout, max_retries=0,
+                             http_client=DefaultHttpxClient(limits=limits))
+        self.async_client = AsyncOpenAI(api_key=api_key, base_url=base_url, timeout=timeout,
+                                        max_retries=0,
+                                        http_client=DefaultAsyncHttpxClient(limits=limits))
+
+    @classmethod
+    def from_env(cls) -> "LLMClient":
+        """
+        Build a client from DASHSCOPE_API_KEY and the LLM_* settings
+
+        LLM_BASE_URL points the agents at any OpenAI-compatible endpoint,
+        e.g. the offline stub in benchmarks/llm_stub.py.
+        """
+        api_key = os.environ.get("DASHSCOPE_API_KEY")
+        if not api_key:
+            raise ValueError("DASHSCOPE_API_KEY environment variable not set")
+        return cls(
+            api_key=api_key,
+            base_url=os.environ.get("LLM_BASE_URL", DASHSCOPE_BASE_URL),
+            model=os.environ.get("LLM_MODEL", "qwen-plus"),
+            connect_timeout=float(os.environ.get("LLM_CONNECT_TIMEOUT", 3.0)),
+            read_timeout=float(os.environ.get("LLM_READ_TIMEOUT", 20.0)),
+            max_retries=int(os.environ.get("LLM_MAX_RETRIES", 2)),
+            max_connections=int(os.environ.get("LLM_MAX_CONNECTIONS", 20)),
+            breaker=CircuitBreaker(
+                threshold=int(os.environ.get("LLM_BREAKER_THRESHOLD", 5)),
+                cooldown=float(os.environ.get("LLM_BREAKER_COOLDOWN", 30.0))
+            ),
+            scheduler=LLMScheduler.from_env()
+        )
+
+    def complete(self, messages: list, agent: str, priority: str = "interactive", **kwargs):
+        """
+        Create a chat completion, retrying transient failures
+
+        Args:
+            messages: Chat messages
+            agent: Caller name for metrics
+            priority: Scheduler class, "interactive" or "batch"
+            **kwargs: Extra completion parameters (temperature, max_tokens, ...)
+
+        Returns:
+            The completion response
+
+        Raises:
+            LLMOverloadedError: No concurrency slot was available in time
+            LLMUnavailableError: The circuit is open or all attempts failed
+        """
+        with self._admitted(agent, priority):
+            return self._complete(messages, agent, **kwargs)
+
+    async def acomplete(self, messages: list, agent: str, priority: str = "interactive", **kwargs):
+        """Same as complete, but awaits the slot, the call and the backoff"""
+        async with self._aadmitted(agent, priority):
+            return await self._acomplete(messages, agent, **kwargs)
+
+    def complete_json(self, messages: list, agent: str, priority: str = "interactive",
+                      **kwargs) -> StreamedReply:
+        """
+        Stream a completion whose reply is a JSON object, closing the stream
+        as soon as the object's closing brace arrives
+
+        Args:
+            messages: Chat messages
+            agent: Caller name for metrics
+            priority: Scheduler class, "interactive" or "batch"
+            **kwargs: Extra completion parameters (temperature, max_tokens, ...)
+
+        Returns:
+            StreamedReply whose text is the object (or the whole reply if it
+            never completed one); usage is None when the stream was cut short
+
+        Raises:
+            LLMOverloadedError: No concurrency slot was available in time
+            LLMUnavailableError: The circuit is open or all attempts failed
+        """
+        with self._admitted(agent, priority):
+            return self._with_retries(agent, lambda: self._read_json_stream(messages, agent, **kwargs))
+
+    async def acomplete_json(self, messages: list, agent: str, priority: str = "interactive",
+                             **kwargs) -> StreamedReply:
+        """Same as complete_json, but awaits the slot, the stream and the backoff"""
+        async with self._aadmitted(agent, priority):
+            return await self._awith_retries(agent, lambda: self._aread_json_stream(messages, agent, **kwargs))
+
+    def _complete(self, messages: list, agent: str, **kwargs):
+        return self._with_retries(agent, lambda: self.client.chat.completions.create(
+            model=self.model, messages=messages, **kwargs))
+
+    async def _acomplete(self, messages: list, agent: str, **kwargs):
+        return await self._awith_retries(agent, lambda: self.async_client.chat.completions.create(
+            model=self.model, messages=messages, **kwargs))
+
+    def _read_json_stream(self, messages: list, agent: str, **kwargs) -> StreamedReply:
+        stream = self.client.chat.completions.create(
+            model=self.model, messages=messages, stream=True,
+            stream_options={"include_usage": True}, **kwargs)
+        reply, scanner = StreamedReply(), JSONObjectScanner()
+        try:
+            for chunk in stream:
+                if self._on_chunk(chunk, reply, scanner, agent):
+                    break
+        finally:
+            stream.close()
+        return reply
+
+    async def _aread_json_stream(self, messages: list, agent: str, **kwargs) -> StreamedReply:
+        stream = await self.async_client.chat.completions.create(
+            model=self.model, messages=messages, stream=True,
+            stream_options={"include_usage": True}, **kwargs)
+        reply, scanner = StreamedReply(), JSONObjectScanner()
+        try:
+            async for chunk in stream:
+                if self._on_chunk(chunk, reply, scanner, agent):
+                    break
+        finally:
+            await stream.close()
+        return reply
+
+    @staticmethod
+    def _on_chunk(chunk, reply: StreamedReply, scanner: JSONObjectScanner, agent: str) -> bool:
+        """Consume one stream chunk; True once the JSON object is complete"""
+        if getattr(chunk, "usage", None) is not None:
+            reply.usage = chunk.usage
+        content = chunk.choices[0].delta.content if chunk.choices else None
+        if not content:
+            return False
+        found = scanner.feed(content)
+        reply.text = found if found is not None else scanner.text
+        if found is None:
+            return False
+        reply.stopped_early = chunk.choices[0].finish_reason is None
+        if reply.stopped_early:
+            LLM_EARLY_STOPS.inc(agent=agent)
+        return True
+
+    def _with_retries(self, agent: str, call):
+        """Run call() under the breaker, retrying transient failures with backoff"""
+        for attempt in range(self.max_retries + 1):
+            self._check_breaker(agent)
+            try:
+                with span("llm"):
+                    response = call()
+            except RETRYABLE_ERRORS as e:
+                delay = self._on_failure(agent, attempt, e)
+                time.sleep(delay)
+                continue
+            except Exception:
+                # The upstream answered (e.g. a 4xx), so it is not degraded
+                self.breaker.record_success()
+                record_llm_call(agent, self.model, status="error")
+                raise
+            self.breaker.record_success()
+            record_llm_call(agent, self.model, response)
+            return response
+        raise LLMUnavailableError(f"LLM call failed after {self.max_retries + 1} attempts")
+
+    async def _awith_retries(self, agent: str, call):
+        """Same as _with_retries for a coroutine-returning call"""
+        for attempt in range(self.max_retries + 1):
+            self._check_breaker(agent)
+            try:
+                with span("llm"):
+                    response = await call()
+            except RETRYABLE_ERRORS as e:
+                delay = self._on_failure(agent, attempt, e)
+                await asyncio.sleep(delay)
+                continue
+            except Exception:
+                # The upstream answered (e.g. a 4xx), so it is not degraded
+                self.breaker.record_success()
+                record_llm_call(agent, self.model, status="error")
+                raise
+            self.breaker.record_success()
+            record_llm_call(agent, self.model, response)
+            return response
+        raise LLMUnavailableError(f"LLM call failed after {self.max_retries + 1} attempts")
+
+    def status(self) -> Dict[str, Any]:
+        """Breaker details for health reporting"""
+        return {
+            "model": self.model,
+            "circuit": self.breaker.state,
+            "consecutive_failures": self.breaker.failures,
+            "circuit_trips": self.breaker.trips,
+            "scheduler": self.scheduler.stats()
+        }
+
+    # The slot is held across retries and their backoff, so a struggling
+    # upstream sees no more than max_concurrency calls from this process
+    @contextmanager
+    def _admitted(self, agent: str, priority: str):
+        try:
+            self.scheduler.acquire(priority)
+        except AdmissionRejected as e:
+            record_llm_call(agent, self.model, status="shed")
+            raise LLMOverloadedError(str(e)) from e
+        try:
+            yield
+        finally:
+            self.scheduler.release()
+
+    @asynccontextmanager
+    async def _aadmitted(self, agent: str, priority: str):
+        try:
+            await self.scheduler.aacquire(priority)
+        except AdmissionRejected as e:
+            record_llm_call(agent, self.model, status="shed")
+            raise LLMOverloadedError(str(e)) from e
+        try:
+            yield
+        finally:
+            self.scheduler.release()
+
+    def _check_breaker(self, agent: str):
+        if not self.breaker.allow():
+            record_llm_call(agent, self.model, status="rejected")
+            raise LLMUnavailableError("LLM circuit is open")
+
+    def _on_failure(self, agent: str, attempt: int, error: Exception) -> float:
+        """Record a failed attempt; returns the backoff delay, or raises on the last attempt"""
+        self.breaker.record_failure()
+        record_llm_call(agent, self.model, status="error")
+        print(f"LLM call failed (attempt {attempt + 1}/{self.max_retries + 1}): {error}")
+        if attempt >= self.max_retries:
+            raise LLMUnavailableError(str(error)) from error
+        # Full jitter: uniform over [0, min(cap, base * 2^attempt)]
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * 2 ** attempt))
+
+
+_shared_client: Optional[LLMClient] = None
+_shared_lock = threading.Lock()
+
+
+def get_llm_client() -> LLMClient:
+    """The process-wide LLMClient, created on first use"""
+    global _shared_client
+    with _shared_lock:
+        if _shared_client is None:
+            _shared_client = LLMClient.from_env()
+        return _shared_client
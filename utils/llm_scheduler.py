@@ -0,0 +1,216 @@
+"""
+LLM admission control - caps concurrent Qwen calls and queues the rest by
+priority, shedding calls that would wait too long
+"""
+import asyncio
+import heapq
+import itertools
+import os
+import threading
+import time
+from typing import Dict, Any, Optional
+
+from utils.metrics import registry
+
+# Lower value is served first
+PRIORITIES = {"interactive": 0, "batch": 1}
+
+LLM_QUEUE_DEPTH = registry.gauge(
+    "paperagent_llm_queue_depth", "LLM calls waiting for a concurrency slot", ("priority",))
+LLM_IN_FLIGHT = registry.gauge(
+    "paperagent_llm_in_flight", "LLM calls holding a concurrency slot")
+LLM_QUEUE_WAIT_SECONDS = registry.histogram(
+    "paperagent_llm_queue_wait_seconds", "Time admitted LLM calls waited for a slot", ("priority",))
+LLM_ADMISSIONS = registry.counter(
+    "paperagent_llm_admissions_total",
+    "LLM admission decisions (rejected = queue full, expired = deadline passed, "
+    "evicted = displaced by a higher-priority call)",
+    ("priority", "outcome"))
+
+
+class AdmissionRejected(RuntimeError):
+    """Raised when a call is not admitted; callers degrade instead of waiting"""
+
+
+class _Waiter:
+    """A queued call, woken by a thread event or by resolving an asyncio future"""
+
+    def __init__(self, priority: str, seq: int, loop: asyncio.AbstractEventLoop = None):
+        self.priority = priority
+        self.rank = (PRIORITIES[priority], seq)
+        self.enqueued_at = time.monotonic()
+        self.granted = False
+        self.cancelled = False
+        self.error: Optional[str] = None
+        self.loop = loop
+        if loop is None:
+            self.event = threading.Event()
+        else:
+            self.future = loop.create_future()
+
+    def __lt__(self, other: "_Waiter") -> bool:
+        return self.rank < other.rank
+
+    def wake(self):
+        if self.loop is None:
+            self.event.set()
+        else:
+            self.loop.call_soon_threadsafe(self._resolve)
+
+    def _resolve(self):
+        if not self.future.done():
+            self.future.set_result(None)
+
+
+class LLMScheduler:
+    """
+    Process-wide gate in front of the LLM
+
+    At most `max_concurrency` calls run at once. Further calls wait in a
+    priority queue (interactive before batch, FIFO within a class) of at
+    most `max_queue` entries, each for at most its class's deadline. A
+    full queue makes room for a higher-priority call by evicting the
+    newest lower-priority waiter; otherwise the new call is rejected.
+    Rejected, evicted and expired calls raise AdmissionRejected.
+    """
+
+    def __init__(self, max_concurrency: int = 8, max_queue: int = 64,
+                 deadlines: Dict[str, float] = None):
+        """
+        Args:
+            max_concurrency: Calls allowed upstream at once
+            max_queue: Calls allowed to wait for a slot
+            deadlines: Max seconds to wait per priority class
+        """
+        self.max_concurrency = max(1, int(max_concurrency))
+        self.max_queue = max(0, int(max_queue))
+        self.deadlines = {"interactive": 5.0, "batch": 30.0, **(deadlines or {})}
+        self.in_flight = 0
+        self.counts = {outcome: 0 for outcome in ("admitted", "rejected", "expired", "evicted")}
+        self._queue: list = []
+        self._queued = {priority: 0 for priority in PRIORITIES}
+        self._seq = itertools.count()
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_env(cls) -> "LLMScheduler":
+        """Build from LLM_MAX_CONCURRENCY / LLM_QUEUE_SIZE / LLM_*QUEUE_TIMEOUT"""
+        return cls(
+            max_concurrency=int(os.environ.get("LLM_MAX_CONCURRENCY", 8)),
+            max_queue=int(os.environ.get("LLM_QUEUE_SIZE", 64)),
+            deadlines={
+                "interactive": float(os.environ.get("LLM_QUEUE_TIMEOUT", 5.0)),
+                "batch": float(os.environ.get("LLM_BATCH_QUEUE_TIMEOUT", 30.0))
+            }
+        )
+
+    def acquire(self, priority: str = "interactive"):
+        """Block until a slot is free; raises AdmissionRejected instead of waiting too long"""
+        waiter = self._enqueue(priority)
+        if waiter is not None:
+            waiter.event.wait(self.deadlines[priority])
+            self._settle(waiter)
+
+    async def aacquire(self, priority: str = "interactive"):
+        """Same as acquire, awaiting the slot without blocking the event loop"""
+        waiter = self._enqueue(priority, asyncio.get_running_loop())
+        if waiter is None:
+            return
+        try:
+            await asyncio.wait_for(asyncio.shield(waiter.future), self.deadlines[priority])
+        except asyncio.TimeoutError:
+            pass
+        except asyncio.CancelledError:
+            # The caller went away; hand back a slot granted in the meantime
+            if self._withdraw(waiter):
+                self.release()
+            raise
+        self._settle(waiter)
+
+    def release(self):
+        """Free a slot, handing it straight to the highest-priority waiter"""
+        with self._lock:
+            while self._queue:
+                waiter = heapq.heappop(self._queue)
+                if waiter.cancelled:
+                    continue
+                self._dequeued(waiter)
+                waiter.granted = True
+                waiter.wake()
+                return
+            self.in_flight -= 1
+            LLM_IN_FLIGHT.set(self.in_flight)
+
+    def stats(self) -> Dict[str, Any]:
+        """Queue and admission counters for health reporting"""
+        with self._lock:
+            return {
+                "in_flight": self.in_flight,
+                "max_concurrency": self.max_concurrency,
+                "queued": dict(self._queued),
+                "max_queue": self.max_queue,
+                **self.counts
+            }
+
+    def _enqueue(self, priority: str, loop: asyncio.AbstractEventLoop = None) -> Optional[_Waiter]:
+        """Take a free slot (returns None) or queue a waiter for one"""
+        if priority not in PRIORITIES:
+            raise ValueError(f"Unknown LLM priority: {priority}")
+        with self._lock:
+            if self.in_flight < self.max_concurrency and not any(self._queued.values()):
+                self.in_flight += 1
+                LLM_IN_FLIGHT.set(self.in_flight)
+                self._count(priority, "admitted")
+                LLM_QUEUE_WAIT_SECONDS.observe(0.0, priority=priority)
+                return None
+
+            waiter = _Waiter(priority, next(self._seq), loop)
+            if sum(self._queued.values()) >= self.max_queue:
+                victim = max((w for w in self._queue if not w.cancelled), default=None)
+                if victim is None or victim.rank[0] <= waiter.rank[0]:
+                    self._count(priority, "rejected")
+                    raise AdmissionRejected("LLM queue is full")
+                victim.cancelled = True
+                victim.error = "evicted"
+                self._dequeued(victim)
+                self._count(victim.priority, "evicted")
+                victim.wake()
+
+            heapq.heappush(self._queue, waiter)
+            self._queued[priority] += 1
+            LLM_QUEUE_DEPTH.set(self._queued[priority], priority=priority)
+            return waiter
+
+    def _settle(self, waiter: _Waiter):
+        """After waking or timing out: keep a granted slot or raise"""
+        with self._lock:
+            if waiter.granted:
+                self._count(waiter.priority, "admitted")
+                LLM_QUEUE_WAIT_SECONDS.observe(time.monotonic() - waiter.enqueued_at,
+                                               priority=waiter.priority)
+                return
+            if waiter.error == "evicted":
+                raise AdmissionRejected("Displaced from the LLM queue by higher-priority calls")
+            waiter.cancelled = True
+            self._dequeued(waiter)
+            self._count(waiter.priority, "expired")
+        raise AdmissionRejected(f"No LLM slot within {self.deadlines[waiter.priority]}s")
+
+    def _withdraw(self, waiter: _Waiter) -> bool:
+        """Drop a waiter from the queue; True if it had already been granted a slot"""
+        with self._lock:
+            if waiter.granted:
+                return True
+            if not waiter.cancelled:
+                waiter.cancelled = True
+                self._dequeued(waiter)
+            return False
+
+    def _dequeued(self, waiter: _Waiter):
+        """Update queue depth for a waiter leaving the queue (caller holds the lock)"""
+        self._queued[waiter.priority] -= 1
+        LLM_QUEUE_DEPTH.set(self._queued[waiter.priority], priority=waiter.priority)
+
+    def _count(self, priority: str, outcome: str):
+        self.counts[outcome] += 1
+        LLM_ADMISSIONS.inc(priority=priority, outcome=outcome)
@@ -0,0 +1,281 @@
+"""
+Metrics and request tracing - stage latency histograms, LLM token counters
+and the Prometheus text exposition served on /metrics
+"""
+import contextvars
+import json
+import os
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from typing import Dict, Any, List, Optional, Tuple
+
+# Log one JSON line per request with its spans and token usage
+REQUEST_LOG_JSON = os.environ.get("REQUEST_LOG_JSON", "0") == "1"
+
+# Seconds; covers sub-millisecond cache hits up to slow LLM calls
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5,
+                   1.0, 2.5, 5.0, 10.0, 30.0)
+INF_LABEL = 'le="+Inf"'
+
+
+class _Metric:
+    def __init__(self, name: str, documentation: str, labelnames: Tuple[str, ...], kind: str):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.kind = kind
+        self._lock = threading.Lock()
+
+    def _key(self, labels: Dict[str, Any]) -> Tuple[str, ...]:
+        return tuple(str(labels.get(name, "")) for name in self.labelnames)
+
+    def _format_labels(self, key: Tuple[str, ...], extra: str = "") -> str:
+        parts = [f'{name}="{_escape(value)}"' for name, value in zip(self.labelnames, key)]
+        if extra:
+            parts.append(extra)
+        return "{" + ",".join(parts) + "}" if parts else ""
+
+
+class Counter(_Metric):
+    """Monotonic counter with labels"""
+
+    def __init__(self, name: str, documentation: str, labelnames: Tuple[str, ...] = ()):
+        super().__init__(name, documentation, labelnames, "counter")
+        self._values: Dict[Tuple[str, ...], float] = {}
+
+    def inc(self, amount: float = 1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def samples(self) -> List[str]:
+        with self._lock:
+            items = sorted(self._values.items())
+        return [f"{self.name}{self._format_labels(key)} {_number(value)}" for key, value in items]
+
+
+class Gauge(_Metric):
+    """Value that goes up and down (queue depth, calls in flight) with labels"""
+
+    def __init__(self, name: str, documentation: str, labelnames: Tuple[str, ...] = ()):
+        super().__init__(name, documentation, labelnames, "gauge")
+        self._values: Dict[Tuple[str, ...], float] = {}
+
+    def set(self, value: float, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = value
+
+    def inc(self, amount: float = 1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def dec(self, amount: float = 1, **labels):
+        self.inc(-amount, **labels)
+
+    def samples(self) -> List[str]:
+        with self._lock:
+            items = sorted(self._values.items())
+        return [f"{self.name}{self._format_labels(key)} {_number(value)}" for key, value in items]
+
+
+class Histogram(_Metric):
+    """Cumulative-bucket histogram with labels"""
+
+    def __init__(self, name: str, documentation: str, labelnames: Tuple[str, ...] = (),
+                 buckets: Tuple[float, ...] = LATENCY_BUCKETS):
+        super().__init__(name, documentation, labelnames, "histogram")
+        self.buckets = tuple(sorted(buckets))
+        self._series: Dict[Tuple[str, ...], list] = {}
+
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                # Per-bucket counts, then sum and count
+                series = self._series[key] = [0] * len(self.buckets) + [0.0, 0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series[i] += 1
+                    break
+            series[-2] += value
+            series[-1] += 1
+
+    def samples(self) -> List[str]:
+        with self._lock:
+            items = sorted((key, list(series)) for key, series in self._series.items())
+        lines = []
+        for key, series in items:
+            cumulative = 0
+            for bound, count in zip(self.buckets, series):
+                cumulative += count
+                le = 'le="%s"' % _number(bound)
+                lines.append(f"{self.name}_bucket{self._format_labels(key, le)} {cumulative}")
+            lines.append(f"{self.name}_bucket{self._format_labels(key, INF_LABEL)} {series[-1]}")
+            lines.append(f"{self.name}_sum{self._format_labels(key)} {_number(series[-2])}")
+            lines.append(f"{self.name}_count{self._format_labels(key)} {series[-1]}")
+        return lines
+
+
+class MetricsRegistry:
+    """Collection of metrics rendered together in Prometheus text format"""
+
+    def __init__(self):
+        self._metrics: List[_Metric] = []
+
+    def counter(self, name: str, documentation: str, labelnames: Tuple[str, ...] = ()) -> Counter:
+        metric = Counter(name, documentation, labelnames)
+        self._metrics.append(metric)
+        return metric
+
+    def gauge(self, name: str, documentation: str, labelnames: Tuple[str, ...] = ()) -> Gauge:
+        metric = Gauge(name, documentation, labelnames)
+        self._metrics.append(metric)
+        return metric
+
+    def histogram(self, name: str, documentation: str, labelnames: Tuple[str, ...] = (),
+                  buckets: Tuple[float, ...] = LATENCY_BUCKETS) -> Histogram:
+        metric = Histogram(name, documentation, labelnames, buckets)
+        self._metrics.append(metric)
+        return metric
+
+    def render(self) -> str:
+        lines = []
+        for metric in self._metrics:
+            lines.append(f"# HELP {metric.name} {metric.documentation}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            lines.extend(metric.samples())
+        return "\n".join(lines) + "\n"
+
+
+registry = MetricsRegistry()
+
+REQUEST_SECONDS = registry.histogram(
+    "paperagent_request_duration_seconds", "End-to-end HTTP request latency",
+    ("endpoint", "status"))
+STAGE_SECONDS = registry.histogram(
+    "paperagent_stage_duration_seconds",
+    "Latency of one pipeline stage (parse, llm, analyze, viz, serialize, compress)",
+    ("stage", "intent"))
+LLM_REQUESTS = registry.counter(
+    "paperagent_llm_requests_total", "Chat completion calls", ("agent", "model", "status"))
+LLM_TOKENS = registry.counter(
+    "paperagent_llm_tokens_total", "Tokens reported by chat completion responses",
+    ("agent", "model", "kind"))
+
+
+class RequestTrace:
+    """Spans and LLM usage collected for one request"""
+
+    def __init__(self, endpoint: str, request_id: str = None):
+        self.request_id = request_id or uuid.uuid4().hex
+        self.endpoint = endpoint
+        self.started = time.perf_counter()
+        self.spans: Dict[str, float] = {}
+        self.llm_tokens = {"prompt": 0, "completion": 0}
+        self.fields: Dict[str, Any] = {}
+
+    def finish(self, status: int):
+        """Record the request latency and emit the JSON log line if enabled"""
+        duration = time.perf_counter() - self.started
+        REQUEST_SECONDS.observe(duration, endpoint=self.endpoint, status=status)
+        if REQUEST_LOG_JSON:
+            print(json.dumps({
+                "request_id": self.request_id,
+                "endpoint": self.endpoint,
+                "status": status,
+                "duration_ms": round(duration * 1000, 3),
+                "spans_ms": {name: round(seconds * 1000, 3) for name, seconds in self.spans.items()},
+                "llm_tokens": self.llm_tokens,
+                **self.fields
+            }, default=str))
+
+
+_current_trace: contextvars.ContextVar[Optional[RequestTrace]] = contextvars.ContextVar(
+    "current_trace", default=None)
+
+
+def start_trace(endpoint: str, request_id: str = None) -> RequestTrace:
+    """Begin a trace that spans in this context attach to"""
+    trace = RequestTrace(endpoint, request_id)
+    _current_trace.set(trace)
+    return trace
+
+
+def current_trace() -> Optional[RequestTrace]:
+    return _current_trace.get()
+
+
+def attach_trace(trace: Optional[RequestTrace]):
+    """Make trace current in this context (e.g. a response generator run after its request)"""
+    _current_trace.set(trace)
+
+
+def detach_trace():
+    """Stop attributing spans in this context (e.g. a background task) to the request"""
+    _current_trace.set(None)
+
+
+def annotate(**fields):
+    """Attach fields (e.g. parse_path) to the JSON log line of the current request"""
+    trace = _current_trace.get()
+    if trace is not None:
+        trace.fields.update(fields)
+
+
+def end_trace(status: int, trace: Optional[RequestTrace] = None):
+    """Finish trace, or else the trace of this context, and detach it"""
+    trace = trace or _current_trace.get()
+    _current_trace.set(None)
+    if trace is not None:
+        trace.finish(status)
+
+
+@contextmanager
+def span(stage: str, intent: str = ""):
+    """
+    Time a block as one pipeline stage
+
+    The duration goes to the stage histogram and, when a request trace is
+    active, into that trace (summed if the stage repeats).
+    """
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        duration = time.perf_counter() - start
+        STAGE_SECONDS.observe(duration, stage=stage, intent=intent)
+        trace = _current_trace.get()
+        if trace is not None:
+            trace.spans[stage] = trace.spans.get(stage, 0.0) + duration
+            if intent:
+                trace.fields["intent"] = intent
+
+
+def record_llm_call(agent: str, model: str, response=None, status: str = "ok"):
+    """Count a chat completion call and the token usage it reported"""
+    LLM_REQUESTS.inc(agent=agent, model=model, status=status)
+    usage = getattr(response, "usage", None)
+    if usage is None:
+        return
+    prompt_tokens = getattr(usage, "prompt_tokens", 0) or 0
+    completion_tokens = getattr(usage, "completion_tokens", 0) or 0
+    LLM_TOKENS.inc(prompt_tokens, agent=agent, model=model, kind="prompt")
+    LLM_TOKENS.inc(completion_tokens, agent=agent, model=model, kind="completion")
+    trace = _current_trace.get()
+    if trace is not None:
+        trace.llm_tokens["prompt"] += prompt_tokens
+        trace.llm_tokens["completion"] += completion_tokens
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _number(value: float) -> str:
+    value = float(value)
+    return str(int(value)) if value.is_integer() and abs(value) < 1e15 else repr(value)
@@ -0,0 +1,177 @@
+"""
+Schema-aware query parser prompt - built from the loaded data instead of a
+hand-written schema, within a token budget
+"""
+import json
+import os
+from typing import Dict, Any, List, Tuple
+
+from utils.graph import GRAPH_METRICS
+from utils.metrics import registry
+from utils.prompts import QUERY_PARSER_PROMPT
+from utils.query_plan import INTENTS
+
+LLM_PLANS = registry.counter(
+    "paperagent_llm_plans_total",
+    "LLM-parsed plans by whether every field they use exists in the loaded data",
+    ("validity",))
+
+# Few-shot (question, plan) pairs, most useful first; ones that reference
+# columns the data doesn't have are skipped, and the budget trims from the end
+EXAMPLES: List[Tuple[str, dict]] = [
+    ("Papers per year", {"intent": "count_by_field", "entity": "papers", "groupby": "year",
+                         "measure": "count", "sort": "asc"}),
+    ("Top 10 most cited papers", {"intent": "top_ranking", "entity": "papers", "measure": "max",
+                                  "aggregation_field": "citations", "limit": 10, "sort": "desc"}),
+    ("Publication trend since {recent_year}", {"intent": "trend_analysis", "entity": "papers",
+                                               "groupby": "year", "measure": "count",
+                                               "filters": {"year": ">={recent_year}"}, "sort": "asc"}),
+    ("Top authors by paper count", {"intent": "top_ranking", "entity": "authors", "measure": "max",
+                                    "aggregation_field": "paper_count", "limit": 10, "sort": "desc"}),
+    ("Most collaborative authors", {"intent": "network_ranking", "entity": "authors", "measure": "sum",
+                                    "aggregation_field": "weighted_degree", "limit": 10, "sort": "desc"}),
+    ("Citation count distribution", {"intent": "distribution", "entity": "papers",
+                                     "aggregation_field": "citations"}),
+    ("Co-authors of A5090391261", {"intent": "neighbors", "entity": "authors", "node": "A5090391261",
+                                   "limit": 20}),
+]
+
+# Examples kept even when they overrun the budget
+MIN_EXAMPLES = 2
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough token count (~4 characters per token for English and JSON)"""
+    return len(text) // 4
+
+
+class ParserPrompt:
+    """
+    The query parser's messages for one data snapshot
+
+    The system message (instructions, schema, examples) is fixed per
+    snapshot and the user message holds only the question, so providers
+    that cache prompt prefixes can reuse everything before it.
+    """
+
+    def __init__(self, schema: Dict[str, Dict[str, Dict[str, Any]]] = None, network: bool = True,
+                 token_budget: int = 450):
+        """
+        Args:
+            schema: DataLoader.get_schema() output; None for an unknown schema
+            network: Whether citation / collaboration graphs are loaded
+            token_budget: Target size of the system message in estimated tokens
+        """
+        self.schema = schema or {}
+        self.network = network
+        self.token_budget = token_budget
+        self.examples = self._valid_examples()
+
+        # Trim to the budget: drop examples first, then shorten value lists
+        max_values = 12
+        self.system_message = self._render(len(self.examples), max_values)
+        while estimate_tokens(self.system_message) > token_budget:
+            if len(self.examples) > MIN_EXAMPLES:
+                self.examples = self.examples[:-1]
+            elif max_values > 3:
+                max_values = 3
+            else:
+                print(f"Parser prompt is {estimate_tokens(self.system_message)} tokens, "
+                      f"over its {token_budget} token budget")
+                break
+            self.system_message = self._render(len(self.examples), max_values)
+        self.tokens = estimate_tokens(self.system_message)
+
+    @classmethod
+    def from_loader(cls, data_loader) -> "ParserPrompt":
+        """Prompt for a DataLoader's tables, sized by PARSER_PROMPT_TOKENS"""
+        return cls(
+            schema=data_loader.get_schema(),
+            network=data_loader.citation_graph is not None or data_loader.collaboration_graph is not None,
+            token_budget=int(os.environ.get("PARSER_PROMPT_TOKENS", 450))
+        )
+
+    def messages(self, query: str) -> list:
+        return [
+            {"role": "system", "content": self.system_message},
+            {"role": "user", "content": f"User Query: {query}"}
+        ]
+
+    def invalid_fields(self, query_plan: dict) -> List[str]:
+        """
+        Plan values the loaded data can't answer, e.g. ["groupby:journal"]
+
+        Returns:
+            Empty list if the plan is valid or the schema is unknown
+        """
+        if not self.schema:
+            return []
+        problems = []
+        intent = query_plan.get("intent")
+        if intent not in INTENTS:
+            problems.append(f"intent:{intent}")
+        entity = query_plan.get("entity", "papers")
+        columns = self.schema.get(entity)
+        if columns is None:
+            return problems + [f"entity:{entity}"]
+
+        groupby = query_plan.get("groupby")
+        for column in [groupby] if isinstance(groupby, str) else groupby or []:
+            if column not in columns:
+                problems.append(f"groupby:{column}")
+        field = query_plan.get("aggregation_field")
+        if field and field not in columns and not (self.network and field in GRAPH_METRICS):
+            problems.append(f"aggregation_field:{field}")
+        for column in query_plan.get("filters") or {}:
+            if column not in columns:
+                problems.append(f"filters:{column}")
+        return problems
+
+    def record(self, query_plan: dict) -> List[str]:
+        """Count an LLM plan as valid or invalid; returns its invalid fields"""
+        problems = self.invalid_fields(query_plan)
+        LLM_PLANS.inc(validity="invalid" if problems else "valid")
+        return problems
+
+    def _valid_examples(self) -> List[Tuple[str, dict]]:
+        year = self.schema.get("papers", {}).get("year", {})
+        recent_year = str(year["max"] - 2) if "max" in year else "2020"
+        examples = []
+        for question, plan in EXAMPLES:
+            plan = json.loads(json.dumps(plan).replace("{recent_year}", recent_year))
+            if plan["intent"] == "network_ranking" and not self.network:
+                continue
+            if not self.invalid_fields(plan):
+                examples.append((question.format(recent_year=recent_year), plan))
+        return examples
+
+    def _render(self, example_count: int, max_values: int) -> str:
+        if self.schema:
+            schema = "\n".join(f"- {entity}({', '.join(self._column(name, info, max_values) for name, info in columns.items())})"
+                               for entity, columns in self.schema.items())
+        else:
+            schema = "- papers, authors (columns unknown)"
+        network = ""
+        metric_hint = ""
+        if self.network:
+            network = ("Graphs: paper->paper citations, author<->author collaborations. "
+                       f"Network metrics: {', '.join(GRAPH_METRICS)}\n")
+            metric_hint = " or network metric"
+        examples = "\n".join(f"Q: {question}\nA: {json.dumps(plan, separators=(',', ':'))}"
+                             for question, plan in self.examples[:example_count])
+        return QUERY_PARSER_PROMPT.format(intents=" | ".join(INTENTS), schema=schema,
+                                          network=network, metric_hint=metric_hint,
+                                          examples=examples)
+
+    @staticmethod
+    def _column(name: str, info: Dict[str, Any], max_values: int) -> str:
+        text = f"{name}:{info['dtype']}"
+        if "min" in info:
+            return f"{text} {info['min']}..{info['max']}"
+        values = info.get("values")
+        if values:
+            shown = [str(value) for value in values[:max_values]]
+            if len(values) > max_values:
+                shown.append("...")
+            return f"{text} {{{'|'.join(shown)}}}"
+        return text
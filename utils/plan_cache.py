@@ -0,0 +1,179 @@
+"""
+Query plan cache - skips the LLM round-trip for repeated queries
+"""
+import atexit
+import copy
+import json
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Any, Optional
+
+
+class PlanCache:
+    """
+    LRU + TTL cache of parsed query plans, keyed on normalized query text
+
+    With a path, changes are written back at most every flush_interval
+    seconds (and at exit) from a background timer, outside the lock, so
+    lookups never wait on disk I/O.
+    """
+
+    def __init__(self, max_size: int = 256, ttl: float = 3600.0, path: str = None,
+                 flush_interval: float = 5.0):
+        """
+        Args:
+            max_size: Maximum number of cached plans (least recently used are evicted)
+            ttl: Seconds a plan stays valid; 0 or less disables expiry
+            path: Optional JSON file used to persist the cache across restarts
+            flush_interval: Seconds to batch changes before writing them to path;
+                0 writes after every change
+        """
+        self.max_size = max(1, int(max_size))
+        self.ttl = float(ttl)
+        self.path = path
+        self.flush_interval = float(flush_interval)
+        self.hits = 0
+        self.misses = 0
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+        # Changes not yet on disk, and whether a flush is already scheduled
+        self._dirty = False
+        self._flush_timer: Optional[threading.Timer] = None
+        self._save_lock = threading.Lock()
+
+        if self.path:
+            self._load()
+            atexit.register(self.flush)
+
+    @classmethod
+    def from_env(cls) -> "PlanCache":
+        """Build a cache configured from PLAN_CACHE_* environment variables"""
+        return cls(
+            max_size=int(os.environ.get("PLAN_CACHE_SIZE", 256)),
+            ttl=float(os.environ.get("PLAN_CACHE_TTL", 3600)),
+            path=os.environ.get("PLAN_CACHE_PATH") or None,
+            flush_interval=float(os.environ.get("PLAN_CACHE_FLUSH_INTERVAL", 5))
+        )
+
+    @staticmethod
+    def normalize(query: str) -> str:
+        """Normalize query text so trivial variations share a cache entry"""
+        text = re.sub(r"\s+", " ", query.strip().lower())
+        return text.rstrip("?.! ")
+
+    def get(self, query: str) -> Optional[dict]:
+        """Return a copy of the cached plan for a query, or None on a miss"""
+        key = self.normalize(query)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and self._expired(entry[0]):
+                del self._entries[key]
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            plan = entry[1]
+        return copy.deepcopy(plan)
+
+    def __contains__(self, query: str) -> bool:
+        """Whether a fresh plan is cached, without touching hit/miss counters"""
+        with self._lock:
+            entry = self._entries.get(self.normalize(query))
+            return entry is not None and not self._expired(entry[0])
+
+    def put(self, query: str, plan: dict):
+        """Store a plan for a query, evicting the least recently used entries"""
+        key = self.normalize(query)
+        with self._lock:
+            self._entries[key] = (time.time(), copy.deepcopy(plan))
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+        self._changed()
+
+    def clear(self):
+        """Drop all cached plans and reset counters"""
+        with self._lock:
+            self._entries.clear()
+            self.hits = 0
+            self.misses = 0
+        self._changed()
+
+    def flush(self):
+        """Write pending changes to path now"""
+        if not self.path:
+            return
+        # Writers go one at a time, so an older snapshot never replaces a newer one
+        with self._save_lock:
+            with self._lock:
+                if not self._dirty:
+                    return
+                self._dirty = False
+                self._flush_timer = None
+                # Stored plans are never mutated, so a shallow snapshot is enough
+                entries = [[key, stored_at, plan] for key, (stored_at, plan) in self._entries.items()]
+            self._save(entries)
+
+    def stats(self) -> Dict[str, Any]:
+        """Get cache counters for health reporting"""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self._entries),
+                "max_size": self.max_size,
+                "ttl": self.ttl,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+                "persistent": bool(self.path)
+            }
+
+    def _expired(self, stored_at: float) -> bool:
+        return self.ttl > 0 and time.time() - stored_at > self.ttl
+
+    def _load(self):
+        """Load persisted entries, skipping expired ones"""
+        if not os.path.exists(self.path):
+            return
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                stored = json.load(f)
+            for key, stored_at, plan in stored.get("entries", []):
+                if not self._expired(stored_at):
+                    self._entries[key] = (stored_at, plan)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+            print(f"Loaded {len(self._entries)} cached query plans")
+        except Exception as e:
+            print(f"Error loading plan cache: {e}")
+
+    def _changed(self):
+        """Mark the cache dirty and schedule a flush, unless one is pending"""
+        if not self.path:
+            return
+        with self._lock:
+            self._dirty = True
+            if self._flush_timer is not None or self.flush_interval <= 0:
+                schedule = None
+            else:
+                schedule = self._flush_timer = threading.Timer(self.flush_interval, self.flush)
+                schedule.daemon = True
+        if schedule is not None:
+            schedule.start()
+        elif self.flush_interval <= 0:
+            self.flush()
+
+    def _save(self, entries: list):
+        """Persist entries atomically through a temp file and rename (caller holds _save_lock)"""
+        try:
+            tmp_path = f"{self.path}.tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump({"entries": entries}, f)
+            os.replace(tmp_path, self.path)
+        except Exception as e:
+            print(f"Error saving plan cache: {e}")
@@ -1,42 +1,27 @@
-QUERY_PARSER_PROMPT = """You are a Query Parser Agent for a scientific publication database.
-
-Your task is to analyze the user's natural language query and extract structured information.
-
-Available data schema:
-- Papers: id, title, year, field, journal, citations_count, patent_count
-- Authors: id, name, paper_count, collaboration_count
-- Timeline: year, paper_count
-
-User Query: {query}
-
-Analyze the query and respond with a JSON object with this structure:
-{{
-  "intent": "one of: count_by_field, top_ranking, trend_analysis, distribution, comparison",
-  "entity": "papers or authors",
-  "groupby": "field name to group by (e.g., year, field, journal)",
-  "measure": "what to measure (e.g., count, sum, avg)",
-  "aggregation_field": "field to aggregate if measure is not count",
-  "filters": {{}},
-  "limit": "number for top N queries",
-  "sort": "asc or desc"
-}}
+# Static system prompt of the query parser, filled in once per data snapshot by
+# utils/parser_prompt.py; the question goes in a separate, final user message so
+# every call shares this prefix (provider-side prompt caching)
+QUERY_PARSER_PROMPT = """You are the Query Parser of a scientific publication database. Turn the user's question into a JSON query plan.
+
+Tables (column:type, numeric range or {{values}}):
+{schema}
+{network}
+Plan keys (omit those that don't apply):
+- intent: {intents}
+- entity: papers | authors
+- groupby: column to group by
+- measure: count | sum | avg | max | min
+- aggregation_field: column{metric_hint} to aggregate or rank by
+- filters: {{column: value | ">=N" | "<=N" | "A..B" (inclusive range) | [value, ...] (any of)}}
+- limit: N for top-N questions
+- node: paper or author id (neighbors)
+- sort: asc | desc
+Use only the columns listed above.
 
 Examples:
-Query: "Show me the number of papers by year"
-Response: {{"intent": "count_by_field", "entity": "papers", "groupby": "year", "measure": "count", "filters": {{}}, "sort": "asc"}}
+{examples}
 
-Query: "Top 10 most cited papers"
-Response: {{"intent": "top_ranking", "entity": "papers", "measure": "max", "aggregation_field": "citations_count", "limit": 10, "sort": "desc"}}
-
-Query: "Papers trend over the last 5 years"
-Response: {{"intent": "trend_analysis", "entity": "papers", "groupby": "year", "measure": "count", "filters": {{"year": ">=2019"}}, "sort": "asc"}}
-
-IMPORTANT: 
-1. Return ONLY valid JSON, no extra text
-2. Use exact field names from the schema
-3. If unsure, choose the most reasonable interpretation
-
-Now analyze the user's query and return the JSON:"""
+Reply with the JSON object only."""
 
 DATA_ANALYST_PROMPT = """You are a Data Analyst Agent.
 
@@ -112,3 +97,39 @@ Generate the Vega-Lite specification:"""
 SYSTEM_MESSAGE = """You are a helpful AI assistant specialized in analyzing scientific publication data.
 You work as part of a multi-agent system to help users understand research trends and patterns.
 Always be precise, factual, and provide actionable insights."""
+
+
+EXAMPLE_QUERIES = [
+    {
+        "category": "Count & Statistics",
+        "queries": [
+            "Show me the number of papers by year",
+            "How many papers per field?",
+            "Count papers by journal"
+        ]
+    },
+    {
+        "category": "Rankings",
+        "queries": [
+            "Top 10 most cited papers",
+            "Top authors by publication count",
+            "Most productive years"
+        ]
+    },
+    {
+        "category": "Trends",
+        "queries": [
+            "Papers trend over the last 5 years",
+            "Show publication growth",
+            "Citation trend by year"
+        ]
+    },
+    {
+        "category": "Distributions",
+        "queries": [
+            "Citation count distribution",
+            "Patent count distribution",
+            "Papers per author distribution"
+        ]
+    }
+]
@@ -0,0 +1,88 @@
+"""
+Query plan canonicalization - lets equivalent plans share work and cache entries
+"""
+import json
+from typing import Any, Dict
+
+# Intents DataAnalystAgent can answer
+INTENTS = ("count_by_field", "top_ranking", "trend_analysis", "distribution",
+           "comparison", "network_ranking", "neighbors")
+
+# Keys that describe how a plan was produced rather than what it asks for
+NON_SEMANTIC_KEYS = {"parse_path", "original_query"}
+
+PLAN_DEFAULTS = {
+    "intent": "count_by_field",
+    "entity": "papers",
+    "measure": "count",
+    "filters": {},
+    "sort": "desc"
+}
+
+
+def canonical_plan(query_plan: dict) -> Dict[str, Any]:
+    """
+    Normalize a query plan so equivalent plans compare equal
+
+    Defaults are filled in, provenance keys dropped, string values
+    lower-cased where the schema is case-insensitive, whitespace removed
+    from comparison and range conditions (">= 2020" -> ">=2020") and limits
+    coerced to int. Other filter values are kept as written, and an empty
+    groupby (raw rows) stays distinct from a missing one (by year).
+    DataAnalystAgent runs the canonical plan, so a key always names the
+    result computed for it.
+    """
+    plan = {key: value for key, value in query_plan.items()
+            if key not in NON_SEMANTIC_KEYS and (value is not None or key == "groupby")}
+    for key, default in PLAN_DEFAULTS.items():
+        plan.setdefault(key, default)
+    if "groupby" in plan and not plan["groupby"]:
+        plan["groupby"] = None
+
+    for key in ("intent", "entity", "measure", "sort"):
+        if isinstance(plan[key], str):
+            plan[key] = plan[key].strip().lower()
+
+    plan["filters"] = {field: _canonical_condition(condition) if isinstance(condition, str) else condition
+                       for field, condition in (plan.get("filters") or {}).items()}
+
+    if "limit" in plan:
+        try:
+            plan["limit"] = int(plan["limit"])
+        except (TypeError, ValueError):
+            del plan["limit"]
+    return plan
+
+
+def plan_key(query_plan: dict) -> str:
+    """Stable string key of a plan's canonical form"""
+    return json.dumps(canonical_plan(query_plan), sort_keys=True, default=str)
+
+
+def _canonical_condition(condition: str) -> str:
+    """'>= 2020.0' -> '>=2020', '2020 .. 2022' -> '2020..2022'; other values unchanged"""
+    text = condition.strip()
+    if text[:2] in (">=", "<="):
+        return text[:2] + _normalize_number(text[2:].strip())
+    low, separator, high = text.partition("..")
+    low, high = _normalize_number(low.strip()), _normalize_number(high.strip())
+    if separator and _is_number(low) and _is_number(high):
+        return f"{low}..{high}"
+    return condition
+
+
+def _is_number(text: str) -> bool:
+    try:
+        float(text)
+    except ValueError:
+        return False
+    return True
+
+
+def _normalize_number(text: str) -> str:
+    """'2020.0' -> '2020' so numerically equal bounds share a key"""
+    try:
+        value = float(text)
+    except ValueError:
+        return text
+    return str(int(value)) if value.is_integer() else repr(value)
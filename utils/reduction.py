@@ -0,0 +1,194 @@
+"""
+Chart data reduction - bounds the number of points a chart carries
+
+Runs between DataAnalystAgent and VizGeneratorAgent: nominal bars keep
+their top K categories plus an "Other" bucket, line charts are
+downsampled with Largest-Triangle-Three-Buckets, and raw rows drawn as a
+scatter plot are pre-binned into a 2D grid of counts.
+Only plans that explicitly ask for ungrouped rows ("groupby": null) are
+drawn as a scatter; everything else keeps its chart.
+"""
+import math
+import os
+from numbers import Number
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+MAX_CHART_POINTS = int(os.environ.get("MAX_CHART_POINTS", 1000))
+
+RANKING_INTENTS = ("top_ranking", "network_ranking", "neighbors")
+
+
+def _is_number(value) -> bool:
+    # NaN is how pandas fills gaps in text columns, so it doesn't count
+    return isinstance(value, Number) and not isinstance(value, bool) and value == value
+
+
+def numeric_fields(row: Dict) -> List[str]:
+    """Keys of a record whose values are numbers"""
+    return [key for key, value in row.items() if _is_number(value)]
+
+
+def raw_rows_requested(query_plan: dict) -> bool:
+    """Whether a plan asks for ungrouped rows ("groupby" present but empty)"""
+    return "groupby" in query_plan and not query_plan["groupby"]
+
+
+def chart_kind(query_plan: dict, data: List[Dict]) -> str:
+    """
+    Chart a result is drawn as: "bar", "hbar", "line", "histogram" or "scatter"
+
+    Raw rows of a plan that asks for them (more than two fields, at least
+    two numeric) are drawn as a scatter of their first two numeric fields;
+    grouped results and rows of an unusable groupby stay bars.
+    """
+    intent = query_plan.get("intent", "count_by_field")
+    if intent in RANKING_INTENTS:
+        return "hbar"
+    if intent == "trend_analysis":
+        return "line"
+    if intent == "distribution":
+        return "histogram"
+    if (raw_rows_requested(query_plan) and data
+            and len(data[0]) > 2 and len(numeric_fields(data[0])) >= 2):
+        return "scatter"
+    return "bar"
+
+
+def reduce_for_chart(query_plan: dict, data: List[Dict], max_points: int = None) -> List[Dict]:
+    """
+    Shrink a result to at most max_points records for its chart type
+
+    Args:
+        query_plan: Plan the result was produced for
+        data: Records from DataAnalystAgent
+        max_points: Cap on records (defaults to MAX_CHART_POINTS)
+
+    Returns:
+        The records unchanged if within the cap, otherwise a reduced copy
+    """
+    max_points = max(3, max_points or MAX_CHART_POINTS)
+    if len(data) <= max_points:
+        return data
+
+    kind = chart_kind(query_plan, data)
+    keys = list(data[0].keys())
+    if kind == "scatter":
+        x_field, y_field = numeric_fields(data[0])[:2]
+        reduced = bin_2d(data, x_field, y_field, max_points)
+    elif kind == "line" and len(keys) > 1:
+        reduced = lttb(data, keys[0], keys[1], max_points)
+    elif kind in ("bar", "hbar"):
+        category_field, value_field = _bar_fields(data[0])
+        reduced = top_k_with_other(data, category_field, value_field, max_points)
+    else:
+        return data
+
+    print(f"Reduced {len(data)} {kind} points to {len(reduced)}")
+    return reduced
+
+
+def _bar_fields(row: Dict) -> Tuple[str, Optional[str]]:
+    """Category is the first field, value the first numeric field after it"""
+    keys = list(row.keys())
+    values = [key for key in numeric_fields(row) if key != keys[0]]
+    return keys[0], values[0] if values else None
+
+
+def top_k_with_other(data: List[Dict], category_field: str, value_field: Optional[str],
+                     k: int) -> List[Dict]:
+    """
+    Keep the k - 1 largest bars (in their original order) and sum the rest
+    into one "Other" bar; without a numeric value field, rows are counted
+    per category instead
+    """
+    if value_field is None:
+        categories, counts = np.unique([str(row.get(category_field)) for row in data],
+                                       return_counts=True)
+        value_field = "count"
+        data = [{category_field: category, value_field: count}
+                for category, count in zip(categories.tolist(), counts.tolist())]
+        if len(data) <= k:
+            return data
+
+    values = np.array([row.get(value_field) for row in data], dtype=float)
+    values = np.nan_to_num(values, nan=-np.inf)
+    keep = np.sort(np.argpartition(-values, k - 2)[:k - 1])
+    rest = np.ones(len(data), dtype=bool)
+    rest[keep] = False
+
+    other_total = float(np.where(np.isfinite(values[rest]), values[rest], 0).sum())
+    other = {category_field: f"Other ({int(rest.sum())} more)",
+             value_field: int(other_total) if other_total.is_integer() else other_total}
+    return [{category_field: data[i][category_field], value_field: data[i][value_field]}
+            for i in keep.tolist()] + [other]
+
+
+def lttb(data: List[Dict], x_field: str, y_field: str, n_out: int) -> List[Dict]:
+    """
+    Largest-Triangle-Three-Buckets downsampling
+
+    Keeps the first and last points and, from each of n_out - 2 equal
+    buckets, the point forming the largest triangle with the previously
+    kept point and the next bucket's mean. Non-numeric x values (e.g.
+    year labels) are placed by position.
+    """
+    n = len(data)
+    if n_out >= n or n_out < 3:
+        return data
+
+    xs = [row.get(x_field) for row in data]
+    x = (np.array(xs, dtype=float) if all(_is_number(value) for value in xs)
+         else np.arange(n, dtype=float))
+    y = np.nan_to_num(np.array([row.get(y_field) for row in data], dtype=float))
+
+    edges = np.linspace(1, n - 1, n_out - 1).astype(int)
+    selected = [0]
+    for bucket in range(n_out - 2):
+        start, end = edges[bucket], edges[bucket + 1]
+        next_start, next_end = end, edges[bucket + 2] if bucket + 2 < len(edges) else n
+        next_x, next_y = x[next_start:next_end].mean(), y[next_start:next_end].mean()
+
+        a = selected[-1]
+        areas = np.abs((x[a] - next_x) * (y[start:end] - y[a])
+                       - (x[a] - x[start:end]) * (next_y - y[a]))
+        selected.append(start + int(np.argmax(areas)))
+    selected.append(n - 1)
+    return [data[i] for i in selected]
+
+
+def bin_2d(data: List[Dict], x_field: str, y_field: str, max_points: int) -> List[Dict]:
+    """
+    Count rows per cell of a grid over two numeric fields
+
+    Each axis gets about sqrt(max_points) bins; an axis with fewer distinct
+    values than that (e.g. year) keeps one bin per value. Cells are reported
+    at their centre, and empty cells are dropped.
+    """
+    per_axis = max(1, int(math.sqrt(max_points)))
+    x = np.array([row.get(x_field) for row in data], dtype=float)
+    y = np.array([row.get(y_field) for row in data], dtype=float)
+    valid = ~(np.isnan(x) | np.isnan(y))
+    x, y = x[valid], y[valid]
+
+    x_codes, x_centers = _axis_bins(x, per_axis)
+    y_codes, y_centers = _axis_bins(y, per_axis)
+    counts = np.bincount(x_codes * len(y_centers) + y_codes,
+                         minlength=len(x_centers) * len(y_centers))
+    cells = np.flatnonzero(counts)
+    return [{x_field: x_centers[cell // len(y_centers)],
+             y_field: y_centers[cell % len(y_centers)],
+             "count": count}
+            for cell, count in zip(cells.tolist(), counts[cells].tolist())]
+
+
+def _axis_bins(values: np.ndarray, bins: int) -> Tuple[np.ndarray, List[float]]:
+    """Bin code of each value and the value each bin is drawn at"""
+    distinct = np.unique(values)
+    if len(distinct) <= bins:
+        centers = distinct.astype(int) if np.array_equal(distinct, distinct.round()) else distinct
+        return np.searchsorted(distinct, values), centers.tolist()
+    edges = np.linspace(distinct[0], distinct[-1], bins + 1)
+    codes = np.clip(np.searchsorted(edges, values, side="right") - 1, 0, bins - 1)
+    return codes, ((edges[:-1] + edges[1:]) / 2).round(2).tolist()
@@ -0,0 +1,100 @@
+"""
+Analysis result cache - skips pandas for plans that were already answered
+"""
+import json
+import os
+import threading
+from collections import OrderedDict
+from typing import Dict, Any, List, Optional
+
+
+class ResultCache:
+    """
+    LRU cache of analysis results bounded by total serialized size
+
+    Entries are keyed on a canonical plan key plus the DataLoader data
+    version; storing a result for a new version drops every entry of the
+    old one, so reloaded data never serves stale results, and results
+    computed later against the old version are ignored.
+    """
+
+    def __init__(self, max_bytes: int = 64 * 1024 * 1024, max_item_bytes: int = 8 * 1024 * 1024):
+        self.max_bytes = max_bytes
+        self.max_item_bytes = max_item_bytes
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+        self._bytes = 0
+        self._version = None
+        self._retired_versions = set()
+        self._entries: "OrderedDict[str, bytes]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_env(cls) -> "ResultCache":
+        """Build a cache sized from RESULT_CACHE_BYTES / RESULT_CACHE_MAX_ITEM_BYTES"""
+        return cls(
+            max_bytes=int(os.environ.get("RESULT_CACHE_BYTES", 64 * 1024 * 1024)),
+            max_item_bytes=int(os.environ.get("RESULT_CACHE_MAX_ITEM_BYTES", 8 * 1024 * 1024))
+        )
+
+    def get(self, key: str, version: str) -> Optional[List[Dict[str, Any]]]:
+        """Return a fresh copy of the cached result, or None on a miss"""
+        with self._lock:
+            payload = self._entries.get(key) if version == self._version else None
+            if payload is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+        return json.loads(payload)
+
+    def put(self, key: str, version: str, result: List[Dict[str, Any]]):
+        """Store a result, evicting least recently used entries past max_bytes"""
+        payload = json.dumps(result, default=str).encode("utf-8")
+        if len(payload) > self.max_item_bytes:
+            return
+        with self._lock:
+            # Late results from a replaced data snapshot must not evict the new one
+            if version in self._retired_versions:
+                return
+            if version != self._version:
+                if self._version is not None:
+                    self._retired_versions.add(self._version)
+                if self._entries:
+                    self.invalidations += 1
+                self._entries.clear()
+                self._bytes = 0
+                self._version = version
+
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self._bytes -= len(previous)
+            self._entries[key] = payload
+            self._bytes += len(payload)
+            while self._bytes > self.max_bytes and self._entries:
+                _, evicted = self._entries.popitem(last=False)
+                self._bytes -= len(evicted)
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def stats(self) -> Dict[str, Any]:
+        """Get cache counters for health reporting"""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+                "evictions": self.evictions,
+                "invalidations": self.invalidations,
+                "data_version": self._version
+            }
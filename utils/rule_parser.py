@@ -0,0 +1,294 @@
+"""
+Rule-based query parser - deterministic fast path that bypasses the LLM
+"""
+import re
+from datetime import datetime
+from typing import List, Optional
+
+# Words that carry no meaning for the query plan
+FILLER_WORDS = {
+    "show", "me", "the", "a", "an", "of", "number", "count", "counts", "how",
+    "many", "what", "is", "are", "give", "list", "display", "plot", "chart",
+    "graph", "please", "all", "in", "over", "time", "by", "per", "each", "for",
+    "across", "and", "with", "total", "get", "see", "visualize", "overall",
+    "most", "top", "highest", "ranked", "ranking", "best", "since", "from",
+    "after", "last", "past", "recent", "trend", "trends", "growth", "change",
+    "changes", "distribution", "histogram", "spread", "numbers"
+}
+
+ENTITY_WORDS = {
+    "paper": "papers", "papers": "papers",
+    "publication": "papers", "publications": "papers",
+    "article": "papers", "articles": "papers",
+    "author": "authors", "authors": "authors",
+    "researcher": "authors", "researchers": "authors"
+}
+
+# Low-cardinality paper columns that can be grouped on
+GROUP_WORDS = {
+    "year": "year", "years": "year", "yearly": "year",
+    "annual": "year", "annually": "year",
+    "type": "type", "types": "type"
+}
+
+CITATION_WORDS = {"cited", "citation", "citations"}
+PRODUCTIVITY_WORDS = {"productive", "prolific", "publishing"}
+
+# Words that point at the citation / collaboration graphs
+NETWORK_WORDS = {"within", "dataset", "internal", "internally", "network", "inside"}
+COLLABORATION_WORDS = {"collaborative", "collaborators", "collaboration",
+                       "collaborations", "connected", "coauthors", "coauthor"}
+
+# Graph centrality metrics
+CENTRALITY_WORDS = {
+    "pagerank": "pagerank", "influential": "pagerank", "influence": "pagerank",
+    "central": "betweenness", "centrality": "betweenness", "betweenness": "betweenness"
+}
+
+# Words naming what to measure; a rule that can't use one declines the query
+METRIC_WORDS = (CITATION_WORDS | PRODUCTIVITY_WORDS | NETWORK_WORDS
+                | COLLABORATION_WORDS | set(CENTRALITY_WORDS))
+
+KNOWN_WORDS = (FILLER_WORDS | set(ENTITY_WORDS) | set(GROUP_WORDS)
+               | CITATION_WORDS | PRODUCTIVITY_WORDS | NETWORK_WORDS
+               | COLLABORATION_WORDS | set(CENTRALITY_WORDS))
+
+# Words that select an intent, for query_concepts
+INTENT_WORDS = {
+    "trend": "trend", "trends": "trend", "growth": "trend", "change": "trend", "changes": "trend",
+    "distribution": "distribution", "histogram": "distribution", "spread": "distribution",
+    "top": "ranking", "most": "ranking", "highest": "ranking", "ranked": "ranking",
+    "ranking": "ranking", "best": "ranking"
+}
+
+# "co-authors of A5090391261", "papers citing W3108284800"
+NEIGHBOR_PATTERNS = [
+    (re.compile(r"^(?:show |list |who are )?(?:the )?(?:co-?authors|collaborators) (?:of|for|with) (a\d+)$"), "authors"),
+    (re.compile(r"^(?:show |list )?(?:the )?papers (?:citing|that cite) (w\d+)$"), "papers"),
+]
+
+
+def query_concepts(query: str) -> frozenset:
+    """
+    Plan-relevant concepts a query mentions, e.g. {"papers", "year", "#10"}
+
+    Synonyms map to the same concept ("yearly" and "years" -> "year"), and
+    every number is kept verbatim, so two phrasings of one question share
+    a signature while "top 10" / "top 20" or "authors" / "papers" differ.
+    """
+    concepts = set()
+    for token in re.findall(r"[a-z]+|\d+", query.lower()):
+        if token.isdigit():
+            concepts.add(f"#{token}")
+        elif token in ENTITY_WORDS:
+            concepts.add(ENTITY_WORDS[token])
+        elif token in GROUP_WORDS:
+            concepts.add(GROUP_WORDS[token])
+        elif token in INTENT_WORDS:
+            concepts.add(INTENT_WORDS[token])
+        elif token in CENTRALITY_WORDS:
+            concepts.add(CENTRALITY_WORDS[token])
+        elif token in CITATION_WORDS:
+            concepts.add("citations")
+        elif token in PRODUCTIVITY_WORDS:
+            concepts.add("productivity")
+        elif token in NETWORK_WORDS:
+            concepts.add("network")
+        elif token in COLLABORATION_WORDS:
+            concepts.add("collaboration")
+    return frozenset(concepts)
+
+
+class RuleBasedParser:
+    """Parses recognizable queries locally into the QUERY_PARSER_PROMPT plan schema"""
+
+    def __init__(self, reference_year: int = None):
+        """
+        Args:
+            reference_year: Year that "last N years" counts back from
+                (defaults to the current year)
+        """
+        self.reference_year = reference_year or datetime.now().year
+
+    def parse(self, query: str) -> Optional[dict]:
+        """
+        Parse a query without calling the LLM
+
+        Returns:
+            Query plan, or None if the query is not handled confidently
+        """
+        text = re.sub(r"\s+", " ", query.strip().lower()).rstrip("?.! ")
+        tokens = re.findall(r"[a-z]+|\d+", text)
+        if not tokens:
+            return None
+
+        for pattern, entity in NEIGHBOR_PATTERNS:
+            match = pattern.match(text)
+            if match:
+                return {"intent": "neighbors", "entity": entity, "node": match.group(1).upper(),
+                        "measure": "count", "filters": {}, "limit": 20, "sort": "desc"}
+
+        # Any word we don't understand means the LLM should handle it
+        if any(not token.isdigit() and token not in KNOWN_WORDS for token in tokens):
+            return None
+
+        # Numbers the year patterns don't explain (e.g. "top 5 of 20") go to the LLM
+        filters = self._year_filters(text)
+        if filters is None:
+            return None
+
+        entity = self._entity(tokens)
+        if "trend" in tokens or "trends" in tokens or "growth" in tokens:
+            plan = self._trend(tokens, entity)
+        elif "distribution" in tokens or "histogram" in tokens or "spread" in tokens:
+            plan = self._distribution(tokens, entity, filters)
+        elif (tokens[0] in ("top", "most", "highest", "best") or "top" in tokens
+              or CENTRALITY_WORDS.keys() & set(tokens)):
+            plan = self._top_ranking(text, tokens, entity, filters)
+        else:
+            plan = self._count_by_field(tokens, entity)
+
+        if plan is None:
+            return None
+
+        plan.setdefault("measure", "count")
+        plan["filters"] = filters
+        plan.setdefault("sort", "desc")
+        return plan
+
+    def parse_relaxed(self, query: str) -> Optional[dict]:
+        """
+        Parse after dropping the words the rules don't know
+
+        Only a guess (e.g. for speculative analysis): "papers per field"
+        becomes "papers per", which is not trusted as the real plan.
+        """
+        words = re.findall(r"[a-z]+|\d+", query.lower())
+        known = [word for word in words if word.isdigit() or word in KNOWN_WORDS]
+        return self.parse(" ".join(known)) if known else None
+
+    def _entity(self, tokens: List[str]) -> str:
+        """Authors if the query mentions them, otherwise papers"""
+        entities = [ENTITY_WORDS[t] for t in tokens if t in ENTITY_WORDS]
+        return "authors" if "authors" in entities else "papers"
+
+    def _group_field(self, tokens: List[str]) -> Optional[str]:
+        fields = {GROUP_WORDS[t] for t in tokens if t in GROUP_WORDS}
+        return fields.pop() if len(fields) == 1 else None
+
+    def _year_filters(self, text: str) -> Optional[dict]:
+        """
+        Extract 'since YYYY', 'last N years' or a bare year ('in 2021')
+
+        Returns:
+            Filters (empty if the query has no year condition), or None if
+            it has numbers other than these and 'top N'
+        """
+        text = re.sub(r"\btop \d+\b", " ", text)
+        filters = {}
+        match = (re.search(r"\b(?:since|from|after) (\d{4})\b", text)
+                 or re.search(r"\b(?:last|past) (\d+ )?years?\b", text))
+        if match:
+            if match.group(0).startswith(("last", "past")):
+                years = int(match.group(1) or 1)
+                filters["year"] = f">={self.reference_year - years + 1}"
+            else:
+                filters["year"] = f">={match.group(1)}"
+            text = text[:match.start()] + text[match.end():]
+
+        numbers = re.findall(r"\d+", text)
+        if not numbers:
+            return filters
+        if filters or len(numbers) > 1 or not re.fullmatch(r"(?:19|20)\d\d", numbers[0]):
+            return None
+        return {"year": int(numbers[0])}
+
+    def _trend(self, tokens: List[str], entity: str) -> Optional[dict]:
+        if entity != "papers" or (METRIC_WORDS - CITATION_WORDS).intersection(tokens):
+            return None
+        plan = {
+            "intent": "trend_analysis",
+            "entity": "papers",
+            "groupby": "year",
+            "measure": "count",
+            "sort": "asc"
+        }
+        if CITATION_WORDS.intersection(tokens):
+            plan["measure"] = "sum"
+            plan["aggregation_field"] = "citations"
+        return plan
+
+    def _distribution(self, tokens: List[str], entity: str, filters: dict) -> Optional[dict]:
+        # Distributions are drawn over the whole table
+        if filters or (METRIC_WORDS - CITATION_WORDS).intersection(tokens):
+            return None
+        if CITATION_WORDS.intersection(tokens):
+            if entity != "papers":
+                return None
+            return {"intent": "distribution", "entity": "papers",
+                    "aggregation_field": "citations"}
+        if entity == "authors":
+            return {"intent": "distribution", "entity": "authors",
+                    "aggregation_field": "paper_count"}
+        return None
+
+    def _top_ranking(self, text: str, tokens: List[str], entity: str, filters: dict) -> Optional[dict]:
+        match = re.search(r"\btop (\d+)\b", text)
+        limit = int(match.group(1)) if match else 10
+
+        groupby = self._group_field(tokens)
+        if entity == "papers" and CITATION_WORDS.intersection(tokens) and not (
+                METRIC_WORDS - CITATION_WORDS).intersection(tokens):
+            # "Most cited types" ranks groups, not papers
+            if groupby:
+                return None
+            return {"intent": "top_ranking", "entity": "papers", "measure": "max",
+                    "aggregation_field": "citations", "limit": limit, "sort": "desc"}
+
+        # Only paper rankings and grouped counts honour year filters
+        if filters and not (entity == "papers" and groupby
+                            and not (METRIC_WORDS - PRODUCTIVITY_WORDS).intersection(tokens)):
+            return None
+
+        # Rankings inside the citation / collaboration networks
+        metrics = {CENTRALITY_WORDS[t] for t in tokens if t in CENTRALITY_WORDS}
+        if len(metrics) == 1:
+            return {"intent": "top_ranking", "entity": entity, "measure": "max",
+                    "aggregation_field": metrics.pop(), "limit": limit, "sort": "desc"}
+        if entity == "papers" and CITATION_WORDS.intersection(tokens) and NETWORK_WORDS.intersection(tokens):
+            return {"intent": "network_ranking", "entity": "papers", "measure": "count",
+                    "aggregation_field": "in_degree", "limit": limit, "sort": "desc"}
+        if COLLABORATION_WORDS.intersection(tokens):
+            return {"intent": "network_ranking", "entity": "authors", "measure": "sum",
+                    "aggregation_field": "weighted_degree", "limit": limit, "sort": "desc"}
+
+        if entity == "authors":
+            # Authors are only ranked by paper count
+            if (METRIC_WORDS - PRODUCTIVITY_WORDS).intersection(tokens):
+                return None
+            return {"intent": "top_ranking", "entity": "authors", "measure": "max",
+                    "aggregation_field": "paper_count", "limit": limit, "sort": "desc"}
+
+        # "Most productive years" and "top 3 types" rank groups rather than
+        # rows; "top 10 papers by year" could mean either, so the LLM decides
+        if groupby and not (METRIC_WORDS - PRODUCTIVITY_WORDS).intersection(tokens):
+            if re.search(r"\b(?:top|most|highest|best)(?: \d+)? (?:%s)\b" % "|".join(ENTITY_WORDS), text):
+                return None
+            plan = {"intent": "count_by_field", "entity": "papers", "groupby": groupby,
+                    "measure": "count", "sort": "desc"}
+            if match:
+                plan["limit"] = limit
+            return plan
+        return None
+
+    def _count_by_field(self, tokens: List[str], entity: str) -> Optional[dict]:
+        groupby = self._group_field(tokens)
+        if entity != "papers" or groupby is None or METRIC_WORDS.intersection(tokens):
+            return None
+        return {
+            "intent": "count_by_field",
+            "entity": "papers",
+            "groupby": groupby,
+            "measure": "count",
+            "sort": "asc"
+        }
@@ -0,0 +1,229 @@
+"""
+Semantic plan cache - reuses LLM plans for paraphrased questions
+"""
+import copy
+import os
+import re
+import threading
+import zlib
+from typing import Dict, Any, List, Optional
+
+import numpy as np
+
+from utils.metrics import registry
+from utils.rule_parser import KNOWN_WORDS, query_concepts
+
+SEMANTIC_LOOKUPS = registry.counter(
+    "paperagent_semantic_cache_total",
+    "Semantic plan cache lookups by outcome (rejected = similar text, different signature)",
+    ("outcome",))
+
+
+# Function words that don't change a question's meaning; other words the
+# rule parser doesn't know ("field", "before") must match for a hit
+STOP_WORDS = {
+    "do", "does", "did", "there", "which", "that", "this", "these", "those", "to", "on",
+    "at", "as", "into", "be", "been", "was", "were", "has", "have", "had", "can", "could",
+    "would", "i", "we", "you", "my", "our", "their", "its", "it", "much", "up", "want",
+    "like", "tell", "find", "so", "far", "currently", "broken", "down"
+}
+
+
+# Words that set how a number is compared ("since 2020" vs "in 2020"); the
+# rule parser treats them as filler, so the signature keeps them as operators
+COMPARATOR_WORDS = {
+    "since": "ge", "after": "gt", "in": "eq", "during": "eq", "from": "range", "between": "range"
+}
+
+# Relative year windows ("last 5 years", "recent papers")
+RECENT_WORDS = {"last", "past", "recent"}
+
+
+def query_signature(query: str) -> frozenset:
+    """
+    query_concepts plus the query's other content words, crudely singularized,
+    and its comparators ("@ge" for "since 2020", "@eq" for "in 2020")
+    """
+    text = query.lower()
+    words = {re.sub(r"(?<=[a-z]{3})s$", "", re.sub(r"(?<=[a-z]{2})ies$", "y", word))
+             for word in re.findall(r"[a-z]+", text)
+             if word not in KNOWN_WORDS and word not in STOP_WORDS}
+    operators = {COMPARATOR_WORDS[word]
+                 for word in re.findall(r"\b([a-z]+) \d", text) if word in COMPARATOR_WORDS}
+    if RECENT_WORDS.intersection(re.findall(r"[a-z]+", text)):
+        operators.add("recent")
+    return (query_concepts(query) | {f"~{word}" for word in words}
+            | {f"@{operator}" for operator in operators})
+
+
+def _features(text: str) -> List[str]:
+    """Words plus character trigrams of each padded word ("yearly" shares "yea", "ear" with "year")"""
+    features = []
+    for word in re.findall(r"[a-z]+|\d+", text.lower()):
+        features.append(word)
+        padded = f" {word} "
+        features.extend(padded[i:i + 3] for i in range(len(padded) - 2))
+    return features
+
+
+class SemanticPlanCache:
+    """
+    Nearest-neighbour cache of query plans over hashed n-gram TF-IDF vectors
+
+    Each stored query is a row of term frequencies in a fixed-size matrix
+    (feature-hashed, so no vocabulary is kept); IDF weights come from the
+    stored queries themselves. A lookup returns the plan of the most
+    similar stored query that reaches `threshold` cosine similarity and has
+    the same signature: the same concepts, numbers, comparators and
+    unrecognized words (see query_signature). The oldest entry is replaced once the cache is full.
+    """
+
+    def __init__(self, max_size: int = 1024, threshold: float = 0.3, dims: int = 4096):
+        """
+        Args:
+            max_size: Maximum number of stored queries
+            threshold: Minimum cosine similarity for a hit (0-1)
+            dims: Hashed feature dimensions
+        """
+        self.max_size = max(1, int(max_size))
+        self.threshold = float(threshold)
+        self.dims = int(dims)
+        self.hits = 0
+        self.misses = 0
+        self.rejected = 0
+        self._tf = np.zeros((self.max_size, self.dims), dtype=np.float32)
+        self._df = np.zeros(self.dims, dtype=np.int32)
+        self._queries: List[Optional[str]] = [None] * self.max_size
+        self._signatures: List[Optional[frozenset]] = [None] * self.max_size
+        self._plans: List[Optional[dict]] = [None] * self.max_size
+        self._size = 0
+        self._next = 0
+        # Row-normalized TF-IDF matrix and the IDF it was weighted with;
+        # inserts are weighted with that IDF until enough accumulate to rebuild
+        self._index: Optional[np.ndarray] = None
+        self._index_idf: Optional[np.ndarray] = None
+        self._stale_rows = 0
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_env(cls) -> Optional["SemanticPlanCache"]:
+        """Build from SEMANTIC_CACHE_* settings, or None if SEMANTIC_CACHE=0"""
+        if os.environ.get("SEMANTIC_CACHE", "1") != "1":
+            return None
+        return cls(
+            max_size=int(os.environ.get("SEMANTIC_CACHE_SIZE", 1024)),
+            threshold=float(os.environ.get("SEMANTIC_CACHE_THRESHOLD", 0.3))
+        )
+
+    def get(self, query: str) -> Optional[dict]:
+        """Return a copy of the plan of the closest matching query, or None"""
+        plan, outcome = self._lookup(query)
+        with self._lock:
+            if outcome == "hit":
+                self.hits += 1
+            elif outcome == "rejected":
+                self.rejected += 1
+            else:
+                self.misses += 1
+        SEMANTIC_LOOKUPS.inc(outcome=outcome)
+        return plan
+
+    def __contains__(self, query: str) -> bool:
+        """Whether get() would hit, without touching counters"""
+        return self._lookup(query)[0] is not None
+
+    def put(self, query: str, plan: dict):
+        """Index a query and its plan"""
+        tf = self._term_frequencies(query)
+        if not tf.any():
+            return
+        with self._lock:
+            row = self._next
+            if self._queries[row] is not None:
+                self._df -= self._tf[row] > 0
+            self._tf[row] = tf
+            self._df += tf > 0
+            self._queries[row] = query
+            self._signatures[row] = query_signature(query)
+            self._plans[row] = copy.deepcopy(plan)
+            self._next = (row + 1) % self.max_size
+            self._size = min(self._size + 1, self.max_size)
+            self._stale_rows += 1
+            if self._index is not None and self._stale_rows <= max(16, self._size // 8):
+                self._index[row] = self._normalize(tf * self._index_idf)
+            else:
+                self._index = None
+
+    def clear(self):
+        """Drop all stored queries and reset counters"""
+        with self._lock:
+            self._tf[:] = 0
+            self._df[:] = 0
+            self._queries = [None] * self.max_size
+            self._signatures = [None] * self.max_size
+            self._plans = [None] * self.max_size
+            self._size = self._next = 0
+            self._index = None
+            self._stale_rows = 0
+            self.hits = self.misses = self.rejected = 0
+
+    def stats(self) -> Dict[str, Any]:
+        """Get cache counters for health reporting"""
+        with self._lock:
+            lookups = self.hits + self.misses + self.rejected
+            return {
+                "size": self._size,
+                "max_size": self.max_size,
+                "threshold": self.threshold,
+                "hits": self.hits,
+                "misses": self.misses,
+                "rejected": self.rejected,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0
+            }
+
+    def _lookup(self, query: str):
+        """(plan copy or None, outcome) for the nearest stored query with the same signature"""
+        tf = self._term_frequencies(query)
+        signature = query_signature(query)
+        with self._lock:
+            if self._size == 0 or not tf.any():
+                return None, "miss"
+            if self._index is None:
+                self._build_index()
+            similarities = self._index[:self._size] @ self._normalize(tf * self._index_idf)
+            candidates = np.flatnonzero(similarities >= self.threshold)
+            if len(candidates) == 0:
+                return None, "miss"
+            for row in candidates[np.argsort(-similarities[candidates])]:
+                if self._signatures[row] == signature:
+                    plan = self._plans[row]
+                    break
+            else:
+                return None, "rejected"
+        return copy.deepcopy(plan), "hit"
+
+    def _idf(self) -> np.ndarray:
+        """Smoothed IDF over the stored queries (caller holds the lock)"""
+        return np.log((1 + self._size) / (1 + self._df)).astype(np.float32) + 1
+
+    def _build_index(self):
+        """Reweight every stored row with the current IDF (caller holds the lock)"""
+        self._index_idf = self._idf()
+        weighted = self._tf * self._index_idf
+        norms = np.linalg.norm(weighted, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        self._index = weighted / norms
+        self._stale_rows = 0
+
+    @staticmethod
+    def _normalize(vector: np.ndarray) -> np.ndarray:
+        return vector / (np.linalg.norm(vector) or 1.0)
+
+    def _term_frequencies(self, query: str) -> np.ndarray:
+        """Sublinear (1 + log tf) counts of hashed features"""
+        counts = np.zeros(self.dims, dtype=np.float32)
+        for feature in _features(query):
+            counts[zlib.crc32(feature.encode("utf-8")) % self.dims] += 1
+        nonzero = counts > 0
+        counts[nonzero] = 1 + np.log(counts[nonzero])
+        return counts
@@ -0,0 +1,141 @@
+"""
+Response serialization - fast JSON encoding and negotiated compression
+"""
+import gzip
+import json
+import os
+from typing import Any, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+from flask.json.provider import JSONProvider
+
+from utils.metrics import span
+
+try:
+    import orjson
+except ImportError:  # Fall back to the standard library encoder
+    orjson = None
+
+try:
+    import brotli
+except ImportError:  # gzip only
+    brotli = None
+
+# "orjson" (default when installed) or "json"
+SERIALIZER = os.environ.get("RESPONSE_SERIALIZER", "orjson" if orjson else "json")
+# Responses smaller than this are sent uncompressed
+COMPRESS_MIN_BYTES = int(os.environ.get("RESPONSE_COMPRESS_MIN_BYTES", 1024))
+GZIP_LEVEL = int(os.environ.get("RESPONSE_GZIP_LEVEL", 5))
+BROTLI_QUALITY = int(os.environ.get("RESPONSE_BROTLI_QUALITY", 4))
+
+# Name under which a spec references the response's top-level "data" array
+NAMED_DATASET = "data"
+
+
+def _default(obj: Any) -> Any:
+    """Encode the numpy / pandas values that analysis results may contain"""
+    if isinstance(obj, pd.DataFrame):
+        return obj.to_dict("records")
+    if isinstance(obj, (pd.Series, pd.Index)):
+        return obj.tolist()
+    if isinstance(obj, np.generic):
+        return obj.item()
+    if isinstance(obj, np.ndarray):
+        return obj.tolist()
+    if isinstance(obj, pd.Timestamp):
+        return obj.isoformat()
+    if obj is pd.NA or obj is pd.NaT:
+        return None
+    return str(obj)
+
+
+def dumps(obj: Any) -> bytes:
+    """Serialize a response body to UTF-8 JSON"""
+    with span("serialize"):
+        if SERIALIZER == "orjson" and orjson is not None:
+            return orjson.dumps(obj, default=_default,
+                                option=orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS)
+        return json.dumps(obj, default=_default).encode("utf-8")
+
+
+def loads(data) -> Any:
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
+
+def compress(body: bytes, accept_encoding: Optional[str]) -> Tuple[bytes, Optional[str]]:
+    """
+    Compress a body with the best encoding the client accepts
+
+    Args:
+        body: Serialized response
+        accept_encoding: Value of the request's Accept-Encoding header
+
+    Returns:
+        (body, content encoding), with encoding None if left uncompressed
+    """
+    if len(body) < COMPRESS_MIN_BYTES or not accept_encoding:
+        return body, None
+    accepted = _accepted_encodings(accept_encoding)
+    if brotli is not None and "br" in accepted:
+        with span("compress"):
+            return brotli.compress(body, quality=BROTLI_QUALITY), "br"
+    if "gzip" in accepted:
+        with span("compress"):
+            return gzip.compress(body, compresslevel=GZIP_LEVEL), "gzip"
+    return body, None
+
+
+def _accepted_encodings(accept_encoding: str) -> set:
+    """Codings an Accept-Encoding header allows: listed with no q or a q above 0"""
+    accepted = set()
+    for part in accept_encoding.split(","):
+        coding, *params = [piece.strip() for piece in part.split(";")]
+        quality = 1.0
+        for param in params:
+            name, _, value = param.partition("=")
+            if name.strip().lower() == "q":
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        if coding and quality > 0:
+            accepted.add(coding.lower())
+    return accepted
+
+
+def with_named_data(visualization: dict, data: list) -> Tuple[dict, list]:
+    """
+    Copy of a visualization whose spec references the response's "data"
+    array by name instead of inlining a second copy of it, and the data
+    to send with it
+
+    The data sent is the spec's own values, which the viz templates have
+    already formatted (e.g. categories as strings for nominal axes), so the
+    chart draws the same as with inline values. Clients bind it before
+    rendering, e.g. spec.datasets = {data: response.data} or
+    view.data("data", response.data).
+
+    Returns:
+        (visualization, data); both unchanged if the spec has no inline values
+    """
+    spec = visualization.get("spec")
+    if not isinstance(spec, dict) or "values" not in spec.get("data", {}):
+        return visualization, data
+    return {**visualization, "spec": {**spec, "data": {"name": NAMED_DATASET}}}, spec["data"]["values"]
+
+
+class FastJSONProvider(JSONProvider):
+    """Flask JSON provider backed by dumps(), so jsonify shares the fast path"""
+
+    def dumps(self, obj: Any, **kwargs: Any) -> str:
+        return dumps(obj).decode("utf-8")
+
+    def loads(self, s, **kwargs: Any) -> Any:
+        return loads(s)
+
+    def response(self, *args: Any, **kwargs: Any):
+        obj = self._prepare_response_obj(args, kwargs)
+        return self._app.response_class(dumps(obj), mimetype="application/json")
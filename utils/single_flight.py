@@ -0,0 +1,106 @@
+"""
+Request coalescing - concurrent callers with the same key share one computation
+"""
+import asyncio
+import copy
+import threading
+from concurrent.futures import Future
+from typing import Any, Awaitable, Callable, Dict
+
+from utils.metrics import registry
+
+COALESCED_CALLS = registry.counter(
+    "paperagent_coalesced_total",
+    "Calls by pipeline stage and role (follower = waited on another caller's in-flight work)",
+    ("stage", "role"))
+
+
+class SingleFlight:
+    """
+    Runs at most one computation per key at a time
+
+    The first caller for a key (the leader) does the work; callers that
+    arrive while it is in flight (followers) wait for it and get a deep
+    copy of its result, or its exception. Nothing is kept once the leader
+    finishes, so this deduplicates concurrent work only - caching stays
+    with PlanCache / ResultCache. Threads and coroutines can share an
+    instance: both wait on the same concurrent Future.
+    """
+
+    def __init__(self, stage: str):
+        """
+        Args:
+            stage: Pipeline stage name for metrics ("parse", "analyze")
+        """
+        self.stage = stage
+        self.leaders = 0
+        self.followers = 0
+        self._calls: Dict[Any, Future] = {}
+        # Followers waiting on each in-flight key
+        self._waiting: Dict[Any, int] = {}
+        self._lock = threading.Lock()
+
+    def do(self, key: Any, fn: Callable[[], Any]) -> Any:
+        """Return fn(), or the result of an identical call already running"""
+        future, leader = self._join(key)
+        if not leader:
+            return copy.deepcopy(future.result())
+        try:
+            result = fn()
+        except BaseException as e:
+            self._finish(key, future, error=e)
+            raise
+        self._finish(key, future, result=result)
+        return result
+
+    async def ado(self, key: Any, fn: Callable[[], Awaitable[Any]]) -> Any:
+        """Same as do, for a coroutine function; followers await without blocking the loop"""
+        future, leader = self._join(key)
+        if not leader:
+            return copy.deepcopy(await asyncio.wrap_future(future))
+        try:
+            result = await fn()
+        except BaseException as e:
+            self._finish(key, future, error=e)
+            raise
+        self._finish(key, future, result=result)
+        return result
+
+    def stats(self) -> Dict[str, Any]:
+        """Coalescing counters for health reporting"""
+        with self._lock:
+            calls = self.leaders + self.followers
+            return {
+                "in_flight": len(self._calls),
+                "leaders": self.leaders,
+                "coalesced": self.followers,
+                "coalesced_rate": round(self.followers / calls, 4) if calls else 0.0
+            }
+
+    def _join(self, key: Any):
+        """(future for the key, whether this caller leads it)"""
+        with self._lock:
+            future = self._calls.get(key)
+            leader = future is None
+            if leader:
+                future = self._calls[key] = Future()
+                self._waiting[key] = 0
+                self.leaders += 1
+            else:
+                self._waiting[key] += 1
+                self.followers += 1
+        COALESCED_CALLS.inc(stage=self.stage, role="leader" if leader else "follower")
+        return future, leader
+
+    def _finish(self, key: Any, future: Future, result: Any = None, error: BaseException = None):
+        # Remove the key before waking followers so later callers start fresh work
+        with self._lock:
+            self._calls.pop(key, None)
+            waiting = self._waiting.pop(key, 0)
+        if error is not None:
+            future.set_exception(error)
+        elif waiting:
+            # Followers copy from a snapshot, so the leader's caller can mutate its own result
+            future.set_result(copy.deepcopy(result))
+        else:
+            future.set_result(result)
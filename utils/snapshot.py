@@ -0,0 +1,152 @@
+"""
+Data snapshots - hot reload of the data directory without restarting the server
+"""
+import os
+import threading
+import time
+from typing import Dict, Any, Optional
+
+from agents.data_analyst import DataAnalystAgent
+from utils.data_loader import DataLoader, DATA_TABLES
+from utils.parser_prompt import ParserPrompt
+from utils.result_cache import ResultCache
+from utils.single_flight import SingleFlight
+
+
+class DataSnapshot:
+    """An immutable, fully indexed view of the data directory"""
+
+    def __init__(self, data_loader: DataLoader, data_analyst: DataAnalystAgent, load_seconds: float):
+        self.data_loader = data_loader
+        self.data_analyst = data_analyst
+        # Query parser prompt describing this snapshot's columns and values
+        self.parser_prompt = ParserPrompt.from_loader(data_loader)
+        self.version = data_loader.data_version
+        self.loaded_at = time.time()
+        self.load_seconds = load_seconds
+
+
+class SnapshotManager:
+    """
+    Owns the current DataSnapshot and swaps in new ones atomically
+
+    A reload builds the next snapshot (tables, aggregate cube, graphs and
+    warmed graph metrics) on a background thread, then replaces the
+    current reference in a single assignment. Requests that already
+    called current() keep using the snapshot they started with. Data that
+    fails DataLoader.validate() is never swapped in; the previous snapshot
+    stays live and the error is reported in status().
+    """
+
+    def __init__(self, data_dir: str = "./data", result_cache: ResultCache = None, warm_metrics: tuple = None):
+        self.data_dir = data_dir
+        self.result_cache = result_cache if result_cache is not None else ResultCache.from_env()
+        # Shared by every snapshot's analyst (keys include the data version)
+        self.inflight = SingleFlight("analyze")
+        if warm_metrics is None:
+            warm_metrics = tuple(m for m in os.environ.get(
+                "WARM_GRAPH_METRICS", "in_degree,weighted_degree,pagerank").split(",") if m)
+        self.warm_metrics = warm_metrics
+        self.reloads = 0
+        self.last_error: Optional[str] = None
+        # Source files of the last failed reload, which the watcher doesn't retry
+        self._failed_state: Optional[tuple] = None
+        self._reload_lock = threading.Lock()
+        self._watcher: Optional[threading.Thread] = None
+        self._source_state = self._read_source_state()
+        self._current = self._build()
+
+    def current(self) -> DataSnapshot:
+        """The snapshot new requests should use"""
+        return self._current
+
+    def reload(self, wait: bool = False) -> bool:
+        """
+        Build and swap in a new snapshot
+
+        Args:
+            wait: Block until the new snapshot is live
+
+        Returns:
+            False if a reload was already in progress, True otherwise
+        """
+        if not self._reload_lock.acquire(blocking=False):
+            return False
+        thread = threading.Thread(target=self._reload, name="data-reload", daemon=True)
+        thread.start()
+        if wait:
+            thread.join()
+        return True
+
+    def watch(self, interval: float):
+        """Poll the data files every interval seconds and reload when they change"""
+        if self._watcher is not None or interval <= 0:
+            return
+
+        def poll():
+            previous = self._source_state
+            while True:
+                time.sleep(interval)
+                state = self._read_source_state()
+                # Wait for the files to stop changing, so a CSV still being written isn't loaded
+                settled = state == previous
+                previous = state
+                if (settled and state not in (self._source_state, self._failed_state)
+                        and not self._reload_lock.locked()):
+                    print("Data files changed, reloading...")
+                    self.reload()
+
+        self._watcher = threading.Thread(target=poll, name="data-watcher", daemon=True)
+        self._watcher.start()
+
+    def status(self) -> Dict[str, Any]:
+        """Snapshot details for health reporting"""
+        snapshot = self._current
+        return {
+            "version": snapshot.version,
+            "loaded_at": snapshot.loaded_at,
+            "load_seconds": round(snapshot.load_seconds, 3),
+            "reloads": self.reloads,
+            "reloading": self._reload_lock.locked(),
+            "watching": self._watcher is not None,
+            "last_reload_error": self.last_error
+        }
+
+    def _reload(self):
+        state = self._read_source_state()
+        try:
+            snapshot = self._build()
+            self._current = snapshot
+            self._source_state = state
+            self.reloads += 1
+            self.last_error = None
+            print(f"Data snapshot {snapshot.version} live (loaded in {snapshot.load_seconds:.2f}s)")
+        except Exception as e:
+            self._failed_state = state
+            self.last_error = str(e)
+            print(f"Error reloading data, keeping snapshot {self._current.version}: {e}")
+        finally:
+            self._reload_lock.release()
+
+    def _build(self) -> DataSnapshot:
+        start = time.perf_counter()
+        data_loader = DataLoader(data_dir=self.data_dir)
+        # A table that failed to load (e.g. a CSV caught mid-write) must not go live
+        problems = data_loader.validate()
+        if problems:
+            raise ValueError(f"Invalid data in {self.data_dir}: {'; '.join(problems)}")
+        for metric in self.warm_metrics:
+            for entity in ("papers", "authors"):
+                data_loader.graph_metric(entity, metric)
+        data_analyst = DataAnalystAgent(data_loader, result_cache=self.result_cache,
+                                        inflight=self.inflight)
+        return DataSnapshot(data_loader, data_analyst, time.perf_counter() - start)
+
+    def _read_source_state(self) -> tuple:
+        state = []
+        for name in DATA_TABLES:
+            path = os.path.join(self.data_dir, f"{name}.csv")
+            if os.path.exists(path):
+                stat = os.stat(path)
+                state.append((name, stat.st_mtime_ns, stat.st_size))
+        return tuple(state)
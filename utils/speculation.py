@@ -0,0 +1,115 @@
+"""
+Speculative analysis - runs likely plans while the LLM is still parsing
+"""
+import os
+import threading
+from concurrent.futures import Future
+from typing import Dict, Any, List, Optional
+
+from utils.executor import BoundedExecutor, ExecutorBusyError
+from utils.metrics import detach_trace, registry
+from utils.query_plan import plan_key
+
+SPECULATION_OUTCOMES = registry.counter(
+    "paperagent_speculation_total",
+    "Speculative analyses by outcome (hit = the real plan matched a candidate)",
+    ("outcome",))
+
+
+class Speculation:
+    """Candidate analyses started for one query"""
+
+    def __init__(self, owner: "SpeculativeAnalyzer", futures: Dict[str, Future]):
+        self._owner = owner
+        self._futures = futures
+
+    def result_for(self, query_plan: dict) -> Optional[List[Dict[str, Any]]]:
+        """
+        Result of the candidate matching the real plan, or None on a miss
+
+        Waits for the matching analysis if it is already running. Candidates
+        still queued are cancelled, and a queued match is left to the caller
+        to run directly.
+        """
+        future = self._futures.pop(plan_key(query_plan), None)
+        for other in self._futures.values():
+            other.cancel()
+        self._futures.clear()
+
+        if future is None or future.cancel():
+            self._owner._record("miss")
+            return None
+        self._owner._record("hit")
+        return future.result()
+
+
+class SpeculativeAnalyzer:
+    """
+    Starts DataAnalystAgent work for a query's candidate plans on a small
+    pool of its own, so analysis overlaps the LLM round-trip. When the pool
+    is full, speculation is skipped rather than delaying real requests.
+    """
+
+    def __init__(self, query_parser, max_candidates: int = 3, executor: BoundedExecutor = None,
+                 enabled: bool = True):
+        self.query_parser = query_parser
+        self.max_candidates = max_candidates
+        self.enabled = enabled
+        self.executor = executor if executor is not None else BoundedExecutor(
+            max_workers=2, max_pending=8, name="speculation")
+        self.counts = {"started": 0, "skipped": 0, "hit": 0, "miss": 0}
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_env(cls, query_parser) -> "SpeculativeAnalyzer":
+        """Build from SPECULATIVE_ANALYSIS / SPECULATION_CANDIDATES / SPECULATION_WORKERS"""
+        workers = int(os.environ.get("SPECULATION_WORKERS", 2))
+        return cls(
+            query_parser,
+            max_candidates=int(os.environ.get("SPECULATION_CANDIDATES", 3)),
+            executor=BoundedExecutor(max_workers=workers, max_pending=4 * workers, name="speculation"),
+            enabled=os.environ.get("SPECULATIVE_ANALYSIS", "0") == "1"
+        )
+
+    def start(self, query: str, data_analyst) -> Optional[Speculation]:
+        """
+        Begin analysing candidate plans for a query
+
+        Returns:
+            Speculation to resolve once the real plan is known, or None if
+            speculation is disabled or the query won't go to the LLM
+        """
+        if not self.enabled or not self.query_parser.needs_llm(query):
+            return None
+
+        futures = {}
+        for candidate in self.query_parser.candidate_plans(query, self.max_candidates):
+            try:
+                futures[plan_key(candidate)] = self.executor.submit(self._run, data_analyst, candidate)
+            except ExecutorBusyError:
+                self._record("skipped")
+                break
+        if not futures:
+            return None
+        self._record("started", len(futures))
+        return Speculation(self, futures)
+
+    @staticmethod
+    def _run(data_analyst, candidate: dict) -> List[Dict[str, Any]]:
+        # Speculative work is not part of the request's own stage timings
+        detach_trace()
+        return data_analyst.analyze(candidate)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            resolved = self.counts["hit"] + self.counts["miss"]
+            return {
+                "enabled": self.enabled,
+                **self.counts,
+                "hit_rate": round(self.counts["hit"] / resolved, 4) if resolved else 0.0
+            }
+
+    def _record(self, outcome: str, amount: int = 1):
+        with self._lock:
+            self.counts[outcome] += amount
+        SPECULATION_OUTCOMES.inc(amount, outcome=outcome)
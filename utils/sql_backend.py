@@ -0,0 +1,238 @@
+"""
+Embedded SQL query backend - runs DataLoader query plans as SQL in an
+in-process columnar engine (DuckDB), or in SQLite when DuckDB isn't installed
+"""
+import sqlite3
+import threading
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from utils.filters import parse_condition
+
+# DuckDB is optional; SQLite from the standard library runs the same SQL
+try:
+    import duckdb
+except ImportError:
+    duckdb = None
+
+ENGINES = ("duckdb", "sqlite")
+
+AGGREGATES = {"sum": "SUM", "avg": "AVG", "max": "MAX", "min": "MIN"}
+
+
+def quote(name: str) -> str:
+    """Quote a column or table name as a SQL identifier"""
+    return '"' + str(name).replace('"', '""') + '"'
+
+
+def value_dtype(column_dtype, measure: str):
+    """Dtype of a pandas groupby aggregation over a column of column_dtype"""
+    if measure == "avg":
+        return np.dtype(np.float64)
+    if pd.api.types.is_integer_dtype(column_dtype):
+        return np.dtype(np.int64) if measure == "sum" else column_dtype
+    return column_dtype
+
+
+class SQLBackend:
+    """
+    Answers DataLoader queries with an embedded SQL engine
+
+    Tables are copied into the engine once per load (DuckDB keeps them
+    column-wise) and each link view joins an edge table to its node table
+    at both ends at query time, through node rowids resolved at load.
+    Plans compile to parameterized SQL over
+    columns the caller has already checked, and results are cast back to
+    the dtypes the pandas path returns, so either backend can serve a
+    request.
+    """
+
+    def __init__(self, tables: Dict[str, pd.DataFrame], links: Dict[str, tuple] = None,
+                 engine: str = "duckdb"):
+        """
+        Args:
+            tables: {table name: frame}; None frames are skipped
+            links: {view name: (edge table, node table, (edge column, prefix),
+                (edge column, prefix))}, joining each edge column to the node
+                table's id and prefixing that node's columns
+            engine: "duckdb" or "sqlite"
+        """
+        if engine not in ENGINES:
+            raise ValueError(f"Unknown SQL engine: {engine}")
+        if engine == "duckdb" and duckdb is None:
+            print("duckdb is not installed, running SQL queries on sqlite")
+            engine = "sqlite"
+        self.engine = engine
+        self.dtypes: Dict[str, Dict[str, Any]] = {}
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        if engine == "duckdb":
+            self._connection = duckdb.connect(":memory:")
+        else:
+            self._connection = sqlite3.connect(":memory:", check_same_thread=False)
+
+        for name, df in tables.items():
+            if df is not None:
+                self._load_table(name, df)
+        for view, (edges, nodes, *ends) in (links or {}).items():
+            if edges in self.dtypes and nodes in self.dtypes:
+                self._create_link_view(view, edges, nodes, ends)
+
+    def query(self,
+              table: str,
+              keys: List[str],
+              measure: Optional[str],
+              aggregation_field: Optional[str],
+              filters: Dict,
+              limit: Optional[int],
+              ascending: bool,
+              order_by: List[str] = None) -> pd.DataFrame:
+        """
+        Run a validated plan
+
+        Args:
+            table: Table or link view name
+            keys: Columns to group by; empty returns the matching rows
+            measure: "sum", "avg", "max" or "min" of aggregation_field, or None to count
+            aggregation_field: Column to aggregate
+            filters: {column: condition}, see utils.filters.parse_condition
+            limit: Max rows returned
+            ascending: Sort direction of the count/value column
+            order_by: Row order when ungrouped; None keeps table order
+
+        Returns:
+            DataFrame with the same columns, dtypes and row order as the pandas path
+        """
+        sql, params = self.compile(table, keys, measure, aggregation_field, filters,
+                                   limit, ascending, order_by)
+        result = self._execute(sql, params)
+
+        dtypes = self.dtypes[table]
+        for column in result.columns:
+            if column == "count" and keys:
+                dtype = np.dtype(np.int64)
+            elif column == "value" and keys:
+                dtype = value_dtype(dtypes[aggregation_field], measure)
+            else:
+                dtype = dtypes[column]
+            if result[column].dtype != dtype:
+                result[column] = result[column].astype(dtype)
+        return result
+
+    def compile(self,
+                table: str,
+                keys: List[str],
+                measure: Optional[str],
+                aggregation_field: Optional[str],
+                filters: Dict,
+                limit: Optional[int],
+                ascending: bool,
+                order_by: List[str] = None) -> Tuple[str, list]:
+        """Plan to (SQL text, parameters); arguments as for query"""
+        where, params = [], []
+        for field, condition in filters.items():
+            clause, values = self._condition(quote(field), condition, self.dtypes[table][field])
+            where.append(clause)
+            params.extend(values)
+
+        if keys:
+            # pandas groupby drops missing keys
+            where.extend(f"{quote(key)} IS NOT NULL" for key in keys)
+            group = ", ".join(quote(key) for key in keys)
+            if measure:
+                output = "value"
+                select = f"{AGGREGATES[measure]}({quote(aggregation_field)}) AS value"
+            else:
+                output = "count"
+                select = "COUNT(*) AS count"
+            direction = "ASC" if ascending else "DESC"
+            # Ties keep group key order, as a stable sort of the pandas groupby does
+            sql = (f"SELECT {group}, {select} FROM {quote(table)}{self._where(where)} "
+                   f"GROUP BY {group} ORDER BY {output} {direction} NULLS LAST, {group}")
+        else:
+            order = ", ".join(quote(column) for column in order_by) if order_by else "rowid"
+            sql = f"SELECT * FROM {quote(table)}{self._where(where)} ORDER BY {order}"
+
+        if limit:
+            sql += " LIMIT ?"
+            params.append(int(limit))
+        return sql, params
+
+    @staticmethod
+    def _where(clauses: List[str]) -> str:
+        return f" WHERE {' AND '.join(clauses)}" if clauses else ""
+
+    @staticmethod
+    def _condition(column: str, condition, dtype) -> Tuple[str, list]:
+        op, operand = parse_condition(condition, dtype)
+        if op == "ge":
+            return f"{column} >= ?", [operand]
+        elif op == "le":
+            return f"{column} <= ?", [operand]
+        elif op == "between":
+            return f"{column} BETWEEN ? AND ?", list(operand)
+        elif op == "in":
+            if not operand:
+                return "1 = 0", []
+            return f"{column} IN ({', '.join('?' for _ in operand)})", operand
+        return f"{column} = ?", [operand]
+
+    def _execute(self, sql: str, params: list) -> pd.DataFrame:
+        if self.engine == "duckdb":
+            # DuckDB connections aren't thread-safe; each thread gets its own cursor
+            cursor = getattr(self._local, "cursor", None)
+            if cursor is None:
+                cursor = self._local.cursor = self._connection.cursor()
+            return cursor.execute(sql, params).df()
+        with self._lock:
+            return pd.read_sql_query(sql, self._connection, params=params)
+
+    def _load_table(self, name: str, df: pd.DataFrame):
+        """Copy a frame into the engine; categoricals are stored as plain text"""
+        self.dtypes[name] = dict(df.dtypes.items())
+        if self.engine == "duckdb":
+            columns = ", ".join(
+                f"CAST({quote(column)} AS VARCHAR) AS {quote(column)}"
+                if isinstance(dtype, pd.CategoricalDtype) else quote(column)
+                for column, dtype in df.dtypes.items()
+            )
+            self._connection.register("source_frame", df)
+            try:
+                self._connection.execute(f"CREATE TABLE {quote(name)} AS SELECT {columns} FROM source_frame")
+            finally:
+                self._connection.unregister("source_frame")
+        else:
+            df.to_sql(name, self._connection, index=False)
+
+    def _create_link_view(self, view: str, edges: str, nodes: str, ends: List[tuple]):
+        """
+        Join an edge table to its node table at each end, as a view
+
+        The id lookups are resolved once here into a table of node rowids,
+        so queries on the view join on integers instead of id strings.
+        """
+        end_columns = [column for column, _ in ends]
+        extras = [column for column in self.dtypes[edges] if column not in end_columns]
+        if self.engine == "sqlite":
+            self._connection.execute(
+                f"CREATE INDEX IF NOT EXISTS {quote(nodes + '_id')} ON {quote(nodes)} (id)")
+
+        index = quote(f"{view}_rows")
+        rows = [f"n{i}.rowid AS end{i}" for i in range(len(ends))] + [f"e.{quote(column)}" for column in extras]
+        joins = [f"JOIN {quote(nodes)} n{i} ON e.{quote(column)} = n{i}.id" for i, column in enumerate(end_columns)]
+        self._connection.execute(
+            f"CREATE TABLE {index} AS SELECT {', '.join(rows)} FROM {quote(edges)} e {' '.join(joins)}")
+
+        select = [f"x.{quote(column)}" for column in extras]
+        dtypes = {column: self.dtypes[edges][column] for column in extras}
+        for i, (_, prefix) in enumerate(ends):
+            for column, dtype in self.dtypes[nodes].items():
+                name = f"{prefix}_{column}"
+                select.append(f"n{i}.{quote(column)} AS {quote(name)}")
+                dtypes[name] = dtype
+        joins = [f"JOIN {quote(nodes)} n{i} ON x.end{i} = n{i}.rowid" for i in range(len(ends))]
+        self._connection.execute(
+            f"CREATE VIEW {quote(view)} AS SELECT {', '.join(select)} FROM {index} x {' '.join(joins)}")
+        self.dtypes[view] = dtypes